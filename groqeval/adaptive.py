@@ -0,0 +1,188 @@
+# groqeval/adaptive.py
+import threading
+import time
+from typing import Dict, Iterator, Optional
+from groq import APIConnectionError
+from groqeval.backends import ChatBackend, GroqBackend, retry_delay
+from groqeval.exceptions import EvaluationTimeout
+from groqeval.telemetry import emit
+
+
+def status_code(error: Exception) -> Optional[int]:
+    """
+    The HTTP status of a failed request, for groq and httpx errors alike
+    """
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+class AdaptiveConcurrencyBackend(ChatBackend):
+    """
+    Limits the requests in flight to another backend and tunes the limit
+    with AIMD: it grows by about one request per round trip while latency
+    stays within `tolerance` times its baseline, and is multiplied by
+    `backoff` on a 429, a 5xx or a latency spike. It backs off at most once
+    per round trip so a burst of errors from one window counts once.
+    Calls beyond the limit wait for a slot, within their timeout. Every
+    change of the limit is emitted as a `concurrency_limit` event.
+    Throttled and failing calls are retried up to `max_retries` times above
+    the limit: the slot is given back so the limit backs off, and the call
+    waits for `retry-after` and a new slot before trying again. The backend
+    below should not retry itself, or the limit never sees the errors.
+    """
+    def __init__(self, backend: ChatBackend, initial_limit: int = 4, min_limit: int = 1,
+                 max_limit: int = 64, backoff: float = 0.5, tolerance: float = 2.0, max_retries: int = 0):
+        self.backend = backend
+        self.max_retries = max_retries
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self._limit = float(initial_limit)
+        self.in_flight = 0
+        self.baseline = None
+        self.last_backoff = 0.0
+        self.counters = {"requests": 0, "increases": 0, "decreases": 0, "throttled": 0, "server_errors": 0}
+        self.condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """
+        The number of requests currently allowed in flight
+        """
+        return int(self._limit)
+
+    def acquire(self, timeout: float = None) -> float:
+        """
+        Waits for a slot and returns how long that took
+        """
+        start = time.monotonic()
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.in_flight < self.limit, timeout):
+                raise EvaluationTimeout()
+            self.in_flight += 1
+        return time.monotonic() - start
+
+    def release(self, latency: float, error: Exception = None):
+        """
+        Frees a slot and adjusts the limit to the outcome of the request
+        """
+        with self.condition:
+            previous = self.limit
+            self.in_flight -= 1
+            self.counters["requests"] += 1
+            status = status_code(error) if error is not None else None
+            if status == 429:
+                self.counters["throttled"] += 1
+            elif status is not None and status >= 500:
+                self.counters["server_errors"] += 1
+            spike = error is None and self.baseline is not None and latency > self.tolerance * self.baseline
+            if status == 429 or (status is not None and status >= 500) or spike:
+                now = time.monotonic()
+                if now - self.last_backoff >= (self.baseline or latency):
+                    self._limit = max(self.min_limit, self._limit * self.backoff)
+                    self.last_backoff = now
+                    self.counters["decreases"] += 1
+            elif error is None:
+                if self.in_flight + 1 >= self.limit and self._limit < self.max_limit:
+                    # Only grow when the limit is actually being used
+                    self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                    self.counters["increases"] += 1
+            if error is None:
+                # The baseline follows the fastest responses and drifts up slowly with sustained load
+                if self.baseline is None or latency < self.baseline:
+                    self.baseline = latency
+                else:
+                    self.baseline += (latency - self.baseline) * 0.05
+            self.condition.notify_all()
+            limit = self.limit
+        if limit != previous:
+            emit("concurrency_limit", limit=limit, previous=previous)
+
+    def retry_wait(self, error: Exception, attempt: int, deadline: Optional[float]) -> Optional[float]:
+        """
+        How long to wait before retrying a failed call, or None when it
+        should not be retried
+        """
+        status = status_code(error)
+        retryable = status in GroqBackend.retry_statuses or (status is None and isinstance(error, APIConnectionError))
+        delay = retry_delay(error, attempt + 1)
+        if not retryable or attempt >= self.max_retries or (deadline is not None and time.monotonic() + delay >= deadline):
+            return None
+        return delay
+
+    def acquire_within(self, model: str, deadline: Optional[float]) -> Optional[float]:
+        """
+        Waits for a slot before `deadline` and returns the time left after it
+        """
+        timeout = deadline - time.monotonic() if deadline is not None else None
+        if timeout is not None and timeout <= 0:
+            raise EvaluationTimeout()
+        waited = self.acquire(timeout)
+        emit("queue_wait", model=model, duration=waited, queue="concurrency_limit")
+        return deadline - time.monotonic() if deadline is not None else None
+
+    def chat_completion(self, messages, model, temperature=0.5, response_format=None, timeout: float = None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        attempt = 0
+        while True:
+            timeout = self.acquire_within(model, deadline)
+            start = time.monotonic()
+            error = None
+            try:
+                return self.backend.chat_completion(messages, model, temperature, response_format, timeout)
+            except Exception as e:
+                error = e
+                delay = self.retry_wait(e, attempt, deadline)
+                if delay is None:
+                    raise
+            finally:
+                self.release(time.monotonic() - start, error)
+            attempt += 1
+            emit("retry", model=model, status=status_code(error), attempt=attempt)
+            time.sleep(delay)
+
+    def stream_chat_completion(self, messages, model, temperature=0.5, response_format=None,
+                               timeout: float = None) -> Iterator[str]:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        attempt = 0
+        while True:
+            timeout = self.acquire_within(model, deadline)
+            start = time.monotonic()
+            error = None
+            started = False
+            try:
+                stream = self.backend.stream_chat_completion(messages, model, temperature, response_format, timeout)
+                try:
+                    while True:
+                        try:
+                            chunk = next(stream)
+                        except StopIteration as done:
+                            return done.value
+                        started = True
+                        yield chunk
+                finally:
+                    stream.close()
+            except Exception as e:
+                error = e
+                # Content already passed on cannot be taken back, so only calls that failed before it are retried
+                delay = None if started else self.retry_wait(e, attempt, deadline)
+                if delay is None:
+                    raise
+            finally:
+                self.release(time.monotonic() - start, error)
+            attempt += 1
+            emit("retry", model=model, status=status_code(error), attempt=attempt)
+            time.sleep(delay)
+
+    def stats(self) -> Dict:
+        """
+        The current limit, requests in flight, baseline latency and counters
+        """
+        with self.condition:
+            return dict(self.counters, limit=self.limit, in_flight=self.in_flight, baseline_latency=self.baseline)
+
+    def close(self):
+        self.backend.close()
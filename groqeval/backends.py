@@ -0,0 +1,304 @@
+# groqeval/backends.py
+import json
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Union
+import httpx
+from groq import Groq, APIConnectionError, APIStatusError, APITimeoutError
+from pydantic import BaseModel
+from groqeval.exceptions import EvaluationTimeout
+from groqeval.telemetry import emit
+
+
+class Message(BaseModel):
+    """
+    The message of a chat completion choice
+    """
+    content: Optional[str] = None
+
+
+class Choice(BaseModel):
+    """
+    A chat completion choice
+    """
+    message: Message
+
+
+class ChatResponse(BaseModel):
+    """
+    The parts of a chat completion the metrics read, shaped like groq's response
+    """
+    choices: List[Choice]
+    model: Optional[str] = None
+    served_by_fallback: bool = False
+
+
+class FallbackModel(str):
+    """
+    The model name a stream returns when a fallback, rather than the
+    backend asked for, served it
+    """
+
+
+def mark_fallback(response):
+    """
+    Marks a response as served by a fallback, rebuilding it as a
+    ChatResponse when it does not take new attributes
+    """
+    try:
+        response.served_by_fallback = True
+        return response
+    except (AttributeError, TypeError, ValueError):
+        return ChatResponse(
+            choices=[Choice(message=Message(content=response.choices[0].message.content))],
+            model=getattr(response, "model", None),
+            served_by_fallback=True
+        )
+
+
+def served_by_fallback(response_or_model) -> bool:
+    """
+    Whether a response, or the model name a stream returned, came from a fallback
+    """
+    return isinstance(response_or_model, FallbackModel) or getattr(response_or_model, "served_by_fallback", False) is True
+
+
+class ChatBackend(ABC):
+    """
+    A chat completion endpoint the metrics can run against.
+    Responses expose `choices[0].message.content` and `model` like groq's.
+    `timeout` is the time left before the caller's deadline; a backend must
+    not take longer than that and raises EvaluationTimeout when it would.
+    """
+    @abstractmethod
+    def chat_completion(self, messages, model, temperature=0.5, response_format=None, timeout: float = None):
+        """
+        Runs one chat completion
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    def stream_chat_completion(self, messages, model, temperature=0.5, response_format=None,
+                               timeout: float = None) -> Iterator[str]:
+        """
+        Runs one chat completion and yields its content as it is generated.
+        Closing the iterator early cancels the rest of the response. Backends
+        that cannot stream yield the whole content at once.
+        The generator returns the name of the model that served the response.
+        """
+        response = self.chat_completion(messages, model, temperature, response_format, timeout)
+        yield response.choices[0].message.content
+        return getattr(response, "model", None)
+
+    def close(self):
+        """
+        Releases the backend's connections
+        """
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds in a rate limit header such as "7.66s", "2m59.56s" or "120ms"
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Seconds to wait before retry number `attempt`: what the server asked for
+    in `retry-after`, or an exponential backoff when it did not say
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    retry_after = parse_duration(headers.get("retry-after"))
+    if retry_after is not None:
+        return retry_after
+    return min(0.5 * 2 ** attempt, 8)
+
+
+class GroqBackend(ChatBackend):
+    """
+    Runs completions with a groq client.
+    Failed requests are retried here rather than inside the client, so each
+    retry is reported. `max_retries` defaults to the client's own setting.
+    Retries wait for the server's `retry-after`, and under a deadline are
+    made only while the time left covers the wait.
+    """
+    retry_statuses = (408, 409, 429, 500, 502, 503, 504)
+
+    def __init__(self, client: Groq, max_retries: int = None):
+        self.client = client
+        self.max_retries = getattr(client, "max_retries", 0) if max_retries is None else max_retries
+        # The client's own retries would run unreported, and uncounted by the wrappers around this backend
+        self.requests_client = client.with_options(max_retries=0) if getattr(client, "max_retries", 0) else client
+
+    def create(self, model, timeout: float = None, **request):
+        """
+        Sends one request, retrying throttled, failing and unreachable ones
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        attempt = 0
+        while True:
+            client = self.requests_client
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise EvaluationTimeout()
+                client = client.with_options(timeout=remaining, max_retries=0)
+            try:
+                return client.chat.completions.create(model=model, **request)
+            except APITimeoutError as e:
+                raise EvaluationTimeout() from e
+            except (APIStatusError, APIConnectionError) as e:
+                status = getattr(e, "status_code", None)
+                retryable = status is None or status in self.retry_statuses
+                delay = retry_delay(e, attempt + 1)
+                # A retry that would run past the deadline is not worth waiting for
+                if not retryable or attempt >= self.max_retries or (
+                        deadline is not None and time.monotonic() + delay >= deadline):
+                    raise
+                attempt += 1
+                emit("retry", model=model, status=status, attempt=attempt)
+                time.sleep(delay)
+
+    def chat_completion(self, messages, model, temperature=0.5, response_format=None, timeout: float = None):
+        return self.create(
+            model,
+            timeout,
+            messages=messages,
+            temperature=temperature,
+            response_format=response_format
+        )
+
+    def stream_chat_completion(self, messages, model, temperature=0.5, response_format=None,
+                               timeout: float = None) -> Iterator[str]:
+        # Groq does not stream in JSON mode, so the prompt's schema is relied on instead
+        stream = self.create(model, timeout, messages=messages, temperature=temperature, stream=True)
+        try:
+            served_model = None
+            try:
+                for chunk in stream:
+                    served_model = getattr(chunk, "model", None) or served_model
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                stream.close()
+            return served_model
+        except APITimeoutError as e:
+            raise EvaluationTimeout() from e
+
+    def close(self):
+        self.client.close()
+
+
+def extract_json(content: str) -> str:
+    """
+    Returns the JSON object in `content`. Local models asked for JSON often
+    wrap it in prose or a code fence, so the outermost braces are taken when
+    the content as a whole does not parse.
+    """
+    try:
+        json.loads(content)
+        return content
+    except json.JSONDecodeError:
+        start, stop = content.find("{"), content.rfind("}")
+        if start == -1 or stop < start:
+            raise ValueError(f"The response is not a JSON object: {content[:200]!r}") from None
+        candidate = content[start:stop + 1]
+        json.loads(candidate)
+        return candidate
+
+
+class OpenAICompatibleBackend(ChatBackend):
+    """
+    Runs completions against any endpoint implementing OpenAI's
+    `/chat/completions`, such as a llama.cpp or vLLM server.
+    `model` replaces the model the metrics ask for, either with one name or
+    through a mapping from requested to served model names. JSON mode is
+    requested with `response_format` and checked on the way back.
+    """
+    retry_statuses = (408, 429, 500, 502, 503, 504)
+
+    def __init__(self, base_url: str, api_key: str = None, model: Union[str, Dict[str, str]] = None,
+                 http_client: httpx.Client = None, timeout: float = 60, max_retries: int = 2):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._owns_http_client = http_client is None
+        self.http_client = http_client or httpx.Client()
+
+    def served_model(self, model: str) -> str:
+        """
+        The model name sent to the endpoint for a requested model
+        """
+        if isinstance(self.model, dict):
+            return self.model.get(model, model)
+        return self.model or model
+
+    def chat_completion(self, messages, model, temperature=0.5, response_format=None, timeout: float = None):
+        body = {"messages": messages, "model": self.served_model(model), "temperature": temperature}
+        if response_format is not None:
+            body["response_format"] = response_format
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        attempt = 0
+        while True:
+            request_timeout = self.timeout if deadline is None else deadline - time.monotonic()
+            if request_timeout <= 0:
+                raise EvaluationTimeout()
+            try:
+                response = self.http_client.post(self.url, json=body, headers=self.headers, timeout=request_timeout)
+            except httpx.TimeoutException as e:
+                raise EvaluationTimeout() from e
+            if response.status_code in self.retry_statuses and attempt < self.max_retries and deadline is None:
+                attempt += 1
+                emit("retry", model=model, status=response.status_code, attempt=attempt)
+                time.sleep(min(0.5 * 2 ** attempt, 8))
+                continue
+            response.raise_for_status()
+            break
+        completion = ChatResponse.model_validate(response.json())
+        if response_format and response_format.get("type") == "json_object":
+            for choice in completion.choices:
+                choice.message.content = extract_json(choice.message.content or "")
+        return completion
+
+    def stream_chat_completion(self, messages, model, temperature=0.5, response_format=None,
+                               timeout: float = None) -> Iterator[str]:
+        body = {"messages": messages, "model": self.served_model(model), "temperature": temperature, "stream": True}
+        if response_format is not None:
+            body["response_format"] = response_format
+        served_model = None
+        try:
+            with self.http_client.stream("POST", self.url, json=body, headers=self.headers,
+                                         timeout=self.timeout if timeout is None else timeout) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    served_model = event.get("model") or served_model
+                    choices = event.get("choices") or [{}]
+                    content = (choices[0].get("delta") or {}).get("content")
+                    if content:
+                        yield content
+        except httpx.TimeoutException as e:
+            raise EvaluationTimeout() from e
+        return served_model
+
+    def close(self):
+        if self._owns_http_client:
+            self.http_client.close()
@@ -0,0 +1,94 @@
+# groqeval/batch.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List
+from groqeval.metrics.base_metric import BaseMetric
+from groqeval.results import TIMEOUT_ERROR
+from groqeval.telemetry import emit
+from groqeval.validation import check_records
+
+
+def evaluate_record(metrics: Dict[str, BaseMetric], record: Dict, record_id=None,
+                    timeout: float = None) -> List[Dict]:
+    """
+    Scores a single record with each of the given metric instances, keyed by name.
+    Failures are recorded against the metric instead of being raised so that
+    one bad record does not abort the work already done on its neighbours.
+    With a `timeout`, all the metrics together get at most that many seconds.
+    Each metric gets the time the ones before it left, is marked as timed out,
+    with its decomposition if one finished, when it runs over, and is not
+    started once the time is up.
+    """
+    record_id = record.get("id", record_id)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    results = []
+    for metric_name, metric in metrics.items():
+        entry = {"record_id": record_id, "metric": metric_name}
+        try:
+            inputs = {key: record[key] for key in metric.inputs if key in record}
+            entry["fingerprint"] = metric.fingerprint(**inputs)
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                entry.update(score=None, score_breakdown=None, timed_out=True, error=TIMEOUT_ERROR)
+                results.append(entry)
+                continue
+            result = metric.score(timeout=remaining, **inputs)
+            entry.update(result.to_dict())
+            if result.fallback:
+                # The fingerprint names the model asked for, so a degraded result must not stand in for it
+                del entry["fingerprint"]
+            if result.timed_out:
+                entry["error"] = TIMEOUT_ERROR
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+        results.append(entry)
+    return results
+
+
+def timed_out_record(metrics: Iterable[str], record: Dict, record_id=None) -> List[Dict]:
+    """
+    The results of a record that was not started before its batch deadline
+    """
+    return [
+        {
+            "record_id": record.get("id", record_id),
+            "metric": metric_name,
+            "score": None,
+            "score_breakdown": None,
+            "timed_out": True,
+            "error": "EvaluationTimeout: The batch deadline passed before the record was evaluated"
+        }
+        for metric_name in metrics
+    ]
+
+
+def run_batch(evaluator, metrics: List[str], records: Iterable[Dict], max_concurrency: int = 8,
+              timeout: float = None, deadline: float = None, validate: bool = False) -> List[Dict]:
+    """
+    Evaluates records concurrently with one instance of each metric.
+    `timeout` bounds each record's evaluation, over all of its metrics, and
+    `deadline` bounds the whole batch, both in seconds. Calls still in flight when the batch deadline
+    passes are cut off, and records that were not reached are marked as timed out.
+    Results are returned in record order.
+    With `validate`, every record is checked before any request is made and
+    an InvalidRecordsError lists all the invalid ones.
+    """
+    instances = {metric_name: evaluator.metric(metric_name) for metric_name in metrics}
+    if validate:
+        records = list(records)
+        check_records([type(metric) for metric in instances.values()], records)
+    batch_deadline = time.monotonic() + deadline if deadline is not None else None
+
+    def evaluate(index, record, submitted):
+        emit("queue_wait", duration=time.monotonic() - submitted, queue="batch")
+        record_timeout = timeout
+        if batch_deadline is not None:
+            remaining = batch_deadline - time.monotonic()
+            if remaining <= 0:
+                return timed_out_record(metrics, record, index)
+            record_timeout = remaining if timeout is None else min(timeout, remaining)
+        return evaluate_record(instances, record, index, record_timeout)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = [executor.submit(evaluate, index, record, time.monotonic()) for index, record in enumerate(records)]
+        return [result for future in futures for result in future.result()]
@@ -0,0 +1,133 @@
+# groqeval/breaker.py
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator
+from groqeval.adaptive import status_code
+from groqeval.backends import ChatBackend, FallbackModel, mark_fallback
+from groqeval.exceptions import CircuitOpenError
+from groqeval.telemetry import emit
+
+
+class CircuitBreakerBackend(ChatBackend):
+    """
+    Stops calling a degraded backend. Over the last `window` calls, once
+    `min_calls` have been made, the breaker opens when the share of failed
+    calls reaches `error_rate`. A call fails when it raises, other than for
+    a bad request, or takes longer than `latency_threshold` seconds.
+    While open, calls go to `fallback`, or to the same backend with
+    `fallback_model`, or fail fast with CircuitOpenError. After `open_for`
+    seconds a single probe is let through: it closes the breaker when it
+    succeeds and opens it again when it fails. Responses from the fallback
+    are marked, so a cache can tell them apart and leave them out.
+    """
+    def __init__(self, backend: ChatBackend, fallback: ChatBackend = None, fallback_model: str = None,
+                 error_rate: float = 0.5, latency_threshold: float = None, window: int = 20,
+                 min_calls: int = 10, open_for: float = 30.0):
+        self.backend = backend
+        self.fallback = fallback
+        self.fallback_model = fallback_model
+        self.error_rate = error_rate
+        self.latency_threshold = latency_threshold
+        self.min_calls = min_calls
+        self.open_for = open_for
+        self.outcomes = deque(maxlen=window)
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probing = False
+        self.counters = {"calls": 0, "failures": 0, "fallbacks": 0, "rejected": 0, "opened": 0}
+        self.lock = threading.Lock()
+
+    def route(self, model: str):
+        """
+        The backend and model a call goes to, and how: "primary", "probe" or "fallback"
+        """
+        with self.lock:
+            self.counters["calls"] += 1
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.open_for and not self.probing:
+                self.state = "half_open"
+            if self.state == "half_open" and not self.probing:
+                self.probing = True
+                return self.backend, model, "probe"
+            if self.state == "closed":
+                return self.backend, model, "primary"
+            if self.fallback is None and self.fallback_model is None:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError()
+            self.counters["fallbacks"] += 1
+            return self.fallback or self.backend, self.fallback_model or model, "fallback"
+
+    def record(self, probe: bool, latency: float, error: Exception = None):
+        """
+        Adds the outcome of a call to the primary backend and moves the breaker
+        """
+        status = status_code(error) if error is not None else None
+        if status is not None and 400 <= status < 500 and status not in (408, 429):
+            # The request was at fault, not the backend
+            failed = False
+        else:
+            failed = error is not None or (self.latency_threshold is not None and latency > self.latency_threshold)
+        with self.lock:
+            self.counters["failures"] += failed
+            if probe:
+                self.probing = False
+                if failed:
+                    self.trip()
+                else:
+                    self.state = "closed"
+                    self.outcomes.clear()
+                    emit("circuit_closed")
+                return
+            if self.state != "closed":
+                return
+            self.outcomes.append(failed)
+            if len(self.outcomes) >= self.min_calls and sum(self.outcomes) / len(self.outcomes) >= self.error_rate:
+                self.trip()
+
+    def trip(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.counters["opened"] += 1
+        emit("circuit_opened")
+
+    def chat_completion(self, messages, model, temperature=0.5, response_format=None, timeout: float = None):
+        backend, served_model, route = self.route(model)
+        if route == "fallback":
+            return mark_fallback(backend.chat_completion(messages, served_model, temperature, response_format, timeout))
+        start = time.monotonic()
+        error = None
+        try:
+            return backend.chat_completion(messages, served_model, temperature, response_format, timeout)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.record(route == "probe", time.monotonic() - start, error)
+
+    def stream_chat_completion(self, messages, model, temperature=0.5, response_format=None,
+                               timeout: float = None) -> Iterator[str]:
+        backend, served_model, route = self.route(model)
+        if route == "fallback":
+            served = yield from backend.stream_chat_completion(messages, served_model, temperature, response_format, timeout)
+            return FallbackModel(served or served_model)
+        start = time.monotonic()
+        error = None
+        try:
+            return (yield from backend.stream_chat_completion(messages, served_model, temperature, response_format, timeout))
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.record(route == "probe", time.monotonic() - start, error)
+
+    def stats(self) -> Dict:
+        """
+        The breaker's state and counters
+        """
+        with self.lock:
+            return dict(self.counters, state=self.state)
+
+    def close(self):
+        self.backend.close()
+        if self.fallback is not None:
+            self.fallback.close()
@@ -0,0 +1,348 @@
+# groqeval/cache.py
+import argparse
+import hashlib
+import json
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Iterator, Optional, Tuple
+from urllib.parse import unquote, urlparse
+from groqeval.backends import ChatBackend, ChatResponse, served_by_fallback
+from groqeval.exceptions import CacheError
+from groqeval.telemetry import emit
+
+
+class CacheStore(ABC):
+    """
+    A key value store for chat completions that several workers can share.
+    Keys and values are strings; values are the JSON of a response.
+    """
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """
+        The value stored under `key`, or None
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    @abstractmethod
+    def set(self, key: str, value: str):
+        """
+        Stores `value` under `key`
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    @abstractmethod
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """
+        Yields every key and value in the store
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    def close(self):
+        """
+        Releases the store's connections
+        """
+
+
+class SQLiteCache(CacheStore):
+    """
+    A cache in a local SQLite file. Processes on one machine, or on machines
+    sharing a file system with working locks, can use the same file.
+    Entries older than `ttl` seconds are treated as missing.
+    """
+    def __init__(self, path: str, ttl: float = None):
+        self.path = path
+        self.ttl = ttl
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._connect() as connection:
+            row = connection.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl is not None and row[1] < time.time() - self.ttl):
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        connection = self._connect()
+        try:
+            yield from connection.execute("SELECT key, value FROM entries ORDER BY key")
+        finally:
+            connection.close()
+
+
+class RedisCache(CacheStore):
+    """
+    A cache on a server speaking the Redis protocol, such as Redis, Valkey or
+    KeyDB, for workers on different machines. Keys are prefixed with
+    `prefix` and expire after `ttl` seconds when it is set. Only the few
+    commands the cache needs are implemented, over one connection per cache.
+    """
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "groqeval:", ttl: float = None,
+                 timeout: float = 5.0):
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Expected a redis:// URL, got '{url}'")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.prefix = prefix
+        self.ttl = ttl
+        self.timeout = timeout
+        self.connection = None
+        self.reader = None
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        self.connection = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.reader = self.connection.makefile("rb")
+        if self.password is not None:
+            self._request(*(["AUTH", self.username] if self.username else ["AUTH"]), self.password)
+        if self.db:
+            self._request("SELECT", str(self.db))
+
+    def _disconnect(self):
+        if self.connection is not None:
+            self.reader.close()
+            self.connection.close()
+        self.connection = None
+        self.reader = None
+
+    def _request(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg.encode("utf-8") if isinstance(arg, str) else arg
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.connection.sendall(b"".join(parts))
+        return self._reply()
+
+    def _reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("The cache server closed the connection")
+        kind, value = line[:1], line[1:-2]
+        if kind == b"+":
+            return value.decode("utf-8")
+        if kind == b"-":
+            raise CacheError(value.decode("utf-8"))
+        if kind == b":":
+            return int(value)
+        if kind == b"$":
+            if int(value) < 0:
+                return None
+            data = self.reader.read(int(value) + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            return None if int(value) < 0 else [self._reply() for _ in range(int(value))]
+        raise CacheError(f"Unexpected reply from the cache server: {line!r}")
+
+    def execute(self, *args):
+        """
+        Sends one command and returns its reply, reconnecting once if the
+        connection was lost
+        """
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    if self.connection is None:
+                        self._connect()
+                    return self._request(*args)
+                except (OSError, ConnectionError):
+                    self._disconnect()
+                    if attempt:
+                        raise
+
+    def get(self, key: str) -> Optional[str]:
+        return self.execute("GET", self.prefix + key)
+
+    def set(self, key: str, value: str):
+        if self.ttl is None:
+            self.execute("SET", self.prefix + key, value)
+        else:
+            self.execute("SET", self.prefix + key, value, "PX", str(int(self.ttl * 1000)))
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        cursor = "0"
+        while True:
+            cursor, keys = self.execute("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", "500")
+            for key in keys:
+                value = self.execute("GET", key)
+                if value is not None:
+                    yield key[len(self.prefix):], value
+            if cursor == "0":
+                return
+
+    def close(self):
+        with self.lock:
+            self._disconnect()
+
+
+def open_cache(url: str, **options) -> CacheStore:
+    """
+    Opens a cache from a URL: "redis://host:port/db" for a Redis protocol
+    server, or "sqlite:///path/to/cache.db" or a plain path for SQLite
+    """
+    if url.startswith("redis://"):
+        return RedisCache(url, **options)
+    if url.startswith("sqlite://"):
+        url = url[len("sqlite://"):]
+    return SQLiteCache(url, **options)
+
+
+def cache_key(messages, model, temperature, response_format) -> str:
+    """
+    A content hash of everything that determines a completion
+    """
+    payload = json.dumps([messages, model, temperature, response_format], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# What a failing store raises: sockets, a locked or broken SQLite file, or an error reply
+STORE_ERRORS = (OSError, sqlite3.Error, CacheError)
+
+
+class CachingBackend(ChatBackend):
+    """
+    Serves completions from a shared cache and stores the ones it has to run.
+    Decompositions and scores are both completions, so either is reused by any
+    worker sharing the store. A store that fails is skipped, so the cache
+    being down slows an evaluation but does not break it. Responses a circuit
+    breaker marked as served by its fallback are not stored, so they are not
+    replayed after recovery.
+    """
+    def __init__(self, backend: ChatBackend, store: CacheStore):
+        self.backend = backend
+        self.store = store
+
+    def lookup(self, key: str, model: str) -> Optional[ChatResponse]:
+        """
+        The cached response under `key`, if there is one and the store answers
+        """
+        try:
+            value = self.store.get(key)
+        except STORE_ERRORS as e:
+            emit("cache_error", model=model, error=type(e).__name__)
+            return None
+        if value is None:
+            return None
+        emit("cache_hit", model=model, cache=type(self.store).__name__)
+        return ChatResponse.model_validate_json(value)
+
+    def save(self, key: str, model: str, content: str, served_model: Optional[str], fallback: bool = False):
+        """
+        Stores a response, ignoring a store that fails. Fallback responses are skipped.
+        """
+        if fallback:
+            return
+        value = ChatResponse.model_validate({"choices": [{"message": {"content": content}}], "model": served_model})
+        try:
+            self.store.set(key, value.model_dump_json())
+        except STORE_ERRORS as e:
+            emit("cache_error", model=model, error=type(e).__name__)
+
+    def chat_completion(self, messages, model, temperature=0.5, response_format=None, timeout: float = None):
+        key = cache_key(messages, model, temperature, response_format)
+        cached = self.lookup(key, model)
+        if cached is not None:
+            return cached
+        response = self.backend.chat_completion(messages, model, temperature, response_format, timeout)
+        self.save(key, model, response.choices[0].message.content, getattr(response, "model", None),
+                  served_by_fallback(response))
+        return response
+
+    def stream_chat_completion(self, messages, model, temperature=0.5, response_format=None,
+                               timeout: float = None) -> Iterator[str]:
+        key = cache_key(messages, model, temperature, response_format)
+        cached = self.lookup(key, model)
+        if cached is not None:
+            yield cached.choices[0].message.content
+            return cached.model
+        chunks = []
+        stream = self.backend.stream_chat_completion(messages, model, temperature, response_format, timeout)
+        try:
+            while True:
+                try:
+                    chunk = next(stream)
+                except StopIteration as done:
+                    served_model = done.value
+                    break
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            stream.close()
+        # Not reached when the caller stops early, so partial responses are never stored
+        self.save(key, model, "".join(chunks), served_model, served_by_fallback(served_model))
+        return served_model
+
+    def close(self):
+        self.backend.close()
+
+
+def export_snapshot(store: CacheStore, path: str) -> int:
+    """
+    Writes every entry of the store to a JSON lines file and returns how many there were
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as file:
+        for key, value in store.items():
+            file.write(json.dumps({"key": key, "value": value}) + "\n")
+            count += 1
+    return count
+
+
+def import_snapshot(store: CacheStore, path: str) -> int:
+    """
+    Loads the entries of a snapshot into the store and returns how many there were
+    """
+    count = 0
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                store.set(entry["key"], entry["value"])
+                count += 1
+    return count
+
+
+def main(argv=None):
+    """
+    Command line entry point for exporting and importing cache snapshots
+    """
+    parser = argparse.ArgumentParser(prog="python -m groqeval.cache")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command in ("export", "import"):
+        subparser = subparsers.add_parser(command)
+        subparser.add_argument("--cache", required=True, help="redis://host:port/db, sqlite:///path or a path")
+        subparser.add_argument("--snapshot", required=True, help="The JSON lines snapshot file")
+    args = parser.parse_args(argv)
+
+    store = open_cache(args.cache)
+    try:
+        if args.command == "export":
+            print(export_snapshot(store, args.snapshot))
+        else:
+            print(import_snapshot(store, args.snapshot))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# groqeval/compare.py
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+from typing import Dict, List
+from groqeval.exceptions import EvaluationTimeout
+from groqeval.metrics.base_metric import BaseMetric
+from groqeval.results import ScoreResult
+
+
+class Comparison:
+    """
+    The scores of several candidate outputs on the same metrics.
+    `results[i]` maps each metric name to the ScoreResult of candidate i.
+    A candidate wins against another on a metric when its score is better
+    in the metric's direction, and ties count as half a win. `higher_is_better`
+    holds the metrics that read the output; the others score every candidate
+    the same and are left out of win rates and winners.
+    """
+    def __init__(self, outputs: List[str], results: List[Dict[str, ScoreResult]], higher_is_better: Dict[str, bool]):
+        self.outputs = outputs
+        self.results = results
+        self.higher_is_better = higher_is_better
+
+    def _better(self, metric: str, first: int, second: int):
+        a, b = self.results[first][metric].score, self.results[second][metric].score
+        if a is None or b is None:
+            return None
+        if a == b:
+            return 0.5
+        return float((a > b) == self.higher_is_better[metric])
+
+    @property
+    def win_rates(self) -> List[float]:
+        """
+        The share of pairwise comparisons, over all metrics and other
+        candidates, that each candidate wins
+        """
+        wins = [0.0] * len(self.results)
+        games = [0] * len(self.results)
+        for metric in self.higher_is_better:
+            for first, second in combinations(range(len(self.results)), 2):
+                outcome = self._better(metric, first, second)
+                if outcome is None:
+                    continue
+                wins[first] += outcome
+                wins[second] += 1 - outcome
+                games[first] += 1
+                games[second] += 1
+        return [win / game if game else None for win, game in zip(wins, games)]
+
+    @property
+    def winners(self) -> Dict[str, List[int]]:
+        """
+        The candidates with the best score on each metric
+        """
+        winners = {}
+        for metric, higher in self.higher_is_better.items():
+            scores = {i: result[metric].score for i, result in enumerate(self.results) if result[metric].score is not None}
+            if scores:
+                best = (max if higher else min)(scores.values())
+                winners[metric] = [i for i, score in scores.items() if score == best]
+        return winners
+
+    def to_dict(self) -> Dict:
+        """
+        A plain, JSON serialisable dictionary of the comparison
+        """
+        return {
+            "candidates": [
+                {"output": output, "results": {metric: result.to_dict() for metric, result in results.items()}}
+                for output, results in zip(self.outputs, self.results)
+            ],
+            "win_rates": self.win_rates,
+            "winners": self.winners
+        }
+
+
+def decomposition_key(metric: BaseMetric) -> str:
+    """
+    Identifies a decomposition by the model, the prompt and the inputs it is
+    made from, so metrics sharing a decomposition prompt share the call too
+    """
+    prompt = getattr(metric, "output_decomposition_prompt", None) or getattr(metric, "context_decomposition_prompt", None)
+    values = {key: getattr(metric, key) for key in metric.decomposition_inputs}
+    options = [getattr(metric, "compress_context", False)]
+    return json.dumps([metric.model, prompt, values, options], sort_keys=True)
+
+
+def compare(evaluator, metrics: List[str], outputs: List[str], prompt: str = None, context: List[str] = None,
+            max_concurrency: int = 8, timeout: float = None) -> Comparison:
+    """
+    Scores every candidate output with each metric. Each decomposition is
+    made once for all candidates and metrics that share it, such as the
+    context decomposition of Hallucination, and metrics that do not read the
+    output are scored once. The remaining scoring calls run concurrently.
+    """
+    if not outputs:
+        raise ValueError("'outputs' must hold at least one candidate")
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    shared = {"prompt": prompt, "context": context}
+    instances = {metric_name: evaluator.metric(metric_name) for metric_name in metrics}
+    for metric in instances.values():
+        for key in metric.inputs:
+            if key != "output" and shared.get(key) is None:
+                raise ValueError(f"'{key}' must be given to score {type(metric).__name__}")
+
+    # One bound copy per (metric, candidate) that needs its own score
+    tasks = {}
+    for metric_name, metric in instances.items():
+        candidates = range(len(outputs)) if "output" in metric.inputs else [0]
+        for i in candidates:
+            inputs = {key: shared.get(key) if key != "output" else outputs[i] for key in metric.inputs}
+            bound = metric.bind(**inputs)
+            bound.deadline = deadline
+            tasks[(metric_name, i)] = bound
+
+    def decompose(bound):
+        try:
+            return bound.decomposition_function(), dict(bound.served_models)
+        except EvaluationTimeout:
+            return None, {}
+
+    def score(bound, decomposition, served_models):
+        bound.served_models.update(served_models)
+        if decomposition is None:
+            return ScoreResult(None, bound.aggregation, models=dict(bound.served_models))
+        try:
+            scored = bound.score_decomposition(decomposition)
+        except EvaluationTimeout:
+            return ScoreResult(None, bound.aggregation, decomposition=decomposition, models=dict(bound.served_models))
+        return ScoreResult(scored, bound.aggregation, models=dict(bound.served_models),
+                           context_sources=bound.context_sources(scored))
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        keys = {task: decomposition_key(bound) for task, bound in tasks.items()}
+        decompositions = {}
+        for task, key in keys.items():
+            if key not in decompositions:
+                decompositions[key] = executor.submit(decompose, tasks[task])
+        scores = {
+            task: executor.submit(score, bound, *decompositions[keys[task]].result())
+            for task, bound in tasks.items()
+        }
+        results = [
+            {
+                metric_name: scores[(metric_name, i if (metric_name, i) in scores else 0)].result()
+                for metric_name in metrics
+            }
+            for i in range(len(outputs))
+        ]
+    ranked = {
+        metric_name: instances[metric_name].higher_is_better
+        for metric_name in metrics if "output" in instances[metric_name].inputs
+    }
+    return Comparison(outputs, results, ranked)
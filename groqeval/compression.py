@@ -0,0 +1,118 @@
+# groqeval/compression.py
+import hashlib
+import math
+import random
+import re
+from typing import List
+
+# A Mersenne prime larger than any 32 bit shingle hash
+_PRIME = (1 << 61) - 1
+
+
+def normalise(text: str) -> str:
+    """
+    Lower case text with runs of whitespace collapsed
+    """
+    return " ".join(text.split()).casefold()
+
+
+def shingles(text: str, size: int = 5) -> set:
+    """
+    The set of `size` word windows of a text. Texts shorter than a window
+    are a single shingle.
+    """
+    words = re.findall(r"\w+", normalise(text))
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """
+    Estimates the Jaccard similarity of shingle sets from fixed size signatures
+    """
+    def __init__(self, permutations: int = 64, seed: int = 1):
+        generator = random.Random(seed)
+        self.coefficients = [
+            (generator.randrange(1, _PRIME), generator.randrange(0, _PRIME))
+            for _ in range(permutations)
+        ]
+
+    def signature(self, shingle_set: set) -> List[int]:
+        """
+        The minimum of each hash permutation over the shingles
+        """
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "big")
+            for shingle in shingle_set
+        ]
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self.coefficients]
+
+    @staticmethod
+    def similarity(first: List[int], second: List[int]) -> float:
+        """
+        The estimated Jaccard similarity of two signatures
+        """
+        return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+class CompressedContext:
+    """
+    A retrieved context with duplicate chunks removed. `chunks` are the kept
+    chunks and `sources[i]` lists the positions in the original context of
+    every chunk that `chunks[i]` stands for.
+    """
+    def __init__(self, chunks: List[str], sources: List[List[int]], shingle_size: int = 5):
+        self.chunks = chunks
+        self.sources = sources
+        self.shingle_size = shingle_size
+
+    def attribute(self, sentence: str) -> List[int]:
+        """
+        The positions in the original context of the chunks a scored sentence
+        comes from, found by the kept chunk sharing the most shingles with it
+        """
+        target = normalise(sentence)
+        sentence_shingles = shingles(sentence, self.shingle_size)
+
+        def overlap(chunk):
+            if target in normalise(chunk):
+                return math.inf
+            return len(sentence_shingles & shingles(chunk, self.shingle_size))
+
+        overlaps = [overlap(chunk) for chunk in self.chunks]
+        if not overlaps or max(overlaps) == 0:
+            return []
+        return self.sources[overlaps.index(max(overlaps))]
+
+
+def compress_context(context: List[str], threshold: float = 0.8, shingle_size: int = 5,
+                     permutations: int = 64, seed: int = 1) -> CompressedContext:
+    """
+    Drops exact duplicates, ignoring case and whitespace, and merges chunks
+    whose estimated Jaccard similarity of word shingles reaches `threshold`.
+    A merged group is represented by its longest chunk, which keeps the
+    position of its first occurrence.
+    """
+    hasher = MinHasher(permutations, seed)
+    chunks, sources, signatures = [], [], []
+    seen = {}
+    for position, chunk in enumerate(context):
+        key = normalise(chunk)
+        if key in seen:
+            sources[seen[key]].append(position)
+            continue
+        signature = hasher.signature(shingles(chunk, shingle_size))
+        similarities = [MinHasher.similarity(signature, kept) for kept in signatures]
+        best = max(range(len(similarities)), key=similarities.__getitem__, default=None)
+        if best is not None and similarities[best] >= threshold:
+            sources[best].append(position)
+            if len(chunk) > len(chunks[best]):
+                chunks[best], signatures[best] = chunk, signature
+        else:
+            best = len(chunks)
+            chunks.append(chunk)
+            sources.append([position])
+            signatures.append(signature)
+        seen[key] = best
+    return CompressedContext(chunks, sources, shingle_size)
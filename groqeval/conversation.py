@@ -0,0 +1,165 @@
+# groqeval/conversation.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from cachetools import LRUCache
+from groq import Groq
+from groqeval.compare import decomposition_key
+from groqeval.exceptions import EvaluationTimeout
+from groqeval.metrics.answer_relevance import AnswerRelevance
+from groqeval.metrics.base_metric import BaseMetric
+from groqeval.metrics.bias import Bias
+from groqeval.metrics.faithfulness import Faithfulness
+from groqeval.metrics.toxicity import Toxicity
+from groqeval.results import ScoreResult
+from groqeval.telemetry import emit
+
+Turn = Dict[str, object]
+
+
+def clip(text: str, max_chars: int) -> str:
+    """
+    Cuts text down to `max_chars` characters, marking the cut
+    """
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + "..."
+
+
+def summary_window(turns: List[Turn], index: int, window: int, max_chars: int) -> str:
+    """
+    The prompt of the assistant turn at `index`: the user message it answers,
+    preceded by at most `window` earlier messages clipped to `max_chars` each.
+    The first answer of a conversation gets just the user message, as a
+    single-turn metric would.
+    """
+    messages = [turn for turn in turns[:index] if turn["role"] in ("user", "assistant")]
+    if not messages or messages[-1]["role"] != "user":
+        raise ValueError(f"Turn {index} does not answer a user message")
+    current = messages[-1]["content"]
+    earlier = messages[:-1][-window:] if window else []
+    if not earlier:
+        return current
+    history = "\n".join(f"{turn['role']}: {clip(turn['content'], max_chars)}" for turn in earlier)
+    return f"Conversation so far:\n{history}\n\nCurrent message: {current}"
+
+
+class ConversationMetric:
+    """
+    Scores every assistant turn of a chat transcript with a single-turn
+    metric. Each turn is scored against a bounded window of the turns before
+    it instead of the whole history, so its prompt stays the same size however
+    long the conversation gets. Decompositions and scores are cached by
+    content, so scoring a transcript again after new turns were appended only
+    calls the model for the new turns, and the cost grows linearly with length.
+    """
+    metric_cls = None
+
+    def __init__(self, groq_client: Groq, window: int = 4, max_chars: int = 500,
+                 cache_size: int = 1024, **kwargs):
+        self.metric: BaseMetric = self.metric_cls(groq_client, **kwargs)
+        self.window = window
+        self.max_chars = max_chars
+        self.decompositions = LRUCache(maxsize=cache_size)
+        self.scores = LRUCache(maxsize=cache_size)
+        self.lock = threading.Lock()
+
+    def turn_inputs(self, turns: List[Turn], index: int) -> Dict:
+        """
+        The metric inputs of the assistant turn at `index`
+        """
+        return {
+            "prompt": summary_window(turns, index, self.window, self.max_chars),
+            "output": turns[index]["content"]
+        }
+
+    def score_turn(self, turns: List[Turn], index: int, deadline: Optional[float] = None) -> ScoreResult:
+        """
+        Scores one assistant turn, reusing its cached score or decomposition
+        """
+        bound = self.metric.bind(**self.turn_inputs(turns, index))
+        bound.deadline = deadline
+        key = bound.fingerprint()
+        with self.lock:
+            result = self.scores.get(key)
+        if result is not None:
+            emit("cache_hit", type(self.metric).__name__, self.metric.model, turn=index)
+            return result
+        shared = decomposition_key(bound)
+        with self.lock:
+            decomposition = self.decompositions.get(shared)
+        try:
+            if decomposition is None:
+                decomposition = bound.decomposition_function()
+                with self.lock:
+                    self.decompositions[shared] = decomposition
+            scored = bound.score_decomposition(decomposition)
+        except EvaluationTimeout:
+            return ScoreResult(None, bound.aggregation, decomposition=decomposition, models=dict(bound.served_models))
+        result = ScoreResult(scored, bound.aggregation, models=dict(bound.served_models),
+                             context_sources=bound.context_sources(scored))
+        with self.lock:
+            self.scores[key] = result
+        return result
+
+    def score(self, turns: List[Turn], timeout: float = None, max_concurrency: int = 4) -> List[ScoreResult]:
+        """
+        Scores every assistant turn of `turns`, a list of chat messages with
+        'role' and 'content' keys, and returns one result per assistant turn.
+        Turns are independent once their windows are built, so the ones not
+        yet cached are scored concurrently.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        indices = [index for index, turn in enumerate(turns) if turn["role"] == "assistant"]
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = [executor.submit(self.score_turn, turns, index, deadline) for index in indices]
+            return [future.result() for future in futures]
+
+
+class ConversationAnswerRelevance(ConversationMetric):
+    """
+    Answer Relevance of each assistant turn to the user message it answers,
+    read in the context of the recent conversation
+    """
+    metric_cls = AnswerRelevance
+
+
+class ConversationBias(ConversationMetric):
+    """
+    Bias of each assistant turn, read in the context of the recent conversation
+    """
+    metric_cls = Bias
+
+
+class ConversationToxicity(ConversationMetric):
+    """
+    Toxicity of each assistant turn, read in the context of the recent conversation
+    """
+    metric_cls = Toxicity
+
+
+class ConversationFaithfulness(ConversationMetric):
+    """
+    Faithfulness of each assistant turn to its retrieved context, given as a
+    'context' list on the turn or as `context` for the whole conversation.
+    The window of earlier messages is added as one more context item, so
+    what was said earlier in the conversation counts as grounded.
+    """
+    metric_cls = Faithfulness
+
+    def __init__(self, groq_client: Groq, context: List[str] = None, window: int = 4, max_chars: int = 500,
+                 cache_size: int = 1024, **kwargs):
+        super().__init__(groq_client, window, max_chars, cache_size, **kwargs)
+        self.context = context
+
+    def turn_inputs(self, turns: List[Turn], index: int) -> Dict:
+        context = list(turns[index].get("context") or self.context or [])
+        prompt = summary_window(turns, index, self.window, self.max_chars)
+        return {"context": context + [prompt], "output": turns[index]["content"]}
+
+
+CONVERSATION_METRICS = {
+    "answer_relevance": ConversationAnswerRelevance,
+    "bias": ConversationBias,
+    "toxicity": ConversationToxicity,
+    "faithfulness": ConversationFaithfulness
+}
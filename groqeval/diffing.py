@@ -0,0 +1,72 @@
+# groqeval/diffing.py
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+from groqeval.batch import evaluate_record
+from groqeval.metrics.base_metric import BaseMetric
+
+
+def index_results(results: Iterable[Dict]) -> Dict[str, Dict]:
+    """
+    Successful results of a previous run keyed by their fingerprint. Results
+    a circuit breaker's fallback served are left out, so they are scored
+    again by the model their fingerprint names.
+    """
+    return {
+        result["fingerprint"]: result
+        for result in results
+        if result.get("fingerprint") and "error" not in result and not result.get("fallback")
+    }
+
+
+def diff_run(metrics: Dict[str, BaseMetric], records: Iterable[Dict],
+             previous: Dict[str, Dict]) -> Tuple[List[Tuple[int, Dict, List[str]]], List[Dict]]:
+    """
+    Splits a dataset into the work still to do and the results that carry over.
+    A (record, metric) pair carries over when a previous result has the same
+    fingerprint, i.e. the same metric, inputs, model and prompt version.
+    Returns the (index, record, metric names) left to evaluate and the carried results.
+    """
+    pending, carried = [], []
+    for index, record in enumerate(records):
+        record_id = record.get("id", index)
+        stale = []
+        for metric_name, metric in metrics.items():
+            inputs = {key: record[key] for key in metric.inputs if key in record}
+            try:
+                previous_result = previous.get(metric.fingerprint(**inputs))
+            except TypeError:
+                previous_result = None
+            if previous_result is None:
+                stale.append(metric_name)
+            else:
+                carried.append(dict(previous_result, record_id=record_id, metric=metric_name))
+        if stale:
+            pending.append((index, record, stale))
+    return pending, carried
+
+
+def run_incremental(evaluator, metrics: List[str], records: List[Dict], previous_results: Iterable[Dict],
+                    max_concurrency: int = 8, timeout: float = None) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    Evaluates only the records and metrics whose fingerprint is not among
+    `previous_results`, such as a merged ResultStore or a ResultTable of an
+    earlier run, and carries the rest over.
+    Returns the results in record order and counts of evaluated and carried over results.
+    """
+    instances = {metric_name: evaluator.metric(metric_name) for metric_name in metrics}
+    pending, carried = diff_run(instances, records, index_results(previous_results))
+
+    def evaluate(item):
+        index, record, stale = item
+        return evaluate_record({name: instances[name] for name in stale}, record, index, timeout)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        evaluated = [result for results in executor.map(evaluate, pending) for result in results]
+
+    order = {
+        (record.get("id", index), metric_name): position
+        for index, record in enumerate(records)
+        for position, metric_name in enumerate(metrics, start=index * len(metrics))
+    }
+    results = sorted(carried + evaluated, key=lambda result: order[(result["record_id"], result["metric"])])
+    return results, {"evaluated": len(evaluated), "carried_over": len(carried)}
@@ -1,29 +1,166 @@
 # groqeval/client.py
 import importlib
 import pkgutil
-from groq import Groq
+from functools import lru_cache
+from typing import Dict, Union
+import httpx
+from groq import Groq, DefaultHttpxClient
 from .metrics.base_metric import BaseMetric
+from .batch import run_batch
+from .compare import compare, Comparison
+from .conversation import CONVERSATION_METRICS, ConversationMetric
+from .backends import ChatBackend, GroqBackend
+from .pool import KeyPoolBackend
+from .adaptive import AdaptiveConcurrencyBackend
+from .breaker import CircuitBreakerBackend
+from .cache import CacheStore, CachingBackend, open_cache
+from .singleflight import SingleFlightBackend
+from .telemetry import timed
+from .validation import validate_records
+
+@lru_cache(maxsize=None)
+def metric_class(metric_name):
+    """
+        Resolves a metric name such as "answer_relevance" to its class
+    """
+    metric_module = importlib.import_module(f"groqeval.metrics.{metric_name}")
+    class_name = ''.join(word.capitalize() for word in metric_name.split('_'))
+    metric_cls = getattr(metric_module, class_name)
+
+    # Check if the class is a subclass of BaseMetric and not BaseMetric itself
+    if issubclass(metric_cls, BaseMetric) and metric_cls is not BaseMetric:
+        return metric_cls
+    raise TypeError(f"{class_name} is not a valid metric class")
 
 class GroqEval:
     """
     The main orchestrator for instnatiating evaluation
     """
-    def __init__(self, api_key):
-        self.client = Groq(api_key=api_key)
+    def __init__(self, api_key=None, http_client: httpx.Client = None, timeout: float = None,
+                 max_retries: int = 2, max_connections: int = None,
+                 max_keepalive_connections: int = None, keepalive_expiry: float = None,
+                 http2: bool = False, backend: ChatBackend = None, adaptive_concurrency: bool = False,
+                 circuit_breaker: Union[bool, Dict] = None, cache: Union[str, CacheStore] = None,
+                 single_flight: bool = False):
+        self.setup(api_key, http_client, timeout, max_retries, max_connections, max_keepalive_connections,
+                   keepalive_expiry, http2, backend)
+        # The limit backs off on 429s and 5xxs, so they are retried above it rather than below
+        adaptive_retries = 0
+        if adaptive_concurrency and self.backend is None:
+            self.backend = GroqBackend(self.client, max_retries=0)
+            adaptive_retries = max_retries
+        if circuit_breaker:
+            # Options such as fallback_model are passed on to the breaker
+            options = circuit_breaker if isinstance(circuit_breaker, dict) else {}
+            self.backend = CircuitBreakerBackend(self.backend or GroqBackend(self.client), **options)
+        if adaptive_concurrency:
+            # Requests beyond the tuned limit wait for a slot however many threads make them
+            self.backend = AdaptiveConcurrencyBackend(self.backend, max_retries=adaptive_retries)
+        if single_flight:
+            # Identical calls in flight at once share one request, and one concurrency slot
+            self.backend = SingleFlightBackend(self.backend or GroqBackend(self.client))
+        # A store opened here from a URL is ours to close
+        self.cache = open_cache(cache) if isinstance(cache, str) else cache
+        self._owns_cache = isinstance(cache, str)
+        if self.cache is not None:
+            # Outermost, so responses served from the cache skip the limits and breaker
+            self.backend = CachingBackend(self.backend or GroqBackend(self.client), self.cache)
+
+    def setup(self, api_key, http_client, timeout, max_retries, max_connections,
+              max_keepalive_connections, keepalive_expiry, http2, backend):
+        """
+            Builds the client, or the backend, that metrics run against
+        """
+        # Metrics run against `backend` when one is given, e.g. an OpenAICompatibleBackend
+        self.backend = backend
+        if backend is not None:
+            self.client = None
+            self._owns_http_client = False
+            return
+        client_options = {"api_key": api_key, "max_retries": max_retries}
+        if timeout is not None:
+            client_options["timeout"] = timeout
+        # A client passed in by the caller is theirs to close
+        self._owns_http_client = http_client is None
+        pool_options = (max_connections, max_keepalive_connections, keepalive_expiry)
+        if http_client is None and (http2 or any(option is not None for option in pool_options)):
+            limits = httpx.Limits(
+                max_connections=max_connections or 100,
+                max_keepalive_connections=max_keepalive_connections or 20,
+                keepalive_expiry=keepalive_expiry if keepalive_expiry is not None else 5.0
+            )
+            http_client = DefaultHttpxClient(limits=limits, http2=http2)
+        if http_client is not None:
+            client_options["http_client"] = http_client
+        if isinstance(api_key, (list, tuple)):
+            # A pool retries on its other keys instead of on the same one
+            client_options.pop("api_key")
+            client_options["max_retries"] = 0
+            self.backend = KeyPoolBackend(api_key, max_attempts=(max_retries + 1) * len(api_key), **client_options)
+            self.client = None
+            return
+        self.client = Groq(**client_options)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+            Closes the connections held by the evaluator's client
+        """
+        if self._owns_http_client:
+            self.client.close() if self.client is not None else self.backend.close()
+        if self._owns_cache:
+            self.cache.close()
 
     def __call__(self, metric_name, **kwargs):
-        try:
-            metric_module = importlib.import_module(f"groqeval.metrics.{metric_name}")
-            class_name = ''.join(word.capitalize() for word in metric_name.split('_'))
-            metric_class = getattr(metric_module, class_name)
-
-            # Check if the class is a subclass of BaseMetric and not BaseMetric itself
-            if issubclass(metric_class, BaseMetric) and metric_class is not BaseMetric:
-                return metric_class(self.client, **kwargs)
-            raise TypeError(f"{class_name} is not a valid metric class")
-
-        except (ImportError, AttributeError, TypeError) as e:
-            raise e
+        return self.metric(metric_name, **kwargs)
+
+    def metric(self, metric_name, **kwargs) -> BaseMetric:
+        """
+            Creates a metric. Inputs may be left out and given to `score` instead,
+            so a single instance can score many records.
+        """
+        metric_cls = metric_class(metric_name)
+        with timed("construct", metric_cls.__name__, metric_cls.model):
+            return metric_cls(self.backend or self.client, **kwargs)
+
+    def conversation(self, metric_name, **kwargs) -> ConversationMetric:
+        """
+            Creates the conversation variant of a metric, which scores every
+            assistant turn of a chat transcript
+        """
+        if metric_name not in CONVERSATION_METRICS:
+            raise ValueError(f"{metric_name} has no conversation variant, choose from {', '.join(CONVERSATION_METRICS)}")
+        return CONVERSATION_METRICS[metric_name](self.backend or self.client, **kwargs)
+
+    def batch(self, metrics, records, max_concurrency: int = 8, timeout: float = None,
+              deadline: float = None, validate: bool = False):
+        """
+            Evaluates many records concurrently with the given metric names.
+            `timeout` bounds each record and `deadline` the whole batch, in seconds.
+            With `validate`, invalid records are all reported before any request is made.
+        """
+        return run_batch(self, metrics, records, max_concurrency, timeout, deadline, validate)
+
+    def validate(self, metrics, records, max_input_tokens: int = None):
+        """
+            Checks records against the inputs of the given metric names without
+            calling the model, and returns the problems of each invalid record
+        """
+        return validate_records([metric_class(metric_name) for metric_name in metrics], records, max_input_tokens)
+
+    def compare(self, metrics, prompt: str = None, context=None, outputs=None,
+                max_concurrency: int = 8, timeout: float = None) -> Comparison:
+        """
+            Scores several candidate outputs for the same prompt and context with
+            the given metric names, sharing decompositions that do not depend on the
+            output, and returns per-candidate results with win rates.
+        """
+        return compare(self, metrics, outputs, prompt, context, max_concurrency, timeout)
 
     def list_metrics(self):
         """
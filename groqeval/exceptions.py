@@ -0,0 +1,37 @@
+# groqeval/exceptions.py
+
+class EvaluationTimeout(TimeoutError):
+    """
+    Raised when an evaluation runs past its deadline.
+    `decomposition` holds the decomposed input when the deadline passed
+    after decomposition had finished but before scoring had.
+    """
+    def __init__(self, message: str = "The evaluation deadline has passed", decomposition=None):
+        super().__init__(message)
+        self.decomposition = decomposition
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling a backend whose circuit breaker is open and
+    that has no fallback to route to.
+    """
+    def __init__(self, message: str = "The circuit breaker is open"):
+        super().__init__(message)
+
+
+class CacheError(RuntimeError):
+    """
+    Raised when a shared cache server answers a command with an error
+    """
+
+
+class InvalidRecordsError(ValueError):
+    """
+    Raised before a run starts when records are not valid inputs for its metrics.
+    `invalid` maps the id or position of each invalid record to its problems.
+    """
+    def __init__(self, invalid):
+        self.invalid = invalid
+        lines = [f"{record_id}: {'; '.join(problems)}" for record_id, problems in invalid.items()]
+        super().__init__(f"{len(invalid)} invalid records:\n" + "\n".join(lines))
@@ -0,0 +1,334 @@
+# groqeval/loadtest.py
+import argparse
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Union
+import httpx
+from groq import InternalServerError, RateLimitError
+from pydantic import BaseModel
+from groqeval import telemetry
+from groqeval.backends import ChatBackend, ChatResponse
+from groqeval.batch import evaluate_record
+from groqeval.evaluate import GroqEval
+from groqeval.exceptions import EvaluationTimeout
+
+Distribution = Callable[[random.Random], float]
+
+
+def latency_distribution(spec: Union[str, float, Distribution]) -> Distribution:
+    """
+    A latency distribution in seconds from a spec: a number for a constant,
+    "uniform:low:high", "exponential:mean" or "lognormal:median:sigma".
+    Callables taking a random.Random are used as they are.
+    """
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda generator: float(spec)
+    kind, *values = spec.split(":")
+    values = [float(value) for value in values]
+    if not values:
+        return lambda generator: float(kind)
+    if kind == "uniform":
+        return lambda generator: generator.uniform(values[0], values[1])
+    if kind == "exponential":
+        return lambda generator: generator.expovariate(1 / values[0])
+    if kind == "lognormal":
+        return lambda generator: generator.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution '{kind}'")
+
+
+class StubBackend(ChatBackend):
+    """
+    A local stand-in for Groq to load test against. Each stage answers after
+    a latency drawn from its distribution, and fails with a 429 or a 503 at
+    `throttle_rate` and `error_rate`. Decompositions split the input on full
+    stops unless `sentences` fixes their size, and every rationale is
+    `rationale_words` long, which sets the size of scoring responses.
+    """
+    def __init__(self, latency: Union[str, float, Distribution] = 0.05,
+                 scoring_latency: Union[str, float, Distribution] = None, throttle_rate: float = 0.0,
+                 error_rate: float = 0.0, sentences: int = None, rationale_words: int = 12, seed: int = None):
+        self.latency = {
+            "decomposition": latency_distribution(latency),
+            "scoring": latency_distribution(latency if scoring_latency is None else scoring_latency)
+        }
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.sentences = sentences
+        self.rationale = " ".join(["because"] * rationale_words)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def respond(self, stage: str, user: str, compact: bool) -> str:
+        """
+        The content of a response to a stage
+        """
+        if stage == "decomposition":
+            lines = [line[2:] for line in user.splitlines() if line.startswith("- ")] or [user]
+            sentences = [s.strip() for line in lines for s in line.split(". ") if s.strip()]
+            if self.sentences is not None:
+                sentences = [sentences[i % len(sentences)] for i in range(self.sentences)]
+            return json.dumps({"sentences": [{"string": s, "flag": True} for s in sentences]})
+        sentences = json.loads(user)["sentences"]
+        if compact:
+            return json.dumps({"scores": [{"index": s["index"], "score": len(s["string"]) % 10 + 1} for s in sentences]})
+        return json.dumps({"scores": [
+            {"string": s, "rationale": self.rationale, "score": len(s) % 10 + 1} for s in sentences
+        ]})
+
+    def chat_completion(self, messages, model, temperature=0.5, response_format=None, timeout: float = None):
+        system, user = messages[0]["content"], messages[1]["content"]
+        stage = "decomposition" if "decompose" in system else "scoring"
+        with self.lock:
+            latency = self.latency[stage](self.random)
+            failure = self.random.random()
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise EvaluationTimeout()
+        time.sleep(latency)
+        if failure < self.throttle_rate + self.error_rate:
+            status = 429 if failure < self.throttle_rate else 503
+            request = httpx.Request("POST", "http://stub/chat/completions")
+            response = httpx.Response(status, headers={"retry-after": "1"}, request=request)
+            error = RateLimitError if status == 429 else InternalServerError
+            raise error(f"Error code: {status}", response=response, body=None)
+        content = self.respond(stage, user, "compact form" in system)
+        return ChatResponse.model_validate({"choices": [{"message": {"content": content}}], "model": model})
+
+
+class StageLatency(BaseModel):
+    """
+    Latency percentiles of one stage, in seconds
+    """
+    count: int
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+class MemorySample(BaseModel):
+    """
+    Memory traced by tracemalloc at a point of the run
+    """
+    elapsed: float
+    current: int
+    peak: int
+
+
+class LoadReport(BaseModel):
+    """
+    The outcome of a load test
+    """
+    duration: float
+    records: int
+    results: int
+    throughput: float
+    requests_per_second: float
+    stages: Dict[str, StageLatency]
+    memory: List[MemorySample]
+    memory_growth: int
+    errors: Dict[str, int]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    The nearest rank percentile of sorted values
+    """
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def memory_sample(start: float) -> MemorySample:
+    """
+    Traced memory now, leaving out what the load test itself holds
+    """
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, __file__)])
+    _, peak = tracemalloc.get_traced_memory()
+    current = sum(stat.size for stat in snapshot.statistics("filename"))
+    return MemorySample(elapsed=time.monotonic() - start, current=current, peak=peak)
+
+
+class _StageRecorder(telemetry.Hook):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations: Dict[str, List[float]] = {}
+
+    def on_event(self, event: telemetry.Event):
+        if event.duration is not None:
+            self.add(event.name, event.duration)
+
+    def add(self, stage: str, duration: float):
+        with self.lock:
+            self.durations.setdefault(stage, []).append(duration)
+
+    def summary(self) -> Dict[str, StageLatency]:
+        with self.lock:
+            durations = {stage: sorted(values) for stage, values in self.durations.items()}
+        return {
+            stage: StageLatency(
+                count=len(values), mean=sum(values) / len(values), p50=percentile(values, 0.5),
+                p95=percentile(values, 0.95), p99=percentile(values, 0.99), max=values[-1]
+            )
+            for stage, values in durations.items()
+        }
+
+
+def run_load_test(evaluator, metrics: List[str], records: List[Dict], rate: float = None,
+                  concurrency: int = 8, duration: float = 10.0, max_records: int = None,
+                  timeout: float = None, fresh_metrics: bool = False, sample_interval: float = 1.0) -> LoadReport:
+    """
+    Drives the evaluator with `records`, cycled, for `duration` seconds or
+    `max_records` records. With a `rate` records start on an open loop at
+    that many per second, and their latency counts from when they were due.
+    Without one, `concurrency` workers evaluate records back to back.
+    `fresh_metrics` creates the metrics for every record instead of once,
+    as short lived callers do. Memory is traced throughout the run.
+    """
+    recorder = telemetry.add_hook(_StageRecorder())
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    instances = {metric_name: evaluator.metric(metric_name) for metric_name in metrics}
+    source = itertools.count()
+    source_lock = threading.Lock()
+    errors = Counter()
+    totals = {"records": 0, "results": 0}
+    memory = []
+    start = time.monotonic()
+    stop_at = start + duration if duration is not None else math.inf
+    finished = threading.Event()
+
+    def sample_memory():
+        while True:
+            memory.append(memory_sample(start))
+            if finished.wait(sample_interval):
+                return
+
+    def evaluate(index, due):
+        record = records[index % len(records)]
+        metric_instances = instances
+        if fresh_metrics:
+            metric_instances = {metric_name: evaluator.metric(metric_name) for metric_name in metrics}
+        results = evaluate_record(metric_instances, record, index, timeout)
+        recorder.add("record", time.monotonic() - due)
+        with source_lock:
+            totals["records"] += 1
+            totals["results"] += len(results)
+            errors.update(result["error"].split(":")[0] for result in results if "error" in result)
+
+    def next_index():
+        with source_lock:
+            index = next(source)
+        if (max_records is not None and index >= max_records) or time.monotonic() >= stop_at:
+            return None
+        return index
+
+    def closed_loop():
+        while (index := next_index()) is not None:
+            evaluate(index, time.monotonic())
+
+    sampler = threading.Thread(target=sample_memory, name="groqeval-loadtest-memory", daemon=True)
+    sampler.start()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            if rate is None:
+                for future in [executor.submit(closed_loop) for _ in range(concurrency)]:
+                    future.result()
+            else:
+                futures = []
+                while (index := next_index()) is not None:
+                    due = start + index / rate
+                    time.sleep(max(0.0, due - time.monotonic()))
+                    futures.append(executor.submit(evaluate, index, due))
+                for future in futures:
+                    future.result()
+    finally:
+        elapsed = time.monotonic() - start
+        finished.set()
+        sampler.join()
+        memory.append(memory_sample(start))
+        if started_tracing:
+            tracemalloc.stop()
+        telemetry.remove_hook(recorder)
+
+    stages = recorder.summary()
+    requests = sum(stages[stage].count for stage in ("decomposition", "scoring") if stage in stages)
+    return LoadReport(
+        duration=elapsed,
+        records=totals["records"],
+        results=totals["results"],
+        throughput=totals["records"] / elapsed,
+        requests_per_second=requests / elapsed,
+        stages=stages,
+        memory=memory,
+        memory_growth=memory[-1].current - memory[0].current,
+        errors=dict(errors)
+    )
+
+
+def synthetic_records(count: int = 100, sentences: int = 5, seed: int = None) -> List[Dict]:
+    """
+    Records with a prompt, a context and an output of `sentences` sentences each
+    """
+    generator = random.Random(seed)
+    words = ["energy", "solar", "wind", "grid", "storage", "policy", "cost", "demand", "supply", "climate"]
+
+    def sentence():
+        return " ".join(generator.choice(words) for _ in range(generator.randint(5, 15))).capitalize()
+
+    return [
+        {
+            "id": i,
+            "prompt": sentence() + "?",
+            "context": [sentence() for _ in range(sentences)],
+            "output": ". ".join(sentence() for _ in range(sentences))
+        }
+        for i in range(count)
+    ]
+
+
+def main(argv=None):
+    """
+    Command line entry point for load testing against the stub backend
+    """
+    parser = argparse.ArgumentParser(prog="python -m groqeval.loadtest")
+    parser.add_argument("--metrics", default="answer_relevance,toxicity", help="Comma separated metric names")
+    parser.add_argument("--records", help="A JSON lines file of records, synthetic records otherwise")
+    parser.add_argument("--rate", type=float, help="Records started per second, closed loop otherwise")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float)
+    parser.add_argument("--latency", default="lognormal:0.2:0.4")
+    parser.add_argument("--scoring-latency")
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--sentences", type=int)
+    parser.add_argument("--rationale-words", type=int, default=12)
+    parser.add_argument("--adaptive", action="store_true", help="Use adaptive concurrency")
+    parser.add_argument("--fresh-metrics", action="store_true")
+    args = parser.parse_args(argv)
+
+    backend = StubBackend(args.latency, args.scoring_latency, args.throttle_rate, args.error_rate,
+                          args.sentences, args.rationale_words)
+    if args.records:
+        with open(args.records, encoding="utf-8") as file:
+            records = [json.loads(line) for line in file if line.strip()]
+    else:
+        records = synthetic_records(sentences=args.sentences or 5)
+    with GroqEval(backend=backend, adaptive_concurrency=args.adaptive) as evaluator:
+        report = run_load_test(evaluator, args.metrics.split(","), records, args.rate, args.concurrency,
+                               args.duration, timeout=args.timeout, fresh_metrics=args.fresh_metrics)
+    print(report.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,203 @@
+import copy
+import json
+import hashlib
+import re
+import time
 import logging
 import statistics
+import typing
+from functools import lru_cache
 from abc import ABC,abstractmethod
+from typing import Callable, Iterator, List, Optional, Type, Union
 from groq import Groq
+from pydantic import BaseModel
+from groqeval.models.compact import CompactScores, CompactScore
+from groqeval.results import ScoreResult, ThresholdResult
+from groqeval.exceptions import EvaluationTimeout
+from groqeval.backends import ChatBackend, FallbackModel, GroqBackend, extract_json, served_by_fallback
+from groqeval.compression import CompressedContext, compress_context
+from groqeval.streaming import IncrementalScoreParser
+from groqeval.telemetry import emit, timed
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()  # Stream handler to output to the console
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+logger.propagate = False
+
+@lru_cache(maxsize=None)
+def json_schema(model: Type[BaseModel]) -> str:
+    """
+    The JSON schema of a pydantic model as embedded in the prompts, computed once per model.
+    """
+    return json.dumps(model.model_json_schema(), indent=2)
 
 class BaseMetric(ABC):
     """
     The Base Metric class.
     """
-    def __init__(self, groq_client: Groq, verbose: bool = None):
+    # Names of the inputs a metric scores, set by each child class
+    inputs = ()
+    # The model used for decomposition and scoring
+    model = "llama3-70b-8192"
+    # Bump when a metric's prompts change so that stored results are not reused
+    prompt_version = 1
+    # The pydantic model of a scoring response, set by each child class
+    scored_model = None
+    # The inputs the decomposition depends on, so it can be shared when only others change
+    decomposition_inputs = ()
+    # Whether a higher score is the better outcome, False for Bias and Toxicity
+    higher_is_better = True
+
+    def __init__(self, groq_client: Groq, verbose: bool = None, compact: bool = False,
+                 rationales: Union[bool, int] = None):
         self.groq_client = groq_client
+        # A bare groq client is wrapped so that every metric talks to a ChatBackend
+        self.backend = groq_client if isinstance(groq_client, ChatBackend) else GroqBackend(groq_client)
         self.aggregation = statistics.mean
-        self.logger = logging.getLogger(__name__)
-        handler = logging.StreamHandler()  # Stream handler to output to the console
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
-        self.logger.propagate = False
-        
+        self.logger = logger
+        # time.monotonic() by which scoring must finish, set by score(timeout=...)
+        self.deadline = None
+        # Called with each sentence score as it is parsed, set by score(on_score=...)
+        self.on_score = None
+        # Chat completions made by this instance, which tells cache hits apart
+        self.requests_made = 0
+        # The model that served each stage, which differs from `model` after a fallback
+        self.served_models = {}
+        # In compact mode sentences are scored by index and rationales are optional
+        self.compact = compact
+        self.rationales = rationales
+
         if verbose:
             self.logger.setLevel(logging.INFO)  # Set to DEBUG to see all levels of logs
             self.logger.info("Verbose Mode is on.")
         else:
             self.logger.setLevel(logging.WARNING)
 
-    def groq_chat_completion(self, messages, model, temperature=0.5, response_format=None):
+    def time_left(self) -> float:
+        """
+        Seconds left before the deadline, None without one
+        """
+        if self.deadline is None:
+            return None
+        timeout = self.deadline - time.monotonic()
+        if timeout <= 0:
+            raise EvaluationTimeout()
+        return timeout
+
+    def groq_chat_completion(self, messages, model, temperature=0.5, response_format=None,
+                             stage: str = "decomposition"):
+        """
+        Chat completion through the metric's backend, Groq's API by default.
+        Under a deadline each call gets only the time that is left, so a slow
+        response cannot hold the evaluation past it.
+        """
+        self.requests_made += 1
+        with timed(stage, type(self).__name__, model):
+            response = self.backend.chat_completion(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                response_format=response_format,
+                timeout=self.time_left()
+            )
+        served_model = getattr(response, "model", None) or model
+        # Kept as a FallbackModel so results can tell a degraded stage apart
+        self.served_models[stage] = FallbackModel(served_model) if served_by_fallback(response) else served_model
+        return response
+
+    def parse(self, model: Type[BaseModel], content: str) -> BaseModel:
+        """
+        Validates a response against its pydantic model
+        """
+        with timed("parse", type(self).__name__, self.model, schema=model.__name__):
+            return model.model_validate_json(content)
+
+    @property
+    def score_model(self) -> Type[BaseModel]:
+        """
+        The pydantic model of one sentence score
+        """
+        return typing.get_args(self.scored_model.model_fields["scores"].annotation)[0]
+
+    def compact_instructions(self) -> str:
         """
-        Groq's chat completion API
+        The output format of compact mode: index and score pairs
         """
-        chat_completion = self.groq_client.chat.completions.create(
-            messages=messages,
-            model=model,
-            temperature=temperature,
-            response_format=response_format
+        if self.rationales is True:
+            rationale = "Add a short 'rationale' to every score. "
+        elif self.rationales is None or self.rationales is False:
+            rationale = "Do not include rationales. "
+        else:
+            direction = "below" if self.higher_is_better else "above"
+            rationale = f"Add a short 'rationale' only to scores of {self.rationales} or {direction}. "
+        return (
+            "Respond in compact form. The sentences are "
+            "numbered by their 'index'; do not repeat them. Return a JSON object with "
+            "a 'scores' array holding, for every sentence, its 'index' and its 'score'. "
+            f"{rationale}Use the following JSON schema for your output: {json_schema(CompactScores)}"
+        )
+
+    def scoring_request(self, sentences: List[str]) -> List[dict]:
+        """
+        The scoring messages of the metric. In compact mode the system prompt
+        is the metric's scoring instructions followed by the compact format.
+        """
+        if not self.compact:
+            return self.scoring_messages(sentences)
+        numbered = [{"index": index, "string": sentence} for index, sentence in enumerate(sentences)]
+        return [
+            {"role": "system", "content": f"{self.scoring_instructions}\n{self.compact_instructions()}"},
+            {"role": "user", "content": json.dumps({"sentences": numbered}, indent=2)}
+        ]
+
+    def expand(self, item: CompactScore, sentences: List[str]) -> BaseModel:
+        """
+        Rebuilds a full sentence score from a compact one
+        """
+        if not 0 <= item.index < len(sentences):
+            raise ValueError(f"The response scores sentence {item.index}, but only {len(sentences)} were sent")
+        return self.score_model(string=sentences[item.index], rationale=item.rationale or "", score=item.score)
+
+    def stream_scores(self, sentences: List[str]) -> Iterator[BaseModel]:
+        """
+        Streams a scoring completion and yields each sentence score as soon
+        as it has been generated. The content streamed so far is kept on
+        `self.streamed`. Closing the generator closes the response.
+        """
+        parser = IncrementalScoreParser(CompactScore if self.compact else self.score_model)
+        self.requests_made += 1
+        start = time.perf_counter()
+        chunks = self.backend.stream_chat_completion(
+            messages=self.scoring_request(sentences),
+            model=self.model,
+            temperature=0,
+            response_format={"type": "json_object"},
+            timeout=self.time_left()
         )
-        return chat_completion
+        try:
+            while True:
+                try:
+                    chunk = next(chunks)
+                except StopIteration as stop:
+                    self.served_models["scoring"] = stop.value or self.model
+                    break
+                for item in parser.feed(chunk):
+                    yield self.expand(item, sentences) if self.compact else item
+                self.streamed = parser.text
+                # The deadline is checked between chunks as the call's timeout only bounds each read
+                self.time_left()
+        finally:
+            chunks.close()
+            emit("scoring", type(self).__name__, self.model, time.perf_counter() - start, streamed=True)
 
     def check_data_types(self, **kwargs):
         """
-        Checks for empty strings in the arguments
+        Checks for empty strings in the arguments.
+        Inputs that are None have not been given yet and are skipped.
         """
         for key, value in kwargs.items():
-            if key != "verbose":
+            if key != "verbose" and value is not None:
                 if key != "context":
                     if value == "":
                         raise ValueError(f"'{key}' cannot be an empty string.")
@@ -54,7 +211,127 @@ class BaseMetric(ABC):
                     else:
                         if not all(isinstance(item, str) for item in value):
                             raise TypeError(f"All items in '{key}' must be strings")
-                        
+
+    def bind(self, **inputs) -> "BaseMetric":
+        """
+        Returns a copy of the metric that scores the given inputs.
+        The metric itself is left untouched, so one instance can be built once
+        and bound to many inputs.
+        """
+        unexpected = sorted(set(inputs) - set(self.inputs))
+        if unexpected:
+            raise TypeError(f"{type(self).__name__} got unexpected inputs: {', '.join(unexpected)}")
+        self.check_data_types(**inputs)
+        bound = copy.copy(self)
+        bound.served_models = {}
+        for key, value in inputs.items():
+            setattr(bound, key, value)
+        return bound
+
+    def fingerprint(self, **inputs) -> str:
+        """
+        A content hash of what determines a score: the metric, its inputs,
+        the model and the prompt version. Inputs not given here are taken
+        from the metric.
+        """
+        values = {key: inputs.get(key, getattr(self, key)) for key in self.inputs}
+        fields = [type(self).__name__, values, self.model, self.prompt_version]
+        options = getattr(self, "compress_context", False)
+        if options:
+            # Compression changes what the model sees
+            fields.append(["compress_context", options] if isinstance(options, dict) else "compress_context")
+        if self.compact:
+            fields.append(["compact", self.rationales])
+        payload = json.dumps(fields, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def compressed_context(self) -> Optional[CompressedContext]:
+        """
+        The retrieved context with duplicate chunks merged when `compress_context`
+        is on, None otherwise. `compress_context` may be a dict of options for
+        `compress_context()`, such as threshold and shingle_size. It is computed
+        once for each context.
+        """
+        options = getattr(self, "compress_context", False)
+        if not options or getattr(self, "context", None) is None:
+            return None
+        cached = getattr(self, "_compressed", None)
+        if cached is None or cached[0] is not self.context:
+            compressed = compress_context(self.context, **(options if isinstance(options, dict) else {}))
+            cached = self._compressed = (self.context, compressed)
+        return cached[1]
+
+    def context_sources(self, scored: Optional[BaseModel]) -> Optional[List[List[int]]]:
+        """
+        The positions in the original context that each scored sentence was
+        drawn from, when the context was compressed
+        """
+        compressed = self.compressed_context()
+        if compressed is None or scored is None:
+            return None
+        return [compressed.attribute(score.string) for score in scored.scores]
+
+    def score_decomposition(self, decomposition: BaseModel) -> BaseModel:
+        """
+        Scores the coherent sentences of a decomposition
+        """
+        # Filter out incoherent sentences
+        coherent_sentences = [s.string for s in decomposition.sentences if s.flag]
+        try:
+            return self.score_sentences(coherent_sentences)
+        except EvaluationTimeout as e:
+            e.decomposition = decomposition
+            raise
+
+    def scoring_messages(self, sentences: List[str]) -> List[dict]:
+        """
+        This method should be implemented by each child class
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    @property
+    def scoring_instructions(self) -> str:
+        """
+        The scoring criteria of the metric's prompt, without its output format.
+        This property should be implemented by each child class.
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    def score_sentences(self, sentences: List[str]) -> BaseModel:
+        """
+        Scores sentences with the metric's scoring prompt. When scores are
+        being watched with `on_score`, the response is streamed and each
+        score is passed on as soon as it has been parsed.
+        """
+        if self.on_score is None:
+            response = self.groq_chat_completion(
+                messages=self.scoring_request(sentences),
+                model=self.model,
+                temperature=0,
+                response_format={"type": "json_object"},
+                stage="scoring"
+            )
+            content = response.choices[0].message.content
+        else:
+            self.streamed = ""
+            for item in self.stream_scores(sentences):
+                self.on_score(item)
+            content = extract_json(self.streamed)
+        name = re.sub(r"(?<!^)(?=[A-Z])", " ", type(self).__name__)
+        self.logger.info("Breakdown of the %s Score: \n%s", name, content)
+        if self.compact:
+            compact = self.parse(CompactScores, content)
+            return self.scored_model(scores=[self.expand(item, sentences) for item in compact.scores])
+        return self.parse(self.scored_model, content)
+
+    @property
+    @abstractmethod
+    def decomposition_function(self):
+        """
+        This property should be implemented by each child class
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
     @property
     @abstractmethod
     def scoring_function(self):
@@ -63,21 +340,85 @@ class BaseMetric(ABC):
         """
         raise NotImplementedError("This method should be overridden by subclasses")
 
-    def score(self, aggregation = None):
+    def iter_scores(self, timeout: float = None, **inputs) -> Iterator[BaseModel]:
+        """
+        Yields each sentence score of the inputs as soon as it is parsed from
+        the streamed scoring response. Stopping early closes the response.
+        """
+        bound = self.bind(**inputs)
+        if timeout is not None:
+            bound.deadline = time.monotonic() + timeout
+        for key in bound.inputs:
+            if getattr(bound, key) is None:
+                raise ValueError(f"'{key}' must be given to score {type(self).__name__}")
+        decomposition = bound.decomposition_function()
+        sentences = [s.string for s in decomposition.sentences if s.flag]
+        yield from bound.stream_scores(sentences)
+
+    def score_threshold(self, threshold: Union[int, float]) -> ThresholdResult:
+        """
+        Decides whether the bound inputs stay under `threshold`, reading the
+        streamed scores only until one reaches it. An input without coherent
+        sentences passes without a scoring call.
+        """
+        decomposition = None
+        scores = []
+        try:
+            decomposition = self.decomposition_function()
+            sentences = [s.string for s in decomposition.sentences if s.flag]
+            if not sentences:
+                return ThresholdResult(threshold, True, decomposition=decomposition)
+            stream = self.stream_scores(sentences)
+            try:
+                for item in stream:
+                    scores.append(item)
+                    if self.on_score is not None:
+                        self.on_score(item)
+                    if item.score >= threshold:
+                        return ThresholdResult(threshold, False, scores, item, decomposition)
+            finally:
+                # Stops the generation of the remaining scores
+                stream.close()
+        except EvaluationTimeout:
+            return ThresholdResult(threshold, None, scores, decomposition=decomposition)
+        return ThresholdResult(threshold, True, scores, decomposition=decomposition)
+
+    def score(self, aggregation = None, timeout: float = None,
+              on_score: Callable[[BaseModel], None] = None, threshold: Union[int, float] = None,
+              **inputs) -> Union[ScoreResult, ThresholdResult]:
         """
         Aggregation of individual scores and final result.
+        Inputs passed here are scored in place of the ones the metric was created with.
+        With a `timeout` in seconds, in-flight calls are cut off once it has passed
+        and a timed out result is returned, holding the decomposition if it finished.
+        With `on_score`, the scoring response is streamed and the callback gets
+        each sentence score as soon as it has been parsed.
+        The returned ScoreResult can be re-aggregated without scoring again.
+        With a `threshold`, only max-aggregated metrics can be scored and a
+        ThresholdResult is returned instead, failing as soon as one sentence
+        scores at or above the threshold.
         """
-        if aggregation is not None:
-            self.aggregation = aggregation
-        scored_output, output_dictionary = self.scoring_function()
-        if scored_output.scores:
-            average_score = self.aggregation([output.score for output in scored_output.scores])
-            return {
-                'score': average_score,
-                'score_breakdown': output_dictionary
-            }
-        else:
-            return {
-                'score': 0,  # Default to 0 if there are no sentences to score
-                'score_breakdown': output_dictionary
-            }
+        if threshold is not None and (aggregation or self.aggregation) is not max:
+            raise ValueError(f"{type(self).__name__} is not aggregated with max, so it cannot be scored against a threshold")
+        if inputs or timeout is not None or on_score is not None:
+            bound = self.bind(**inputs)
+            if timeout is not None:
+                bound.deadline = time.monotonic() + timeout
+            if on_score is not None:
+                bound.on_score = on_score
+            return bound.score(aggregation, threshold=threshold)
+        for key in self.inputs:
+            if getattr(self, key) is None:
+                raise ValueError(f"'{key}' must be given to score {type(self).__name__}")
+        if threshold is not None:
+            return self.score_threshold(threshold)
+        requests_made = self.requests_made
+        try:
+            scored_output = self.scoring_function()
+            if self.requests_made == requests_made:
+                emit("cache_hit", type(self).__name__, self.model)
+        except EvaluationTimeout as e:
+            return ScoreResult(None, aggregation or self.aggregation, decomposition=e.decomposition,
+                               models=dict(self.served_models))
+        return ScoreResult(scored_output, aggregation or self.aggregation, models=dict(self.served_models),
+                           context_sources=self.context_sources(scored_output))
@@ -1,10 +1,11 @@
 # groqeval/metrics/faithfulness.py
 import json
+import threading
 from typing import List
 from groq import Groq
 from cachetools import cached, TTLCache
 from groqeval.models.output import Output, ScoredOutput
-from groqeval.metrics.base_metric import BaseMetric
+from groqeval.metrics.base_metric import BaseMetric, json_schema
 
 class Faithfulness(BaseMetric):
     """
@@ -13,48 +14,50 @@ class Faithfulness(BaseMetric):
     content is not only relevant but also accurate and truthful with respect to the given context, 
     critical for maintaining the integrity and reliability of the model's responses.
     """
-    def __init__(self, groq_client: Groq, context: List[str], output: str, **kwargs):
-        super().__init__(groq_client, kwargs.get('verbose'))
+    inputs = ('context', 'output')
+    scored_model = ScoredOutput
+    decomposition_inputs = ('output',)
+
+    def __init__(self, groq_client: Groq, context: List[str] = None, output: str = None, **kwargs):
+        super().__init__(groq_client, kwargs.get('verbose'), kwargs.get('compact', False), kwargs.get('rationales'))
         self.context = context
+        self.compress_context = kwargs.get('compress_context', False)
         self.output = output        
         self.check_data_types(context=context, output=output)
 
-    @property
-    def output_decomposition_prompt(self):
-        """
-        Prompt to decompose the language model output into phrases and evaluate for claims.
-        """
-        json_representation = json.dumps(Output.model_json_schema(), indent=2)
-        return (
-            "Please process the following output from a language model and decompose it into "
-            "individual phrases or chunks. For each phrase or chunk, evaluate whether it can "
-            "be considered a claim based on its form as a declarative construct that communicates "
-            "information, opinions, or beliefs. A phrase or chunk should be marked as a claim "
-            "(true) if it forms a clear, standalone declaration, conveying a specific assertion "
-            "or point. Phrases or chunks that are overly vague, purely interrogative, or function "
-            "as connective phrases without substantial declarative content should be marked as not "
-            "claims (false). Return the results in a JSON format. The JSON should have an array of "
-            "objects, each representing a phrase or chunk with two properties: a 'string' that "
-            "contains the text of the claim, and a 'flag' that is a boolean indicating whether "
-            "the text is considered a claim (true) or not (false). Use the following JSON schema "
-            f"for your output: {json_representation}"
-        )
+    # Prompt to decompose the language model output into phrases and evaluate for claims.
+    output_decomposition_prompt = (
+        "Please process the following output from a language model and decompose it into "
+        "individual phrases or chunks. For each phrase or chunk, evaluate whether it can "
+        "be considered a claim based on its form as a declarative construct that communicates "
+        "information, opinions, or beliefs. A phrase or chunk should be marked as a claim "
+        "(true) if it forms a clear, standalone declaration, conveying a specific assertion "
+        "or point. Phrases or chunks that are overly vague, purely interrogative, or function "
+        "as connective phrases without substantial declarative content should be marked as not "
+        "claims (false). Return the results in a JSON format. The JSON should have an array of "
+        "objects, each representing a phrase or chunk with two properties: a 'string' that "
+        "contains the text of the claim, and a 'flag' that is a boolean indicating whether "
+        "the text is considered a claim (true) or not (false). Use the following JSON schema "
+        f"for your output: {json_schema(Output)}"
+    )
 
 
     @property
     def format_retrieved_context(self):
         """
         Formats the retrieved context which is a List[str] into a string.
+        With `compress_context`, duplicate and near-duplicate chunks are sent once.
         """
-        formatted_strings = "\n".join(f"- {s}" for s in self.context)
+        compressed = self.compressed_context()
+        chunks = compressed.chunks if compressed is not None else self.context
+        formatted_strings = "\n".join(f"- {s}" for s in chunks)
         return f"The retrieved context includes the following items:\n{formatted_strings}"
 
     @property
-    def faithfulness_prompt(self):
+    def scoring_instructions(self):
         """
-        Prompt to score each claim made in the output for alignment with the retrieved context.
+        How each claim is scored against the retrieved context, without the output format.
         """
-        json_schema = json.dumps(ScoredOutput.model_json_schema(), indent=2)
         return (
             f"Given the context: '{self.format_retrieved_context}', evaluate the truthfulness "
             "of the following claims. Score each claim on a scale from 1 to 10, where 1 means "
@@ -63,9 +66,19 @@ class Faithfulness(BaseMetric):
             "of scores is utilized, not just the two extremes, to prevent the scoring from "
             "being binary in nature. Any claim supported in the context should score over 5. "
             "Claims that are true but not supported by the context should score less than 5 "
-            "but near to it. Include a rationale for each score to explain why the claim "
+            "but near to it."
+        )
+
+    @property
+    def faithfulness_prompt(self):
+        """
+        Prompt to score each claim made in the output for alignment with the retrieved context.
+        """
+        schema = json_schema(ScoredOutput)
+        return (
+            f"{self.scoring_instructions} Include a rationale for each score to explain why the claim "
             "received that rating based on the facts presented in the context. Use the "
-            f"following JSON schema for your output: {json_schema}"
+            f"following JSON schema for your output: {schema}"
         )
 
 
@@ -83,15 +96,14 @@ class Faithfulness(BaseMetric):
         ]
         response = self.groq_chat_completion(
             messages=messages,
-            model="llama3-70b-8192",
+            model=self.model,
             temperature=0,
             response_format={"type": "json_object"}
         )
         self.logger.info("Decomposition of the Output into Claims: \n%s", response.choices[0].message.content)
-        return Output.model_validate_json(response.choices[0].message.content)
+        return self.parse(Output, response.choices[0].message.content)
 
-    @cached(cache=TTLCache(maxsize=100, ttl=300))
-    def score_faithfulness(self):
+    def scoring_messages(self, sentences):
         """
         Claims are then scored on a scale from 1 to 10. 
         A score from 1 to 4 is assigned to claims that 
@@ -101,22 +113,19 @@ class Faithfulness(BaseMetric):
         A score of 5 or above is reserved for claims that are both 
         factually true and corroborated by the context. 
         """
-        decomposed_output = self.output_decomposition()
-        # Filter out incoherent sentences
-        coherent_sentences = [s for s in decomposed_output.sentences if s.flag]
-        messages = [
+        return [
             {"role": "system", "content": self.faithfulness_prompt},
-            {"role": "user", "content": json.dumps({"sentences": [s.string for s in coherent_sentences]}, indent=2)}
+            {"role": "user", "content": json.dumps({"sentences": sentences}, indent=2)}
         ]
-        response = self.groq_chat_completion(
-            messages=messages,
-            model="llama3-70b-8192",
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
-        self.logger.info("Breakdown of the Faithfulness Score: \n%s", response.choices[0].message.content)
-        return ScoredOutput.model_validate_json(response.choices[0].message.content), json.loads(response.choices[0].message.content)
-    
+
+    @cached(cache=TTLCache(maxsize=100, ttl=300), lock=threading.Lock())
+    def score_faithfulness(self):
+        return self.score_decomposition(self.output_decomposition())
+
+    @property
+    def decomposition_function(self):
+        return self.output_decomposition
+
     @property
     def scoring_function(self):
         return self.score_faithfulness
@@ -1,10 +1,11 @@
 # groqeval/metrics/hallucination.py
 import json
+import threading
 from typing import List
 from groq import Groq
 from cachetools import cached, TTLCache
 from groqeval.models.context import Context, ScoredContext
-from groqeval.metrics.base_metric import BaseMetric
+from groqeval.metrics.base_metric import BaseMetric, json_schema
 
 class Hallucination(BaseMetric):
     """
@@ -14,44 +15,42 @@ class Hallucination(BaseMetric):
     This is crucial for ensuring that the generated outputs remain grounded in the provided 
     context and do not mislead or introduce inaccuracies.
     """
-    def __init__(self, groq_client: Groq, context: List[str], output: str, **kwargs):
-        super().__init__(groq_client, kwargs.get('verbose'))
+    inputs = ('context', 'output')
+    scored_model = ScoredContext
+    decomposition_inputs = ('context',)
+
+    def __init__(self, groq_client: Groq, context: List[str] = None, output: str = None, **kwargs):
+        super().__init__(groq_client, kwargs.get('verbose'), kwargs.get('compact', False), kwargs.get('rationales'))
         self.context = context
+        self.compress_context = kwargs.get('compress_context', False)
         self.output = output
         self.check_data_types(context=context, output=output)
 
 
-    @property
-    def context_decomposition_prompt(self):
-        """
-        Prompt to decompose the context retrieved in response to a given prompt 
-        into phrases and evaluate for statements.
-        """
-        json_representation = json.dumps(Context.model_json_schema(), indent=2)
-        return (
-            "Please process the following context retrieved in response to a given prompt "
-            "and decompose it into individual phrases or chunks. For each phrase or chunk, "
-            "evaluate whether it can be considered a statement based on its form as a "
-            "declarative construct that communicates information, opinions, or beliefs. A "
-            "phrase should be marked as a statement (true) if it forms a clear, standalone "
-            "declaration. Phrases that are overly vague, questions, or merely connective "
-            "phrases without any declarative content should be marked as not statements "
-            "(false). Return the results in a JSON format. The JSON should have an array "
-            "of objects, each representing a phrase with two properties: a 'string' that "
-            "contains the phrase text, and a 'flag' that is a boolean indicating whether "
-            "the text is considered a statement (true) or not (false). Use the following "
-            f"JSON schema for your output: {json_representation}"
-        )
+    # Prompt to decompose the context retrieved in response to a given prompt into phrases and evaluate for statements.
+    context_decomposition_prompt = (
+        "Please process the following context retrieved in response to a given prompt "
+        "and decompose it into individual phrases or chunks. For each phrase or chunk, "
+        "evaluate whether it can be considered a statement based on its form as a "
+        "declarative construct that communicates information, opinions, or beliefs. A "
+        "phrase should be marked as a statement (true) if it forms a clear, standalone "
+        "declaration. Phrases that are overly vague, questions, or merely connective "
+        "phrases without any declarative content should be marked as not statements "
+        "(false). Return the results in a JSON format. The JSON should have an array "
+        "of objects, each representing a phrase with two properties: a 'string' that "
+        "contains the phrase text, and a 'flag' that is a boolean indicating whether "
+        "the text is considered a statement (true) or not (false). Use the following "
+        f"JSON schema for your output: {json_schema(Context)}"
+    )
 
 
     @property
-    def hallucination_prompt(self):
+    def alignment_criteria(self):
         """
-        Prompt to evaluate each context for alignment or contradiction 
-        with the given output.
+        How each context is scored for alignment with the output, as the text
+        before and after the rationale requirement of the scoring prompt
         """
-        json_schema = json.dumps(ScoredContext.model_json_schema(), indent=2)
-        return (
+        before = (
             f"Given the output: '{self.output}', critically evaluate each context "
             "to determine if there are contradictions or alignments with the output. "
             "Assign a score from 1 to 10, where 1 indicates a complete contradiction "
@@ -62,14 +61,38 @@ class Hallucination(BaseMetric):
             "by the context, even if these are accurate elsewhere. The context is the definitive "
             "source for evaluations. If the output claims to resolve an issue like variability "
             "in renewable energy—which the context still presents as ongoing—this should be seen "
-            "as a contradiction, not a partial alignment. Each score must include a rationale that "
-            "explicitly states why the output either aligns with or contradicts the context, "
-            "highlighting specific discrepancies or agreements. Pay particular attention to "
+            "as a contradiction, not a partial alignment."
+        )
+        after = (
+            "Pay particular attention to "
             "assertions about solutions or improvements that contradict unresolved issues "
             "presented in the context. Scores around 5 should be reserved for outputs that "
             "neither clearly align nor contradict but may introduce unrelated or ambiguous "
-            "elements. Ensure evaluations are formatted according to the JSON schema provided: "
-            f"{json_schema}"
+            "elements."
+        )
+        return before, after
+
+    @property
+    def scoring_instructions(self):
+        """
+        How each context is scored for alignment with the output, without the output format.
+        """
+        return " ".join(self.alignment_criteria)
+
+    @property
+    def hallucination_prompt(self):
+        """
+        Prompt to evaluate each context for alignment or contradiction 
+        with the given output.
+        """
+        schema = json_schema(ScoredContext)
+        before, after = self.alignment_criteria
+        return (
+            f"{before} Each score must include a rationale that "
+            "explicitly states why the output either aligns with or contradicts the context, "
+            f"highlighting specific discrepancies or agreements. {after} "
+            "Ensure evaluations are formatted according to the JSON schema provided: "
+            f"{schema}"
         )
 
 
@@ -77,8 +100,11 @@ class Hallucination(BaseMetric):
     def format_retrieved_context(self):
         """
         Formats the retrieved context which is a List[str] into a string.
+        With `compress_context`, duplicate and near-duplicate chunks are sent once.
         """
-        formatted_strings = "\n".join(f"- {s}" for s in self.context)
+        compressed = self.compressed_context()
+        chunks = compressed.chunks if compressed is not None else self.context
+        formatted_strings = "\n".join(f"- {s}" for s in chunks)
         return f"The retrieved context includes the following items:\n{formatted_strings}"
 
 
@@ -92,35 +118,31 @@ class Hallucination(BaseMetric):
         ]
         response = self.groq_chat_completion(
             messages=messages,
-            model="llama3-70b-8192",
+            model=self.model,
             temperature=0,
             response_format={"type": "json_object"}
         )
         self.logger.info("Decomposition of the Context into Statements: \n%s", response.choices[0].message.content)
-        return Context.model_validate_json(response.choices[0].message.content)
+        return self.parse(Context, response.choices[0].message.content)
     
-    @cached(cache=TTLCache(maxsize=100, ttl=300))
-    def score_hallucination(self):
+    def scoring_messages(self, sentences):
         """
         The hallucination metric evaluates the alignment between an output and its context, 
         scoring each context statement on a scale from 1 (complete contradiction) to 10 (full alignment). 
         """
-        decomposed_context = self.context_decomposition()
-        # Filter out incoherent sentences
-        coherent_sentences = [s for s in decomposed_context.sentences if s.flag]
-        messages = [
+        return [
             {"role": "system", "content": self.hallucination_prompt},
-            {"role": "user", "content": json.dumps({"sentences": [s.string for s in coherent_sentences]}, indent=2)}
+            {"role": "user", "content": json.dumps({"sentences": sentences}, indent=2)}
         ]
-        response = self.groq_chat_completion(
-            messages=messages,
-            model="llama3-70b-8192",
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
-        self.logger.info("Breakdown of the Hallucination Score: \n%s", response.choices[0].message.content)
-        return ScoredContext.model_validate_json(response.choices[0].message.content), json.loads(response.choices[0].message.content)
-    
+
+    @cached(cache=TTLCache(maxsize=100, ttl=300), lock=threading.Lock())
+    def score_hallucination(self):
+        return self.score_decomposition(self.context_decomposition())
+
+    @property
+    def decomposition_function(self):
+        return self.context_decomposition
+
     @property
     def scoring_function(self):
         return self.score_hallucination
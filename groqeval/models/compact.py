@@ -0,0 +1,17 @@
+# groqeval/models/compact.py
+from typing import List, Optional
+from pydantic import BaseModel
+
+class CompactScore(BaseModel):
+    """
+    Score of an Individual Deconstruct, referenced by its position
+    """
+    index: int
+    score: int
+    rationale: Optional[str] = None
+
+class CompactScores(BaseModel):
+    """
+    A List of Compact Scores
+    """
+    scores: List[CompactScore]
@@ -0,0 +1,117 @@
+# groqeval/monitor.py
+import random
+import statistics
+import threading
+from collections import deque
+from typing import Dict, List
+
+
+class OnlineMonitor:
+    """
+    Evaluates a sample of live traffic in the background.
+    `submit` never blocks the caller on evaluation: events are sampled at
+    `sample_rate` and put in a bounded ring buffer that background workers
+    drain. When the buffer is full, `drop_policy` decides whether the oldest
+    queued event or the incoming one is dropped. Rolling aggregates over the
+    last `window` results of each metric can be read at any time with `snapshot`.
+    """
+    drop_policies = ("oldest", "newest")
+
+    def __init__(self, evaluator, metrics: List[str], sample_rate: float = 0.01, capacity: int = 1000,
+                 drop_policy: str = "oldest", workers: int = 2, window: int = 1000,
+                 timeout: float = None, seed: int = None):
+        if drop_policy not in self.drop_policies:
+            raise ValueError(f"drop_policy must be one of {', '.join(self.drop_policies)}")
+        self.metrics = {metric_name: evaluator.metric(metric_name) for metric_name in metrics}
+        self.sample_rate = sample_rate
+        self.drop_policy = drop_policy
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.buffer = deque(maxlen=capacity)
+        self.condition = threading.Condition()
+        self.results = {metric_name: deque(maxlen=window) for metric_name in metrics}
+        self.counters = {"submitted": 0, "sampled": 0, "dropped": 0, "evaluated": 0, "failed": 0}
+        self.closed = False
+        self.workers = [
+            threading.Thread(target=self._work, name=f"groqeval-monitor-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        self.close()
+
+    def submit(self, prompt: str = None, context: List[str] = None, output: str = None) -> bool:
+        """
+        Offers an event for evaluation. Returns whether it was sampled and queued.
+        """
+        with self.condition:
+            self.counters["submitted"] += 1
+            if self.closed or self.random.random() >= self.sample_rate:
+                return False
+            self.counters["sampled"] += 1
+            if len(self.buffer) == self.buffer.maxlen:
+                self.counters["dropped"] += 1
+                if self.drop_policy == "newest":
+                    return False
+            # A full deque drops its oldest entry on append
+            self.buffer.append({"prompt": prompt, "context": context, "output": output})
+            self.condition.notify()
+            return True
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self.buffer and not self.closed:
+                    self.condition.wait()
+                if not self.buffer:
+                    return
+                event = self.buffer.popleft()
+            for metric_name, metric in self.metrics.items():
+                inputs = {key: event[key] for key in metric.inputs if event.get(key) is not None}
+                try:
+                    score = metric.score(timeout=self.timeout, **inputs).score
+                except Exception:
+                    score = None
+                with self.condition:
+                    self.counters["evaluated"] += 1
+                    if score is None:
+                        self.counters["failed"] += 1
+                    else:
+                        self.results[metric_name].append(score)
+
+    def snapshot(self) -> Dict:
+        """
+        Traffic counters and rolling aggregates of every metric
+        """
+        with self.condition:
+            counters = dict(self.counters, queued=len(self.buffer))
+            windows = {metric_name: list(scores) for metric_name, scores in self.results.items()}
+        return {
+            "counters": counters,
+            "metrics": {
+                metric_name: {
+                    "count": len(scores),
+                    "mean": statistics.fmean(scores) if scores else None,
+                    "min": min(scores) if scores else None,
+                    "max": max(scores) if scores else None
+                }
+                for metric_name, scores in windows.items()
+            }
+        }
+
+    def close(self, wait: bool = True):
+        """
+        Stops accepting events. Queued events are still evaluated, and with
+        `wait` this returns once the workers have drained the buffer.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if wait:
+            for worker in self.workers:
+                worker.join()
@@ -0,0 +1,185 @@
+# groqeval/pool.py
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Union
+from groq import Groq, APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+from groqeval.backends import ChatBackend, GroqBackend, parse_duration
+from groqeval.exceptions import EvaluationTimeout
+from groqeval.telemetry import emit
+
+
+class PooledKey:
+    """
+    One key of a pool with its last known limits and its usage
+    """
+    def __init__(self, name: str, client: Groq, owned: bool = False):
+        self.name = name
+        self.client = client
+        # Clients passed in by the caller are theirs to close
+        self.owned = owned
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.reset_at = None
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+        self.usage = {"requests": 0, "throttled": 0, "failed": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def headroom(self):
+        """
+        How much quota is left, unknown limits counting as plenty.
+        Requests already in flight are taken off what the headers last said.
+        """
+        requests = float("inf") if self.remaining_requests is None else self.remaining_requests - self.in_flight
+        tokens = float("inf") if self.remaining_tokens is None else self.remaining_tokens
+        return (requests, tokens, -self.in_flight)
+
+    def update_limits(self, headers, now: float):
+        """
+        Reads the rate limit headers of a response
+        """
+        requests = headers.get("x-ratelimit-remaining-requests")
+        tokens = headers.get("x-ratelimit-remaining-tokens")
+        if requests is not None:
+            self.remaining_requests = int(float(requests))
+        if tokens is not None:
+            self.remaining_tokens = int(float(tokens))
+        resets = [
+            parse_duration(headers.get(header))
+            for header in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+        ]
+        resets = [reset for reset in resets if reset is not None]
+        self.reset_at = now + max(resets) if resets else None
+        # An exhausted key sits out until its window resets
+        if self.remaining_requests == 0 or self.remaining_tokens == 0:
+            self.cooldown_until = max(self.cooldown_until, self.reset_at or now + 1.0)
+
+
+class KeyPoolBackend(ChatBackend):
+    """
+    Spreads completions over several Groq keys or clients.
+    Each request goes to the available key with the most remaining quota as
+    reported by the rate limit headers of its last response. A throttled key
+    sits out until its limit resets, or for `retry-after`, and a failing one
+    for `failure_cooldown` seconds, while the request is retried on another.
+    """
+    def __init__(self, keys: List[Union[str, Groq]], failure_cooldown: float = 10.0,
+                 max_attempts: int = None, **client_options):
+        if not keys:
+            raise ValueError("A key pool needs at least one key")
+        client_options.setdefault("max_retries", 0)
+        self.keys = []
+        for position, key in enumerate(keys):
+            if isinstance(key, str):
+                self.keys.append(PooledKey(f"{position}:...{key[-4:]}", Groq(api_key=key, **client_options), owned=True))
+            else:
+                self.keys.append(PooledKey(f"{position}:client", key))
+        self.failure_cooldown = failure_cooldown
+        self.max_attempts = max_attempts or 2 * len(self.keys)
+        self.lock = threading.Lock()
+
+    def acquire(self, deadline: Optional[float]) -> PooledKey:
+        """
+        Takes the available key with the most headroom, waiting for the first
+        cooldown to end when every key is sitting out
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                available = [key for key in self.keys if key.cooldown_until <= now]
+                if available:
+                    key = max(available, key=PooledKey.headroom)
+                    key.in_flight += 1
+                    return key
+                wait = min(key.cooldown_until for key in self.keys) - now
+            if deadline is not None and now + wait >= deadline:
+                raise EvaluationTimeout()
+            time.sleep(wait)
+
+    def release(self, key: PooledKey, response=None, error: Exception = None):
+        """
+        Records the outcome of a request on its key
+        """
+        with self.lock:
+            now = time.monotonic()
+            key.in_flight -= 1
+            key.usage["requests"] += 1
+            if response is not None:
+                key.update_limits(response.headers, now)
+            if isinstance(error, RateLimitError):
+                key.usage["throttled"] += 1
+                key.update_limits(error.response.headers, now)
+                retry_after = parse_duration(error.response.headers.get("retry-after"))
+                key.cooldown_until = max(key.cooldown_until, now + (retry_after or 1.0), key.reset_at or 0.0)
+            elif error is not None:
+                key.usage["failed"] += 1
+                key.cooldown_until = max(key.cooldown_until, now + self.failure_cooldown)
+
+    def chat_completion(self, messages, model, temperature=0.5, response_format=None, timeout: float = None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for attempt in range(self.max_attempts):
+            key = self.acquire(deadline)
+            client = key.client
+            if deadline is not None:
+                client = client.with_options(timeout=deadline - time.monotonic(), max_retries=0)
+            try:
+                raw = client.chat.completions.with_raw_response.create(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    response_format=response_format
+                )
+            except APITimeoutError as e:
+                self.release(key)
+                raise EvaluationTimeout() from e
+            except (APIStatusError, APIConnectionError) as e:
+                if isinstance(e, APIStatusError) and e.status_code != 429 and e.status_code < 500:
+                    # The request itself is wrong, another key would not help
+                    self.release(key)
+                    raise
+                self.release(key, error=e)
+                if attempt == self.max_attempts - 1:
+                    raise
+                emit("retry", model=model, status=getattr(e, "status_code", None), key=key.name, attempt=attempt + 1)
+                continue
+            self.release(key, response=raw)
+            completion = raw.parse()
+            usage = getattr(completion, "usage", None)
+            if usage is not None:
+                with self.lock:
+                    key.usage["prompt_tokens"] += usage.prompt_tokens or 0
+                    key.usage["completion_tokens"] += usage.completion_tokens or 0
+            return completion
+
+    def stream_chat_completion(self, messages, model, temperature=0.5, response_format=None,
+                               timeout: float = None) -> Iterator[str]:
+        key = self.acquire(time.monotonic() + timeout if timeout is not None else None)
+        error = None
+        try:
+            return (yield from GroqBackend(key.client).stream_chat_completion(
+                messages, model, temperature, response_format, timeout
+            ))
+        except (RateLimitError, APIConnectionError) as e:
+            error = e
+            raise
+        finally:
+            self.release(key, error=error)
+
+    def usage(self) -> Dict[str, Dict]:
+        """
+        Requests, throttles, failures and tokens of every key, with its last known limits
+        """
+        with self.lock:
+            return {
+                key.name: dict(
+                    key.usage,
+                    remaining_requests=key.remaining_requests,
+                    remaining_tokens=key.remaining_tokens,
+                    cooling_down=key.cooldown_until > time.monotonic()
+                )
+                for key in self.keys
+            }
+
+    def close(self):
+        for key in self.keys:
+            if key.owned:
+                key.client.close()
@@ -0,0 +1,111 @@
+# groqeval/report.py
+from typing import Callable, Dict, Iterable, Mapping, Sequence, Union
+from groqeval.results import ResultTable
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("groqeval.report requires numpy. Install it with `pip install groqeval[report]`") from e
+
+
+class Report:
+    """
+    Dataset level summaries over a ResultTable.
+    The table's score columns are copied into NumPy arrays in one pass, so
+    every statistic is computed in vectorized form whatever the size of the run.
+    The report covers the rows the table held when it was built, and the table
+    can keep growing. Failed records are counted but left out of the statistics.
+    """
+    def __init__(self, table: ResultTable):
+        self.table = table
+        # Copies, as views would stop the table's arrays from growing
+        self.scores = np.array(table.row_score, dtype=np.float64)
+        self.metric_ids = np.array(table.row_metric, dtype=np.uint16)
+        self.record_ids = np.array(table.row_record, dtype=np.uint32)
+
+    @classmethod
+    def from_results(cls, results: Iterable[Dict]) -> "Report":
+        """
+        Builds a report from batch results
+        """
+        return cls(ResultTable.from_results(results))
+
+    def metric_scores(self, metric: str) -> np.ndarray:
+        """
+        The successful scores of `metric`
+        """
+        scores = self.scores[self.metric_ids == self.table.metric_id(metric)]
+        return scores[~np.isnan(scores)]
+
+    def summary(self, percentiles: Sequence[float] = (5, 25, 50, 75, 95)) -> Dict[str, Dict]:
+        """
+        Count, mean, spread and percentiles of every metric
+        """
+        summary = {}
+        for metric in self.table.metrics:
+            rows = self.scores[self.metric_ids == self.table.metric_id(metric)]
+            scores = rows[~np.isnan(rows)]
+            stats = {"count": int(scores.size), "failed": int(rows.size - scores.size)}
+            if scores.size:
+                stats.update({
+                    "mean": float(scores.mean()),
+                    "std": float(scores.std(ddof=1)) if scores.size > 1 else 0.0,
+                    "min": float(scores.min()),
+                    "max": float(scores.max()),
+                    "percentiles": dict(zip(percentiles, np.percentile(scores, percentiles).tolist()))
+                })
+            summary[metric] = stats
+        return summary
+
+    def histogram(self, metric: str, bins: Union[int, Sequence[float]] = 10,
+                  score_range=(0, 10)) -> Dict[str, list]:
+        """
+        Histogram of the scores of `metric`
+        """
+        counts, edges = np.histogram(self.metric_scores(metric), bins=bins, range=score_range)
+        return {"counts": counts.tolist(), "edges": edges.tolist()}
+
+    def by_segment(self, segments: Union[Mapping, Callable]) -> Dict[str, Dict]:
+        """
+        Mean score and count of every metric per segment.
+        `segments` maps a record id to its segment, either as a mapping or a function.
+        Records without a segment are grouped under None.
+        """
+        lookup = segments.get if isinstance(segments, Mapping) else segments
+        labels = [lookup(key) for key in self.table.record_keys]
+        segment_names, segment_of_record = np.unique(np.array(labels, dtype=object).astype(str), return_inverse=True)
+        names = {str(label): label for label in labels}
+        row_segments = segment_of_record[self.record_ids]
+        valid = ~np.isnan(self.scores)
+
+        breakdown = {}
+        for metric in self.table.metrics:
+            mask = valid & (self.metric_ids == self.table.metric_id(metric))
+            counts = np.bincount(row_segments[mask], minlength=segment_names.size)
+            totals = np.bincount(row_segments[mask], weights=self.scores[mask], minlength=segment_names.size)
+            breakdown[metric] = {
+                names[name]: {"count": int(count), "mean": float(total / count)}
+                for name, count, total in zip(segment_names, counts, totals) if count
+            }
+        return breakdown
+
+    def bootstrap_ci(self, metric: str, confidence: float = 0.95, resamples: int = 1000,
+                     statistic: Callable = np.mean, seed: int = None,
+                     max_chunk_elements: int = 10_000_000) -> Dict[str, float]:
+        """
+        Percentile bootstrap confidence interval for `statistic` of `metric`.
+        `statistic` must accept an `axis` argument, as NumPy reductions do.
+        Resamples are drawn in chunks of at most `max_chunk_elements` values to bound memory.
+        """
+        scores = self.metric_scores(metric)
+        if scores.size == 0:
+            raise ValueError(f"No successful scores for metric '{metric}'")
+        rng = np.random.default_rng(seed)
+        chunk = max(1, max_chunk_elements // scores.size)
+        estimates = np.concatenate([
+            statistic(scores[rng.integers(0, scores.size, size=(min(chunk, resamples - done), scores.size))], axis=1)
+            for done in range(0, resamples, chunk)
+        ])
+        alpha = (1 - confidence) / 2
+        low, high = np.quantile(estimates, [alpha, 1 - alpha])
+        return {"estimate": float(statistic(scores)), "low": float(low), "high": float(high)}
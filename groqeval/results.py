@@ -0,0 +1,396 @@
+# groqeval/results.py
+import json
+import math
+from array import array
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+from pydantic import BaseModel
+from groqeval.backends import FallbackModel
+
+# The error recorded for a ScoreResult that ran past its deadline, as batch runs record it
+TIMEOUT_ERROR = "EvaluationTimeout: The evaluation deadline has passed"
+
+
+class ScoreResult(Mapping):
+    """
+    The result of scoring one input with a metric.
+    It keeps the validated per-sentence scores and can be re-aggregated with
+    any function, any number of times, without calling the model again.
+    For compatibility it reads like the dictionary `score()` used to return,
+    with 'score' and 'score_breakdown' keys.
+    A result without `scored` timed out. Its score is None and `decomposition`
+    holds the decomposed input if that stage had finished.
+    `models` maps each stage to the model that served it, and `fallback` is
+    True when a circuit breaker's fallback served any of them. When the context
+    was compressed, `context_sources[i]` holds the positions in the original
+    context of the chunks sentence i of the breakdown was drawn from.
+    """
+    _keys = ("score", "score_breakdown")
+
+    def __init__(self, scored: Optional[BaseModel], aggregation: Callable, decomposition: BaseModel = None,
+                 models: Dict[str, str] = None, context_sources: List[List[int]] = None):
+        self.scored = scored
+        self.aggregation = aggregation
+        self.decomposition = decomposition
+        self.models = models or {}
+        self.context_sources = context_sources
+
+    @property
+    def timed_out(self) -> bool:
+        """
+        Whether the evaluation ran past its deadline
+        """
+        return self.scored is None
+
+    @property
+    def fallback(self) -> bool:
+        """
+        Whether any stage was served by a circuit breaker's fallback
+        """
+        return any(isinstance(model, FallbackModel) for model in self.models.values())
+
+    @property
+    def scores(self) -> List[int]:
+        """
+        The raw score of every sentence
+        """
+        if self.timed_out:
+            return []
+        return [score.score for score in self.scored.scores]
+
+    def aggregate(self, aggregation: Callable = None) -> Union[int, float, None]:
+        """
+        Aggregates the sentence scores with `aggregation`, or with the
+        metric's default. Returns 0 when there were no sentences to score.
+        """
+        if self.timed_out:
+            return None
+        scores = self.scores
+        if not scores:
+            return 0
+        return (aggregation or self.aggregation)(scores)
+
+    @property
+    def score(self) -> Union[int, float]:
+        """
+        The score under the aggregation the result was created with
+        """
+        return self.aggregate()
+
+    @property
+    def score_breakdown(self) -> Optional[Dict]:
+        """
+        The per-sentence strings, rationales and scores
+        """
+        if self.timed_out:
+            return None
+        return self.scored.model_dump()
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def to_dict(self) -> Dict:
+        """
+        A plain, JSON serialisable dictionary of the result
+        """
+        result = dict(self)
+        if self.models:
+            result["models"] = {stage: str(model) for stage, model in self.models.items()}
+        if self.fallback:
+            result["fallback"] = True
+        if self.context_sources is not None:
+            result["context_sources"] = self.context_sources
+        if self.timed_out:
+            result["timed_out"] = True
+            if self.decomposition is not None:
+                result["decomposition"] = self.decomposition.model_dump()
+        return result
+
+    def __repr__(self):
+        return f"{type(self).__name__}(score={self.score!r}, scores={self.scores!r})"
+
+
+class ThresholdResult:
+    """
+    Whether an input stayed under a threshold of a max-aggregated metric.
+    It fails at the first sentence scoring at or above the threshold, which
+    is kept as `crossing`; `scores` holds the sentence scores read until then.
+    `passed` is None when the evaluation timed out before a decision.
+    """
+    def __init__(self, threshold: Union[int, float], passed: Optional[bool], scores: List[BaseModel] = None,
+                 crossing: BaseModel = None, decomposition: BaseModel = None):
+        self.threshold = threshold
+        self.passed = passed
+        self.scores = scores or []
+        self.crossing = crossing
+        self.decomposition = decomposition
+
+    @property
+    def timed_out(self) -> bool:
+        """
+        Whether the evaluation ran past its deadline
+        """
+        return self.passed is None
+
+    def __bool__(self):
+        return bool(self.passed)
+
+    def to_dict(self) -> Dict:
+        """
+        A plain, JSON serialisable dictionary of the result
+        """
+        result = {
+            "threshold": self.threshold,
+            "passed": self.passed,
+            "crossing": self.crossing.model_dump() if self.crossing is not None else None,
+            "scores": [score.model_dump() for score in self.scores]
+        }
+        if self.timed_out:
+            result["timed_out"] = True
+        return result
+
+    def __repr__(self):
+        return f"{type(self).__name__}(threshold={self.threshold!r}, passed={self.passed!r})"
+
+
+class TextStore:
+    """
+    Holds the free text of a result table (sentences, rationales and errors).
+    In memory every distinct string is kept once and referenced by id. When a
+    `path` is given the text is appended to that file instead and referenced
+    by byte offset, so it costs nothing in memory.
+    """
+    def __init__(self, path: str = None):
+        self.path = path
+        self._ids: Dict[str, int] = {}
+        self._strings: List[str] = []
+        self._file = open(path, "a+b") if path else None
+
+    def add(self, text: str) -> int:
+        """
+        Stores `text` and returns its reference
+        """
+        if self._file is not None:
+            self._file.seek(0, 2)
+            offset = self._file.tell()
+            self._file.write(json.dumps(text).encode("utf-8") + b"\n")
+            return offset
+        if text not in self._ids:
+            self._ids[text] = len(self._strings)
+            self._strings.append(text)
+        return self._ids[text]
+
+    def get(self, reference: int) -> str:
+        """
+        Returns the text stored under `reference`
+        """
+        if self._file is not None:
+            self._file.flush()
+            self._file.seek(reference)
+            return json.loads(self._file.readline())
+        return self._strings[reference]
+
+    def close(self):
+        """
+        Closes the backing file, if any
+        """
+        if self._file is not None:
+            self._file.close()
+
+
+class ResultTable:
+    """
+    A columnar store of evaluation results.
+    Each (record, metric) pair is one row holding the aggregated score, and
+    each scored sentence is one entry of the sentence columns holding its
+    index and score. Numbers are kept in typed arrays and text in a TextStore,
+    so a result costs a few dozen bytes plus its text.
+    """
+    def __init__(self, text_path: str = None):
+        self.text = TextStore(text_path)
+        self._record_keys: List = []
+        self._record_ids: Dict = {}
+        self._metric_names: List[str] = []
+        self._metric_ids: Dict[str, int] = {}
+
+        # One entry per (record, metric)
+        self.row_record = array("I")
+        self.row_metric = array("H")
+        self.row_score = array("d")
+        self.row_error = array("q")
+        self.row_start = array("Q")
+        # 32 byte content hash per row, all zeros when the result has none
+        self.row_fingerprint = bytearray()
+        # The models that served each stage as JSON text, -1 when not known
+        self.row_models = array("q")
+
+        # One entry per scored sentence
+        self.sentence_record = array("I")
+        self.sentence_metric = array("H")
+        self.sentence_index = array("I")
+        self.sentence_score = array("h")
+        self.sentence_string = array("q")
+        self.sentence_rationale = array("q")
+
+    def __len__(self):
+        return len(self.row_record)
+
+    def _intern(self, value, keys: List, ids: Dict) -> int:
+        if value not in ids:
+            ids[value] = len(keys)
+            keys.append(value)
+        return ids[value]
+
+    def add(self, record_id, metric: str, result: Dict):
+        """
+        Adds the result of one metric on one record. `result` is either the
+        ScoreResult returned by `score()` or an entry produced by a batch run.
+        Failed and timed out results are stored as NaN with their error.
+        """
+        record = self._intern(record_id, self._record_keys, self._record_ids)
+        metric_id = self._intern(metric, self._metric_names, self._metric_ids)
+        self.row_record.append(record)
+        self.row_metric.append(metric_id)
+        self.row_start.append(len(self.sentence_index))
+        self.row_fingerprint += bytes.fromhex(result["fingerprint"]) if result.get("fingerprint") else bytes(32)
+        models = result["models"] if "models" in result else getattr(result, "models", None)
+        self.row_models.append(self.text.add(json.dumps(models, sort_keys=True)) if models else -1)
+        if "error" in result or getattr(result, "timed_out", False):
+            self.row_score.append(math.nan)
+            self.row_error.append(self.text.add(result["error"] if "error" in result else TIMEOUT_ERROR))
+            return
+        self.row_score.append(float(result["score"]))
+        self.row_error.append(-1)
+        for index, score in enumerate(result["score_breakdown"].get("scores", [])):
+            self.sentence_record.append(record)
+            self.sentence_metric.append(metric_id)
+            self.sentence_index.append(index)
+            self.sentence_score.append(int(score["score"]))
+            self.sentence_string.append(self.text.add(score.get("string", "")))
+            self.sentence_rationale.append(self.text.add(score.get("rationale", "")))
+
+    def extend(self, results: Iterable[Dict]):
+        """
+        Adds batch results carrying their own `record_id` and `metric`
+        """
+        for result in results:
+            self.add(result["record_id"], result["metric"], result)
+
+    @property
+    def metrics(self) -> List[str]:
+        """
+        Metric names present in the table
+        """
+        return list(self._metric_names)
+
+    @property
+    def record_keys(self) -> List:
+        """
+        Record ids in the order they were first added. `row_record` indexes into this list.
+        """
+        return list(self._record_keys)
+
+    def metric_id(self, metric: str) -> int:
+        """
+        Position of `metric` in `metrics`, which is what `row_metric` holds
+        """
+        if metric not in self._metric_ids:
+            raise KeyError(f"No results for metric '{metric}'")
+        return self._metric_ids[metric]
+
+    def scores(self, metric: str = None) -> array:
+        """
+        Aggregated scores, optionally only those of `metric`. Failed rows are NaN.
+        """
+        if metric is None:
+            return array("d", self.row_score)
+        metric_id = self._metric_ids.get(metric)
+        return array("d", (score for score, row_metric in zip(self.row_score, self.row_metric)
+                           if row_metric == metric_id))
+
+    def row(self, index: int) -> Dict:
+        """
+        Rebuilds the result dictionary of row `index`
+        """
+        result = {
+            "record_id": self._record_keys[self.row_record[index]],
+            "metric": self._metric_names[self.row_metric[index]]
+        }
+        fingerprint = self.row_fingerprint[32 * index:32 * (index + 1)]
+        if any(fingerprint):
+            result["fingerprint"] = fingerprint.hex()
+        if self.row_models[index] >= 0:
+            result["models"] = json.loads(self.text.get(self.row_models[index]))
+        if self.row_error[index] >= 0:
+            result["error"] = self.text.get(self.row_error[index])
+            return result
+        stop = self.row_start[index + 1] if index + 1 < len(self) else len(self.sentence_index)
+        result["score"] = self.row_score[index]
+        result["score_breakdown"] = {"scores": [
+            {
+                "string": self.text.get(self.sentence_string[i]),
+                "rationale": self.text.get(self.sentence_rationale[i]),
+                "score": self.sentence_score[i]
+            }
+            for i in range(self.row_start[index], stop)
+        ]}
+        return result
+
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def to_jsonl(self, path: str):
+        """
+        Writes one result per line
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for result in self:
+                f.write(json.dumps(result) + "\n")
+
+    def to_arrow(self, include_text: bool = True):
+        """
+        Exports the sentence columns as a `pyarrow.Table` with one row per scored sentence.
+        Requires the optional `pyarrow` dependency.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("to_arrow requires pyarrow. Install it with `pip install groqeval[arrow]`") from e
+        columns = {
+            "record_id": pa.DictionaryArray.from_arrays(
+                pa.array(self.sentence_record, pa.uint32()), pa.array([str(key) for key in self._record_keys])
+            ),
+            "metric": pa.DictionaryArray.from_arrays(
+                pa.array(self.sentence_metric, pa.uint16()), pa.array(self._metric_names, pa.string())
+            ),
+            "sentence_index": pa.array(self.sentence_index, pa.uint32()),
+            "score": pa.array(self.sentence_score, pa.int16())
+        }
+        if include_text:
+            columns["string"] = pa.array([self.text.get(i) for i in self.sentence_string], pa.string())
+            columns["rationale"] = pa.array([self.text.get(i) for i in self.sentence_rationale], pa.string())
+        return pa.table(columns)
+
+    def close(self):
+        """
+        Closes the on-disk text store, if any
+        """
+        self.text.close()
+
+    @classmethod
+    def from_results(cls, results: Iterable[Dict], text_path: Optional[str] = None) -> "ResultTable":
+        """
+        Builds a table from batch results
+        """
+        table = cls(text_path)
+        table.extend(results)
+        return table
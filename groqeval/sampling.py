@@ -0,0 +1,169 @@
+# groqeval/sampling.py
+import math
+import random
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional, Sequence
+from pydantic import BaseModel
+
+
+class StratumEstimate(BaseModel):
+    """
+    Running estimate of one stratum
+    """
+    population: int
+    samples: int
+    mean: Optional[float]
+
+
+class SamplingEstimate(BaseModel):
+    """
+    Dataset level estimate of a metric from a sample of its records
+    """
+    mean: Optional[float]
+    half_width: Optional[float]
+    low: Optional[float]
+    high: Optional[float]
+    confidence: float
+    samples: int
+    failed: int
+    population: int
+    stopped: str
+    strata: Dict[str, StratumEstimate]
+
+
+class _Stratum:
+    def __init__(self, indices: List[int]):
+        self.indices = indices
+        self.position = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.position >= len(self.indices)
+
+    def add(self, value: float):
+        # Welford's online update of the mean and sum of squared deviations
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def variance_of_mean(self) -> float:
+        population = len(self.indices)
+        if self.count >= population:
+            return 0.0
+        if self.count < 2:
+            return math.inf
+        return self.m2 / (self.count - 1) / self.count * (1 - self.count / population)
+
+
+class SequentialSampler:
+    """
+    Estimates the dataset level score of a metric without evaluating every record.
+    Records are evaluated in random order while a running confidence interval
+    is kept on the mean score. Sampling stops as soon as the interval's half
+    width is within `precision`, once `budget` records have been evaluated,
+    or when the dataset is exhausted.
+    With `strata`, a function of a record, records are sampled from each
+    stratum in proportion to its size and the estimate is stratified.
+    """
+    def __init__(self, evaluator, metric: str, precision: float = 0.2, confidence: float = 0.95,
+                 budget: int = None, min_samples: int = 30, strata: Callable[[Dict], Hashable] = None,
+                 max_concurrency: int = 1, seed: int = None):
+        self.metric = evaluator.metric(metric)
+        self.precision = precision
+        self.confidence = confidence
+        self.budget = budget
+        self.min_samples = min_samples
+        self.strata = strata
+        self.max_concurrency = max_concurrency
+        self.random = random.Random(seed)
+        self.z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+
+    def _score(self, record: Dict) -> Optional[float]:
+        try:
+            return self.metric.score(**{key: record[key] for key in self.metric.inputs if key in record}).score
+        except Exception:
+            return None
+
+    def _next_indices(self, strata: Dict[Hashable, _Stratum], count: int) -> List:
+        picks = []
+        for _ in range(count):
+            # Draw from the stratum furthest behind its proportional share
+            open_strata = [(key, stratum) for key, stratum in strata.items() if not stratum.exhausted]
+            if not open_strata:
+                break
+            key, stratum = min(open_strata, key=lambda item: item[1].position / len(item[1].indices))
+            picks.append((key, stratum.indices[stratum.position]))
+            stratum.position += 1
+        return picks
+
+    def _estimate(self, strata: Dict[Hashable, _Stratum], total: int):
+        sampled = [stratum for stratum in strata.values() if stratum.count]
+        if not sampled:
+            return None, math.inf
+        weight = sum(len(stratum.indices) for stratum in sampled)
+        mean = sum(len(stratum.indices) / weight * stratum.mean for stratum in sampled)
+        if len(sampled) < len(strata):
+            return mean, math.inf
+        variance = sum((len(stratum.indices) / total) ** 2 * stratum.variance_of_mean() for stratum in sampled)
+        return mean, self.z * math.sqrt(variance)
+
+    def run(self, records: Sequence[Dict]) -> SamplingEstimate:
+        """
+        Samples `records` until the stopping rule is met and returns the estimate
+        """
+        groups: Dict[Hashable, List[int]] = {}
+        for index, record in enumerate(records):
+            groups.setdefault(self.strata(record) if self.strata else None, []).append(index)
+        for indices in groups.values():
+            self.random.shuffle(indices)
+        strata = {key: _Stratum(indices) for key, indices in groups.items()}
+
+        evaluated = failed = 0
+        mean, half_width = None, math.inf
+        stopped = "exhausted"
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            while True:
+                step = self.max_concurrency
+                if self.budget is not None:
+                    step = min(step, self.budget - evaluated)
+                picks = self._next_indices(strata, step)
+                if not picks:
+                    stopped = "budget" if self.budget is not None and evaluated >= self.budget else "exhausted"
+                    break
+                scores = executor.map(self._score, [records[index] for _, index in picks])
+                for (key, _), score in zip(picks, scores):
+                    evaluated += 1
+                    if score is None:
+                        failed += 1
+                    else:
+                        strata[key].add(score)
+                mean, half_width = self._estimate(strata, len(records))
+                if evaluated - failed >= self.min_samples and half_width <= self.precision:
+                    stopped = "precision"
+                    break
+
+        bounded = mean is not None and math.isfinite(half_width)
+        return SamplingEstimate(
+            mean=mean,
+            half_width=half_width if bounded else None,
+            low=mean - half_width if bounded else None,
+            high=mean + half_width if bounded else None,
+            confidence=self.confidence,
+            samples=evaluated - failed,
+            failed=failed,
+            population=len(records),
+            stopped=stopped,
+            strata={
+                str(key): StratumEstimate(
+                    population=len(stratum.indices),
+                    samples=stratum.count,
+                    mean=stratum.mean if stratum.count else None
+                )
+                for key, stratum in strata.items()
+            }
+        )
@@ -0,0 +1,358 @@
+# groqeval/sharding.py
+import os
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import multiprocessing
+from typing import Dict, Iterator, List, Optional, Tuple
+from groqeval.results import ResultTable
+from groqeval.batch import evaluate_record
+from groqeval.exceptions import InvalidRecordsError
+from groqeval.validation import validate_file
+
+class WorkQueue:
+    """
+    A SQLite backed queue of record ranges.
+    Workers lease a range, evaluate it and mark it done, renewing the lease
+    as they go. Leases that are not renewed within `lease_timeout` seconds
+    are handed out again, so a worker that dies only costs the range it was
+    holding, and only the worker holding a lease can renew or complete it.
+    """
+    def __init__(self, path: str, lease_timeout: float = 600):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS ranges ("
+                "start INTEGER PRIMARY KEY, stop INTEGER NOT NULL, "
+                "status TEXT NOT NULL DEFAULT 'pending', worker TEXT, leased_at REAL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def populate(self, total: int, chunk_size: int = 100) -> int:
+        """
+        Splits `total` records into ranges of `chunk_size`.
+        Ranges that are already queued are left untouched, so populating an
+        existing queue is safe and lets a run resume where it stopped.
+        """
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO ranges (start, stop) VALUES (?, ?)",
+                [(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+            )
+        return self.pending()
+
+    def claim(self, worker: str) -> Optional[Tuple[int, int]]:
+        """
+        Leases the next available range to `worker`. Returns None once nothing is left.
+        """
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = connection.execute(
+                "SELECT start, stop FROM ranges WHERE status = 'pending' "
+                "OR (status = 'leased' AND leased_at < ?) ORDER BY start LIMIT 1",
+                (now - self.lease_timeout,)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE ranges SET status = 'leased', worker = ?, leased_at = ? WHERE start = ?",
+                    (worker, now, row[0])
+                )
+            connection.execute("COMMIT")
+            return row
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def renew(self, start: int, worker: str) -> bool:
+        """
+        Extends the lease of `worker` on the range beginning at `start`.
+        Returns False when the lease has passed to another worker.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE ranges SET leased_at = ? WHERE start = ? AND worker = ? AND status = 'leased'",
+                (time.time(), start, worker)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, start: int, worker: str) -> bool:
+        """
+        Marks the range beginning at `start` as done, if `worker` still holds
+        its lease. Returns whether it did.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE ranges SET status = 'done' WHERE start = ? AND worker = ? AND status = 'leased'",
+                (start, worker)
+            )
+            return cursor.rowcount == 1
+
+    def pending(self) -> int:
+        """
+        Number of ranges that are not done yet
+        """
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM ranges WHERE status != 'done'").fetchone()[0]
+
+    def leased(self) -> int:
+        """
+        Number of ranges a worker holds an unexpired lease on
+        """
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT COUNT(*) FROM ranges WHERE status = 'leased' AND leased_at >= ?",
+                (time.time() - self.lease_timeout,)
+            ).fetchone()[0]
+
+
+class ResultStore:
+    """
+    A directory of per-worker JSONL files.
+    Every worker appends to its own part file so no locking is needed, and
+    `merge` folds the parts together keeping the latest result for each
+    (record_id, metric) pair.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, worker: str, results: List[Dict]):
+        """
+        Appends results to the part file of `worker`
+        """
+        with open(os.path.join(self.path, f"part-{worker}.jsonl"), "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def iter_merged(self) -> Iterator[Dict]:
+        """
+        Yields the deduplicated results ordered by record.
+        Only the location of each result is held in memory while merging.
+        """
+        locations = {}
+        for name in sorted(os.listdir(self.path)):
+            if not (name.startswith("part-") and name.endswith(".jsonl")):
+                continue
+            with open(os.path.join(self.path, name), "rb") as f:
+                position = f.tell()
+                for line in iter(f.readline, b""):
+                    if line.strip():
+                        result = json.loads(line)
+                        locations[(result["record_id"], result["metric"])] = (name, position)
+                    position = f.tell()
+        for key in sorted(locations, key=_record_order):
+            name, position = locations[key]
+            with open(os.path.join(self.path, name), "rb") as f:
+                f.seek(position)
+                yield json.loads(f.readline())
+
+    def merge(self) -> List[Dict]:
+        """
+        Reads every part file and returns the deduplicated results ordered by record
+        """
+        return list(self.iter_merged())
+
+    def to_table(self, text_path: str = None) -> ResultTable:
+        """
+        Merges the part files into a columnar ResultTable
+        """
+        return ResultTable.from_results(self.iter_merged(), text_path)
+
+
+def _record_order(key: Tuple) -> Tuple:
+    # Positional ids sort numerically, before the ids records carry themselves
+    record_id, metric = key
+    if isinstance(record_id, int):
+        return (0, record_id, "", metric)
+    return (1, 0, str(record_id), metric)
+
+
+def _line_offsets(records_path: str) -> List[int]:
+    offsets = []
+    with open(records_path, "rb") as f:
+        position = f.tell()
+        for line in iter(f.readline, b""):
+            if line.strip():
+                offsets.append(position)
+            position = f.tell()
+    return offsets
+
+
+def count_records(records_path: str) -> int:
+    """
+    Number of records in a JSONL file
+    """
+    return len(_line_offsets(records_path))
+
+
+def run_worker(evaluator, metrics: List[str], records_path: str, queue: WorkQueue,
+               store: ResultStore, worker: str = None) -> int:
+    """
+    Pulls ranges off the queue until it is drained, evaluating each record
+    of the JSONL file with `evaluator`. The lease is renewed after each
+    record; a range whose lease was lost is left to the worker now holding
+    it. Returns the number of records processed.
+    """
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    instances = {metric_name: evaluator.metric(metric_name) for metric_name in metrics}
+    offsets = _line_offsets(records_path)
+    processed = 0
+    with open(records_path, "rb") as f:
+        while (claimed := queue.claim(worker)) is not None:
+            start, stop = claimed
+            results = []
+            for index in range(start, stop):
+                f.seek(offsets[index])
+                results.extend(evaluate_record(instances, json.loads(f.readline()), index))
+                processed += 1
+                if not queue.renew(start, worker):
+                    break
+            # Results already paid for are kept even when the range moved on, merging deduplicates them
+            store.write(worker, results)
+            queue.complete(start, worker)
+    return processed
+
+
+def validate_dataset(metrics: List[str], records_path: str) -> Dict:
+    """
+    The problems of each invalid record of a JSONL dataset for the given metric names
+    """
+    # Imported here to keep the module importable from the evaluator itself
+    from groqeval.evaluate import metric_class
+    return validate_file([metric_class(metric_name) for metric_name in metrics], records_path)
+
+
+def _process_main(api_key, metrics, records_path, queue_path, store_path, lease_timeout,
+                  client_options=None):
+    # Imported here to keep the module importable from the evaluator itself
+    from groqeval.evaluate import GroqEval
+    with GroqEval(api_key=api_key, **(client_options or {})) as evaluator:
+        run_worker(evaluator, metrics, records_path,
+                   WorkQueue(queue_path, lease_timeout), ResultStore(store_path))
+
+
+class ShardedRunner:
+    """
+    Evaluates a JSONL dataset with several worker processes sharing a work queue.
+    Each process builds its own GroqEval client. Workers on other machines can
+    join the same run by pointing at the same queue, records and store paths,
+    e.g. with `python -m groqeval.sharding work`. `client_options` are passed
+    on to each worker's GroqEval. With `validate`, the whole dataset is checked
+    before anything is queued. Once its own workers are done, a run waits for
+    ranges leased by other machines, polling every `poll_interval` seconds.
+    """
+    def __init__(self, api_key: str, metrics: List[str], queue_path: str, store_path: str,
+                 processes: int = None, chunk_size: int = 100, lease_timeout: float = 600,
+                 client_options: Dict = None, validate: bool = False, poll_interval: float = 5.0):
+        self.api_key = api_key
+        self.poll_interval = poll_interval
+        self.validate = validate
+        self.client_options = client_options
+        self.metrics = metrics
+        self.queue = WorkQueue(queue_path, lease_timeout)
+        self.store = ResultStore(store_path)
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def enqueue(self, records_path: str) -> int:
+        """
+        Queues the ranges of `records_path`. Returns the number of ranges still pending.
+        """
+        if self.validate:
+            invalid = validate_dataset(self.metrics, records_path)
+            if invalid:
+                raise InvalidRecordsError(invalid)
+        return self.queue.populate(count_records(records_path), self.chunk_size)
+
+    def run(self, records_path: str) -> List[Dict]:
+        """
+        Queues the dataset, runs the workers to completion and returns the merged results.
+        Ranges other machines hold are waited for; those whose lease expires
+        are taken over by new local workers. Raises a RuntimeError when a
+        worker fails, instead of returning partial results. Running again
+        resumes the run.
+        """
+        self.enqueue(records_path)
+        while True:
+            self.run_workers(records_path)
+            while self.queue.leased():
+                time.sleep(self.poll_interval)
+            if not self.queue.pending():
+                return self.store.merge()
+
+    def run_workers(self, records_path: str):
+        """
+        Runs the local worker processes until the queue has nothing left to lease
+        """
+        workers = [
+            multiprocessing.Process(
+                target=_process_main,
+                args=(self.api_key, self.metrics, records_path, self.queue.path,
+                      self.store.path, self.queue.lease_timeout, self.client_options)
+            )
+            for _ in range(self.processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        failed = [worker.exitcode for worker in workers if worker.exitcode != 0]
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(workers)} workers failed with exit codes {failed}")
+
+
+def main(argv=None):
+    """
+    Command line entry point for running workers on several machines
+    """
+    parser = argparse.ArgumentParser(prog="python -m groqeval.sharding")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command in ("validate", "enqueue", "work", "merge"):
+        subparser = subparsers.add_parser(command)
+        if command == "validate":
+            subparser.add_argument("--records", required=True)
+            subparser.add_argument("--metrics", required=True, help="Comma separated metric names")
+            continue
+        subparser.add_argument("--queue", required=command != "merge")
+        subparser.add_argument("--store", required=command != "enqueue")
+        if command != "merge":
+            subparser.add_argument("--records", required=True)
+        if command == "enqueue":
+            subparser.add_argument("--chunk-size", type=int, default=100)
+        if command == "work":
+            subparser.add_argument("--metrics", required=True, help="Comma separated metric names")
+            subparser.add_argument("--lease-timeout", type=float, default=600)
+    args = parser.parse_args(argv)
+
+    if args.command == "validate":
+        invalid = validate_dataset(args.metrics.split(","), args.records)
+        for record_id, problems in invalid.items():
+            print(json.dumps({"record_id": record_id, "problems": problems}))
+        if invalid:
+            raise SystemExit(1)
+    elif args.command == "enqueue":
+        print(WorkQueue(args.queue).populate(count_records(args.records), args.chunk_size))
+    elif args.command == "work":
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("API key must be set as an environment variable 'GROQ_API_KEY'")
+        _process_main(api_key, args.metrics.split(","), args.records, args.queue,
+                      args.store, args.lease_timeout)
+    else:
+        for result in ResultStore(args.store).merge():
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# groqeval/singleflight.py
+import threading
+import time
+from typing import Dict, Iterator
+from groqeval.backends import ChatBackend
+from groqeval.cache import cache_key
+from groqeval.exceptions import EvaluationTimeout
+from groqeval.telemetry import emit
+
+
+class Flight:
+    """
+    A call in progress and, once it has finished, its response or error
+    """
+    __slots__ = ("done", "response", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class SingleFlightBackend(ChatBackend):
+    """
+    Coalesces identical concurrent completions. A call made while an
+    identical one, by messages, model, temperature and response format, is
+    still in flight waits for it and shares its response or error instead
+    of sending its own request. Only calls that overlap in time are shared;
+    a cache keeps finished responses. When the shared call runs out of its
+    own time, the others still waiting make the call again themselves.
+    Streamed completions are passed through, as each caller may stop
+    reading at a different point.
+    """
+    def __init__(self, backend: ChatBackend):
+        self.backend = backend
+        self.flights: Dict[str, Flight] = {}
+        self.counters = {"calls": 0, "coalesced": 0}
+        self.lock = threading.Lock()
+
+    def chat_completion(self, messages, model, temperature=0.5, response_format=None, timeout: float = None):
+        key = cache_key(messages, model, temperature, response_format)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.lock:
+            self.counters["calls"] += 1
+        while True:
+            with self.lock:
+                flight = self.flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self.flights[key] = Flight()
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+            if leader:
+                try:
+                    flight.response = self.backend.chat_completion(messages, model, temperature, response_format, timeout)
+                except BaseException as e:
+                    flight.error = e
+                    raise
+                finally:
+                    with self.lock:
+                        del self.flights[key]
+                    flight.done.set()
+                return flight.response
+            if not flight.done.wait(timeout):
+                raise EvaluationTimeout()
+            interrupted = flight.error is not None and not isinstance(flight.error, Exception)
+            if interrupted or isinstance(flight.error, EvaluationTimeout):
+                # The call was cut short by its own caller's deadline or interrupt, this one may still have time
+                continue
+            with self.lock:
+                self.counters["coalesced"] += 1
+            emit("coalesced", model=model)
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+    def stream_chat_completion(self, messages, model, temperature=0.5, response_format=None,
+                               timeout: float = None) -> Iterator[str]:
+        return (yield from self.backend.stream_chat_completion(messages, model, temperature, response_format, timeout))
+
+    def stats(self) -> Dict:
+        """
+        Calls made, calls that shared another's request and calls in flight
+        """
+        with self.lock:
+            return dict(self.counters, in_flight=len(self.flights))
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,51 @@
+# groqeval/streaming.py
+import json
+from typing import List, Type
+from pydantic import BaseModel
+
+
+class IncrementalScoreParser:
+    """
+    Parses a streamed JSON document of the form {"scores": [{...}, {...}]}.
+    `feed` takes the next piece of text and returns every item of the array
+    whose object closed within it, validated as `item_model`. Text around
+    the document, such as a code fence, is ignored.
+    """
+    def __init__(self, item_model: Type[BaseModel]):
+        self.item_model = item_model
+        self.text = ""
+        self._position = 0
+        self._stack = []
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+
+    def feed(self, chunk: str) -> List[BaseModel]:
+        """
+        Adds `chunk` to the document and returns the items it completed
+        """
+        self.text += chunk
+        items = []
+        for position in range(self._position, len(self.text)):
+            character = self.text[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif character == "\\":
+                    self._escaped = True
+                elif character == '"':
+                    self._in_string = False
+            elif character == '"' and self._stack:
+                self._in_string = True
+            elif character in "{[":
+                # An item is an object directly inside the array of the top level object
+                if character == "{" and self._stack == ["{", "["]:
+                    self._item_start = position
+                self._stack.append(character)
+            elif character in "}]" and self._stack:
+                self._stack.pop()
+                if character == "}" and self._stack == ["{", "["] and self._item_start is not None:
+                    items.append(self.item_model.model_validate(json.loads(self.text[self._item_start:position + 1])))
+                    self._item_start = None
+        self._position = len(self.text)
+        return items
@@ -0,0 +1,225 @@
+# groqeval/telemetry.py
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+# Events emitted by the library:
+#   construct    a metric was created
+#   decomposition, scoring    a chat completion of that stage
+#   parse        validating a response against its pydantic model
+#   cache_hit    a score or response was served from a cache
+#   cache_error  a shared cache could not be read or written and was skipped
+#   retry        a request is retried, with the status that caused it
+#   queue_wait   time a record or request waited for a worker or a slot
+#   coalesced    a request shared the response of an identical one in flight
+#   circuit_opened, circuit_closed    a circuit breaker changed state
+#   concurrency_limit    the adaptive concurrency limit changed, with its new `limit`
+EVENTS = ("construct", "decomposition", "scoring", "parse", "cache_hit", "cache_error", "retry", "queue_wait",
+          "coalesced", "circuit_opened", "circuit_closed", "concurrency_limit")
+
+
+class Event:
+    """
+    Something that happened while evaluating, labelled by metric and model.
+    `duration` is in seconds for events that take time and None otherwise.
+    """
+    __slots__ = ("name", "metric", "model", "duration", "attributes")
+
+    def __init__(self, name: str, metric: str = "", model: str = "", duration: float = None, **attributes):
+        self.name = name
+        self.metric = metric or ""
+        self.model = model or ""
+        self.duration = duration
+        self.attributes = attributes
+
+    def __repr__(self):
+        return f"Event({self.name!r}, metric={self.metric!r}, model={self.model!r}, duration={self.duration!r})"
+
+
+class Hook:
+    """
+    Receives every event. Hooks are called on the thread that did the work,
+    so they must be quick and thread safe.
+    """
+    def on_event(self, event: Event):
+        """
+        This method should be implemented by each child class
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+
+_hooks: List[Hook] = []
+
+
+def add_hook(hook: Hook) -> Hook:
+    """
+    Registers a hook for all evaluators and returns it
+    """
+    _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook: Hook):
+    """
+    Unregisters a hook
+    """
+    _hooks.remove(hook)
+
+
+def emit(name: str, metric: str = "", model: str = "", duration: float = None, **attributes):
+    """
+    Passes an event to every hook. Costs next to nothing without hooks.
+    """
+    if not _hooks:
+        return
+    event = Event(name, metric, model, duration, **attributes)
+    for hook in list(_hooks):
+        hook.on_event(event)
+
+
+@contextmanager
+def timed(name: str, metric: str = "", model: str = "", **attributes):
+    """
+    Emits an event with the duration of the block, also when it raises
+    """
+    if not _hooks:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        emit(name, metric, model, time.perf_counter() - start, **attributes)
+
+
+class OpenTelemetryHook(Hook):
+    """
+    Records every event as an OpenTelemetry span named "groqeval.<event>",
+    back-dated by its duration. Needs the `opentelemetry-api` package.
+    """
+    def __init__(self, tracer=None):
+        if tracer is None:
+            try:
+                from opentelemetry import trace
+            except ImportError as e:
+                raise ImportError(
+                    "OpenTelemetry spans need opentelemetry-api. Install it with `pip install groqeval[otel]`."
+                ) from e
+            tracer = trace.get_tracer("groqeval")
+        self.tracer = tracer
+
+    def on_event(self, event: Event):
+        end = time.time_ns()
+        start = end - int((event.duration or 0) * 1e9)
+        attributes = {"groqeval.metric": event.metric, "groqeval.model": event.model}
+        attributes.update({f"groqeval.{key}": value for key, value in event.attributes.items() if value is not None})
+        span = self.tracer.start_span(f"groqeval.{event.name}", start_time=start, attributes=attributes)
+        span.end(end_time=end)
+
+
+class PrometheusHook(Hook):
+    """
+    Counts events and keeps histograms of their durations, and renders both
+    in the Prometheus text format, either with `render` or over HTTP with `serve`.
+    Events in `gauges` also set a gauge to the value of one of their attributes.
+    """
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+    # Event name: (attribute, gauge name, help text)
+    gauges = {
+        "concurrency_limit": ("limit", "groqeval_concurrency_limit", "Requests allowed in flight by adaptive concurrency.")
+    }
+
+    def __init__(self, buckets: Tuple[float, ...] = None):
+        if buckets is not None:
+            self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.counts: Dict[Tuple[str, str, str], int] = {}
+        self.histograms: Dict[Tuple[str, str, str], List] = {}
+        self.values: Dict[Tuple[str, str, str], float] = {}
+        self.server = None
+
+    def on_event(self, event: Event):
+        labels = (event.name, event.metric, event.model)
+        with self.lock:
+            self.counts[labels] = self.counts.get(labels, 0) + 1
+            if event.duration is not None:
+                histogram = self.histograms.setdefault(labels, [[0] * len(self.buckets), 0.0, 0])
+                position = bisect.bisect_left(self.buckets, event.duration)
+                if position < len(self.buckets):
+                    histogram[0][position] += 1
+                histogram[1] += event.duration
+                histogram[2] += 1
+            if event.name in self.gauges and event.attributes.get(self.gauges[event.name][0]) is not None:
+                self.values[labels] = event.attributes[self.gauges[event.name][0]]
+
+    @staticmethod
+    def _labels(labels: Tuple[str, str, str], **extra) -> str:
+        pairs = dict(zip(("event", "metric", "model"), labels), **extra)
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in pairs.values())
+        return "{" + ",".join(f'{key}="{value}"' for key, value in zip(pairs, escaped)) + "}"
+
+    def render(self) -> str:
+        """
+        The current counters, histograms and gauges in the Prometheus text format
+        """
+        with self.lock:
+            counts = dict(self.counts)
+            values = dict(self.values)
+            histograms = {labels: (list(buckets), total, count) for labels, (buckets, total, count) in self.histograms.items()}
+        lines = [
+            "# HELP groqeval_events_total Events emitted by groqeval.",
+            "# TYPE groqeval_events_total counter"
+        ]
+        lines.extend(f"groqeval_events_total{self._labels(labels)} {count}" for labels, count in sorted(counts.items()))
+        lines.extend([
+            "# HELP groqeval_event_duration_seconds Time taken by groqeval stages.",
+            "# TYPE groqeval_event_duration_seconds histogram"
+        ])
+        for labels, (buckets, total, count) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, observed in zip(self.buckets, buckets):
+                cumulative += observed
+                lines.append(f"groqeval_event_duration_seconds_bucket{self._labels(labels, le=bound)} {cumulative}")
+            lines.append(f"groqeval_event_duration_seconds_bucket{self._labels(labels, le='+Inf')} {count}")
+            lines.append(f"groqeval_event_duration_seconds_sum{self._labels(labels)} {total}")
+            lines.append(f"groqeval_event_duration_seconds_count{self._labels(labels)} {count}")
+        for name, (_, gauge, description) in self.gauges.items():
+            observed = sorted((labels, value) for labels, value in values.items() if labels[0] == name)
+            if observed:
+                lines.extend([f"# HELP {gauge} {description}", f"# TYPE {gauge} gauge"])
+                lines.extend(f"{gauge}{self._labels(labels)} {value}" for labels, value in observed)
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """
+        Serves `render()` on http://host:port/metrics from a background thread
+        """
+        hook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = hook.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="groqeval-prometheus", daemon=True).start()
+        return self.server
+
+    def close(self):
+        """
+        Stops the HTTP server if one was started
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,140 @@
+# groqeval/validation.py
+import json
+import math
+import re
+from itertools import islice
+from typing import Annotated, Any, Dict, Iterable, List, Type
+from pydantic import ConfigDict, Field, StrictStr, TypeAdapter, ValidationError, create_model, model_validator
+from groqeval.exceptions import InvalidRecordsError
+from groqeval.metrics.base_metric import BaseMetric
+
+# Tokens left for the metric's own instructions and its response
+RESERVED_TOKENS = 2048
+DEFAULT_CONTEXT_WINDOW = 8192
+
+NonEmptyString = Annotated[StrictStr, Field(min_length=1)]
+INPUT_TYPES = {
+    "prompt": NonEmptyString,
+    "output": NonEmptyString,
+    "context": Annotated[List[NonEmptyString], Field(min_length=1)]
+}
+
+
+def context_window(model: str) -> int:
+    """
+    The context window of a model, read from names like "llama3-70b-8192"
+    """
+    match = re.search(r"-(\d{4,})$", model)
+    return int(match.group(1)) if match else DEFAULT_CONTEXT_WINDOW
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    A rough token count, at about four characters a token
+    """
+    return math.ceil(len(text) / 4)
+
+
+def record_model(metrics: Iterable[Type[BaseMetric]], max_input_tokens: int = None):
+    """
+    A pydantic model of the records the metrics can score: every input they
+    read must be present, a non-empty string or a non-empty list of them, and
+    together the inputs must fit the smallest context window of the metrics'
+    models, less what their prompts and responses need. Other fields are kept.
+    """
+    metrics = list(metrics)
+    fields = {key: (INPUT_TYPES[key], ...) for metric in metrics for key in metric.inputs}
+    if max_input_tokens is None:
+        max_input_tokens = min(context_window(metric.model) for metric in metrics) - RESERVED_TOKENS
+
+    def fits_context_window(record):
+        texts = [getattr(record, key) for key in fields]
+        tokens = sum(estimate_tokens(text) for value in texts for text in ([value] if isinstance(value, str) else value))
+        if tokens > max_input_tokens:
+            raise ValueError(f"The inputs are about {tokens} tokens, more than the {max_input_tokens} that fit the context window")
+        return record
+
+    return create_model(
+        "Record",
+        __config__=ConfigDict(extra="allow"),
+        __validators__={"fits_context_window": model_validator(mode="after")(fits_context_window)},
+        **fields
+    )
+
+
+def describe(error: Dict) -> str:
+    """
+    A one line description of a pydantic error within a record
+    """
+    location = ".".join(str(part) for part in error["loc"][1:])
+    message = error["msg"].replace("Value error, ", "")
+    return f"{location}: {message}" if location else message
+
+
+def dataset_adapter(metrics: Iterable[Type[BaseMetric]], max_input_tokens: int = None) -> TypeAdapter:
+    """
+    A TypeAdapter that validates a whole list of records in one pass
+    """
+    return TypeAdapter(List[record_model(metrics, max_input_tokens)])
+
+
+def invalid_records(adapter: TypeAdapter, records: List[Any], start: int = 0) -> Dict[Any, List[str]]:
+    """
+    The problems of each invalid record, keyed by its 'id' or by its position
+    counted from `start`
+    """
+    try:
+        adapter.validate_python(records)
+    except ValidationError as e:
+        invalid = {}
+        for error in e.errors():
+            index = error["loc"][0]
+            record = records[index]
+            record_id = record.get("id", start + index) if isinstance(record, dict) else start + index
+            invalid.setdefault(record_id, []).append(describe(error))
+        return invalid
+    return {}
+
+
+def validate_records(metrics: Iterable[Type[BaseMetric]], records: List[Any],
+                     max_input_tokens: int = None) -> Dict[Any, List[str]]:
+    """
+    Checks every record against the inputs of the metrics and returns the
+    problems of each invalid record. Valid datasets return an empty dictionary.
+    """
+    return invalid_records(dataset_adapter(metrics, max_input_tokens), records)
+
+
+def check_records(metrics: Iterable[Type[BaseMetric]], records: List[Any], max_input_tokens: int = None):
+    """
+    Raises an InvalidRecordsError listing every invalid record
+    """
+    invalid = validate_records(metrics, records, max_input_tokens)
+    if invalid:
+        raise InvalidRecordsError(invalid)
+
+
+def validate_file(metrics: Iterable[Type[BaseMetric]], records_path: str, max_input_tokens: int = None,
+                  chunk_size: int = 1000) -> Dict[Any, List[str]]:
+    """
+    Validates a JSONL dataset a chunk of records at a time. Lines that are
+    not valid JSON are reported by their position and the rest still checked.
+    """
+    adapter = dataset_adapter(metrics, max_input_tokens)
+    invalid = {}
+    with open(records_path, encoding="utf-8") as f:
+        lines = (line for line in f if line.strip())
+        start = 0
+        while chunk := list(islice(lines, chunk_size)):
+            records, malformed = [], {}
+            for index, line in enumerate(chunk):
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    # Kept in place so the positions of the records after it still line up
+                    records.append(None)
+                    malformed[start + index] = [f"Invalid JSON: {e}"]
+            invalid.update(invalid_records(adapter, records, start))
+            invalid.update(malformed)
+            start += len(chunk)
+    return invalid
@@ -1,10 +1,14 @@
 import pytest
 from groqeval import GroqEval
 import os
+import json
 import inspect
 import random
 import string
-from groq import Groq
+import time
+import httpx
+from types import SimpleNamespace
+from groq import Groq, APITimeoutError, RateLimitError, BadRequestError, InternalServerError
 from typing import List, Dict, get_origin, get_args
 
 @pytest.fixture(scope="session")
@@ -53,4 +57,119 @@ def generate_random_value(param):
     elif get_origin(annotation) == dict or isinstance(param.default, dict):
         return {f'key{i}': random.randint(0, 10) for i in range(5)}
     else:
-        return None
\ No newline at end of file
+        return None
+
+class FakeCompletions:
+    """
+        Offline stand-in for groq's chat.completions endpoint.
+        Decomposes the user content on full stops and scores each sentence by its length.
+        `delays` holds the latency in seconds of "decompose" and "score" calls.
+        Streamed responses arrive in `chunk_size` character pieces and are kept in `streams`.
+        Raw responses carry `headers`, and `failures` holds status codes to fail the next calls with.
+    """
+    def __init__(self):
+        self.calls = []
+        self.delays = {"decompose": 0, "score": 0}
+        self.chunk_size = 16
+        self.streams = []
+        self.headers = {}
+        self.failures = []
+        self.with_raw_response = SimpleNamespace(create=self.create_raw)
+
+    def create_raw(self, **kwargs):
+        response = self.create(**kwargs)
+        return SimpleNamespace(headers=dict(self.headers), parse=lambda: response)
+
+    def create(self, messages, model, temperature=None, response_format=None, timeout=None, **kwargs):
+        self.calls.append({"messages": messages, "model": model, "timeout": timeout, **kwargs})
+        if self.failures:
+            status, headers = self.failures.pop(0)
+            request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+            response = httpx.Response(status, headers=headers, request=request)
+            raise status_error(status)(f"Error code: {status}", response=response, body=None)
+        system, user = messages[0]["content"], messages[1]["content"]
+        stage = "decompose" if "decompose" in system else "score"
+        delay = self.delays[stage]
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise APITimeoutError(request=httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions"))
+        time.sleep(delay)
+        if stage == "decompose":
+            lines = [line[2:] for line in user.splitlines() if line.startswith("- ")] or [user]
+            sentences = [s.strip() for line in lines for s in line.split(". ") if s.strip()]
+            content = json.dumps({"sentences": [{"string": s, "flag": True} for s in sentences]})
+        elif "compact form" in system:
+            sentences = json.loads(user)["sentences"]
+            rationale = {"rationale": "Scored offline."} if "to every score" in system else {}
+            content = json.dumps({"scores": [
+                {"index": s["index"], "score": len(s["string"]) % 10 + 1, **rationale} for s in sentences
+            ]})
+        else:
+            sentences = json.loads(user)["sentences"]
+            content = json.dumps({"scores": [
+                {"string": s, "rationale": "Scored offline.", "score": len(s) % 10 + 1} for s in sentences
+            ]})
+        if kwargs.get("stream"):
+            stream = FakeStream(content, self.chunk_size, model)
+            self.streams.append(stream)
+            return stream
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], model=model)
+
+
+def status_error(status):
+    return {429: RateLimitError, 400: BadRequestError}.get(status, InternalServerError)
+
+
+class FakeStream:
+    """
+        Offline stand-in for a streamed chat completion
+    """
+    def __init__(self, content, chunk_size, model):
+        self.model = model
+        self.pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            if self.closed:
+                return
+            self.consumed += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], model=self.model)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """
+        Offline stand-in for the groq client
+    """
+    def __init__(self, completions=None, timeout=None):
+        completions = completions or FakeCompletions()
+        self.completions = completions
+        self.chat = SimpleNamespace(completions=completions)
+        if timeout is not None:
+            self.chat = SimpleNamespace(completions=SimpleNamespace(
+                calls=completions.calls,
+                create=lambda **kwargs: completions.create(timeout=timeout, **kwargs),
+                with_raw_response=SimpleNamespace(
+                    create=lambda **kwargs: completions.create_raw(timeout=timeout, **kwargs)
+                )
+            ))
+        self.closed = False
+
+    def with_options(self, timeout=None, **options):
+        return FakeClient(self.completions, timeout)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture()
+def offline_evaluator():
+    """Create a GroqEval object backed by an offline client."""
+    evaluator = GroqEval(api_key="offline")
+    evaluator.client = FakeClient()
+    return evaluator
@@ -0,0 +1,112 @@
+import threading
+import time
+import httpx
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from groq import RateLimitError
+from conftest import FakeClient
+from groqeval import GroqEval, telemetry
+from groqeval.adaptive import AdaptiveConcurrencyBackend
+from groqeval.backends import ChatBackend, GroqBackend
+from groqeval.exceptions import EvaluationTimeout
+from groqeval.telemetry import PrometheusHook
+
+class StubBackend(ChatBackend):
+    """Answers after `latency` seconds, or fails with the statuses in `failures`."""
+    def __init__(self, latency=0.01):
+        self.latency = latency
+        self.failures = []
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def chat_completion(self, messages, model, temperature=0.5, response_format=None, timeout=None):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            failure = self.failures.pop(0) if self.failures else None
+        try:
+            time.sleep(self.latency)
+            if failure:
+                request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+                raise RateLimitError("Too many requests", response=httpx.Response(failure, request=request), body=None)
+            return "ok"
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+def run(backend, calls, threads=32):
+    def call(_):
+        try:
+            return backend.chat_completion([], "model")
+        except RateLimitError:
+            return None
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(call, range(calls)))
+
+def test_limit_grows_while_latency_is_stable():
+    stub = StubBackend()
+    backend = AdaptiveConcurrencyBackend(stub, initial_limit=2, max_limit=16)
+    run(backend, 200)
+    assert backend.limit > 2
+    assert stub.peak <= 16
+    assert backend.stats()["increases"] > 0
+
+def test_throttling_halves_the_limit():
+    stub = StubBackend()
+    backend = AdaptiveConcurrencyBackend(stub, initial_limit=8)
+    stub.failures = [429] * 8
+    run(backend, 8)
+    stats = backend.stats()
+    assert stats["throttled"] == 8
+    # A burst from one round trip backs off once
+    assert stats["decreases"] == 1 and backend.limit == 4
+
+def test_latency_spikes_back_off():
+    stub = StubBackend(latency=0.01)
+    backend = AdaptiveConcurrencyBackend(stub, initial_limit=8)
+    run(backend, 20, threads=1)
+    limit = backend.limit
+    stub.latency = 0.1
+    backend.chat_completion([], "model")
+    assert backend.limit < limit
+
+def test_calls_wait_for_a_slot_within_their_timeout():
+    stub = StubBackend(latency=0.3)
+    backend = AdaptiveConcurrencyBackend(stub, initial_limit=1)
+    worker = threading.Thread(target=backend.chat_completion, args=([], "model"))
+    worker.start()
+    time.sleep(0.05)
+    with pytest.raises(EvaluationTimeout):
+        backend.chat_completion([], "model", timeout=0.05)
+    worker.join()
+
+def test_evaluator_wraps_its_client():
+    evaluator = GroqEval(api_key="offline", adaptive_concurrency=True)
+    assert isinstance(evaluator.backend, AdaptiveConcurrencyBackend)
+    assert isinstance(evaluator.backend.backend, GroqBackend)
+    # Throttling has to reach the limit, so it is retried above it rather than below
+    assert evaluator.backend.backend.max_retries == 0
+    assert evaluator.backend.max_retries == 2
+    evaluator.close()
+
+def test_throttled_calls_back_off_and_retry():
+    evaluator = GroqEval(api_key="offline", adaptive_concurrency=True)
+    client = FakeClient()
+    client.completions.failures = [(429, {"retry-after": "0.01"})]
+    evaluator.backend.backend = GroqBackend(client, max_retries=0)
+    results = evaluator.batch(["bias"], [{"prompt": "A prompt.", "output": "One. Two"}])
+    assert "error" not in results[0] and results[0]["score"] is not None
+    assert evaluator.backend.stats()["throttled"] == 1 and evaluator.backend.limit == 2
+
+def test_limit_changes_reach_prometheus():
+    stub = StubBackend()
+    backend = AdaptiveConcurrencyBackend(stub, initial_limit=8)
+    hook = telemetry.add_hook(PrometheusHook())
+    try:
+        stub.failures = [429]
+        run(backend, 1)
+    finally:
+        telemetry.remove_hook(hook)
+    assert "# TYPE groqeval_concurrency_limit gauge" in hook.render()
+    assert 'groqeval_concurrency_limit{event="concurrency_limit",metric="",model=""} 4' in hook.render()
@@ -0,0 +1,87 @@
+import json
+import httpx
+import pytest
+from conftest import FakeCompletions
+from test_telemetry import Recorder
+from groqeval import GroqEval, telemetry
+from groq import Groq, RateLimitError
+from groqeval.backends import GroqBackend, OpenAICompatibleBackend, extract_json
+from groqeval.exceptions import EvaluationTimeout
+
+def local_server(requests, status_codes=None):
+    completions = FakeCompletions()
+    status_codes = list(status_codes or [])
+
+    def handler(request):
+        body = json.loads(request.content)
+        requests.append(body)
+        if status_codes:
+            status, headers = (status_codes.pop(0), {}) if isinstance(status_codes[0], int) else status_codes.pop(0)
+            return httpx.Response(status, headers=headers)
+        response = completions.create(body["messages"], body["model"])
+        content = f"Here you go:\n```json\n{response.choices[0].message.content}\n```"
+        return httpx.Response(200, json={"model": body["model"], "choices": [{"message": {"role": "assistant", "content": content}}]})
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+def test_metrics_run_against_an_openai_compatible_backend():
+    requests = []
+    backend = OpenAICompatibleBackend("http://localhost:8080/v1", model={"llama3-70b-8192": "llama-3-8b-instruct"},
+                                      http_client=local_server(requests))
+    with GroqEval(backend=backend) as evaluator:
+        result = evaluator("bias", prompt="A prompt.", output="First opinion. Second opinion").score()
+    assert len(result.scores) == 2
+    assert [body["model"] for body in requests] == ["llama-3-8b-instruct"] * 2
+    assert all(body["response_format"] == {"type": "json_object"} for body in requests)
+
+def test_retries_on_throttling(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    requests = []
+    backend = OpenAICompatibleBackend("http://localhost:8080/v1", http_client=local_server(requests, [429, 503]))
+    response = backend.chat_completion(
+        [{"role": "system", "content": "decompose"}, {"role": "user", "content": "One. Two"}],
+        "llama3-70b-8192", response_format={"type": "json_object"}
+    )
+    assert len(requests) == 3
+    assert json.loads(response.choices[0].message.content)["sentences"][1]["string"] == "Two"
+
+def test_groq_retries_are_reported(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    requests = []
+    client = Groq(api_key="offline", base_url="http://localhost:8080/openai/v1", max_retries=2,
+                  http_client=local_server(requests, [429, 503]))
+    recorder = telemetry.add_hook(Recorder())
+    try:
+        response = GroqBackend(client).chat_completion(
+            [{"role": "system", "content": "decompose"}, {"role": "user", "content": "One. Two"}], "llama3-70b-8192"
+        )
+    finally:
+        telemetry.remove_hook(recorder)
+    assert len(requests) == 3
+    assert "Two" in response.choices[0].message.content
+    assert [(event.attributes["status"], event.attributes["attempt"]) for event in recorder.events] == [(429, 1), (503, 2)]
+
+def test_groq_retries_wait_for_retry_after_within_the_deadline(monkeypatch):
+    waits = []
+    monkeypatch.setattr("time.sleep", waits.append)
+    requests = []
+    client = Groq(api_key="offline", base_url="http://localhost:8080/openai/v1", max_retries=2,
+                  http_client=local_server(requests, [(429, {"retry-after": "0.05"}), (429, {"retry-after": "30"})]))
+    backend = GroqBackend(client)
+    messages = [{"role": "system", "content": "decompose"}, {"role": "user", "content": "One. Two"}]
+    # The first wait fits in the time left, the second does not
+    with pytest.raises(RateLimitError):
+        backend.chat_completion(messages, "llama3-70b-8192", timeout=5)
+    assert waits == [0.05] and len(requests) == 2
+
+def test_timeouts_raise_evaluation_timeout():
+    def handler(request):
+        raise httpx.ReadTimeout("too slow", request=request)
+    backend = OpenAICompatibleBackend("http://localhost:8080/v1", http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+    with pytest.raises(EvaluationTimeout):
+        backend.chat_completion([], "model", timeout=0.5)
+
+def test_extract_json():
+    assert extract_json('{"a": 1}') == '{"a": 1}'
+    assert extract_json('Sure! ```json\n{"a": {"b": 2}}\n```') == '{"a": {"b": 2}}'
+    with pytest.raises(ValueError, match="not a JSON object"):
+        extract_json("no json here")
@@ -0,0 +1,41 @@
+import time
+from groqeval.batch import run_batch
+
+RECORDS = [
+    {"id": i, "prompt": "Discuss urbanization.", "context": ["Cities grow. Jobs follow."], "output": f"Cities are crowded. Record {i}."}
+    for i in range(6)
+]
+
+def test_batch_results_in_record_order(offline_evaluator):
+    results = offline_evaluator.batch(["bias", "faithfulness"], RECORDS, max_concurrency=3)
+    assert [(r["record_id"], r["metric"]) for r in results] == [
+        (i, metric) for i in range(6) for metric in ("bias", "faithfulness")
+    ]
+    assert all(r["score"] is not None for r in results)
+
+def test_score_timeout_returns_partial_result(offline_evaluator):
+    offline_evaluator.client.completions.delays["score"] = 1
+    bias = offline_evaluator.metric("bias")
+    start = time.monotonic()
+    result = bias.score(prompt="A prompt.", output="First point. Second point", timeout=0.2)
+    assert time.monotonic() - start < 0.5
+    assert result.timed_out and result["score"] is None
+    assert [s.string for s in result.decomposition.sentences] == ["First point", "Second point"]
+    assert result.to_dict()["decomposition"]["sentences"][0]["string"] == "First point"
+    assert bias.deadline is None
+
+def test_batch_deadline_bounds_the_run(offline_evaluator):
+    offline_evaluator.client.completions.delays["decompose"] = 0.2
+    start = time.monotonic()
+    results = run_batch(offline_evaluator, ["toxicity"], RECORDS, max_concurrency=2, deadline=0.3)
+    assert time.monotonic() - start < 0.6
+    assert any(r.get("timed_out") for r in results)
+    assert all("error" in r for r in results if r.get("timed_out"))
+
+def test_record_time_is_shared_by_its_metrics(offline_evaluator):
+    offline_evaluator.client.completions.delays.update(decompose=0.15, score=0.15)
+    start = time.monotonic()
+    results = offline_evaluator.batch(["bias", "toxicity", "answer_relevance"], RECORDS[:1], deadline=0.7)
+    assert time.monotonic() - start < 1.0
+    assert [r.get("timed_out", False) for r in results] == [False, False, True]
+    assert all(r["error"].startswith("EvaluationTimeout") for r in results[2:])
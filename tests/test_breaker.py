@@ -0,0 +1,76 @@
+import time
+import pytest
+from conftest import FakeClient
+from groqeval import GroqEval
+from groqeval.backends import ChatBackend, ChatResponse, GroqBackend
+from groqeval.breaker import CircuitBreakerBackend
+from groqeval.exceptions import CircuitOpenError
+
+MESSAGES = [{"role": "system", "content": "decompose"}, {"role": "user", "content": "One. Two"}]
+
+class Flaky(ChatBackend):
+    def __init__(self, failing=True, latency=0.0):
+        self.failing = failing
+        self.latency = latency
+        self.calls = []
+
+    def chat_completion(self, messages, model, temperature=0.5, response_format=None, timeout=None):
+        self.calls.append(model)
+        time.sleep(self.latency)
+        if self.failing:
+            raise ConnectionError("Groq is down")
+        return ChatResponse.model_validate({"choices": [{"message": {"content": "{}"}}], "model": model})
+
+def trip(breaker, calls):
+    for _ in range(calls):
+        with pytest.raises(ConnectionError):
+            breaker.chat_completion(MESSAGES, "llama3-70b-8192")
+
+def test_fails_fast_once_open():
+    primary = Flaky()
+    breaker = CircuitBreakerBackend(primary, min_calls=4, window=4)
+    trip(breaker, 4)
+    assert breaker.stats()["state"] == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.chat_completion(MESSAGES, "llama3-70b-8192")
+    assert len(primary.calls) == 4
+
+def test_routes_to_a_fallback_and_probes_for_recovery():
+    primary, fallback = Flaky(), Flaky(failing=False)
+    breaker = CircuitBreakerBackend(primary, fallback=fallback, fallback_model="llama3-8b-8192",
+                                    min_calls=2, window=2, open_for=0.05)
+    trip(breaker, 2)
+    assert breaker.chat_completion(MESSAGES, "llama3-70b-8192").model == "llama3-8b-8192"
+    time.sleep(0.06)
+    # The probe fails, so the breaker opens again
+    trip(breaker, 1)
+    assert breaker.stats()["state"] == "open"
+    primary.failing = False
+    time.sleep(0.06)
+    assert breaker.chat_completion(MESSAGES, "llama3-70b-8192").model == "llama3-70b-8192"
+    assert breaker.stats()["state"] == "closed"
+    assert breaker.stats()["opened"] == 2 and breaker.stats()["fallbacks"] == 1
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreakerBackend(Flaky(failing=False, latency=0.02), latency_threshold=0.01, min_calls=2, window=2)
+    for _ in range(2):
+        breaker.chat_completion(MESSAGES, "llama3-70b-8192")
+    assert breaker.stats()["state"] == "open"
+
+def test_results_record_the_model_that_served_each_stage():
+    breaker = CircuitBreakerBackend(Flaky(), fallback=GroqBackend(FakeClient()), fallback_model="llama3-8b-8192",
+                                    min_calls=1, window=1)
+    trip(breaker, 1)
+    evaluator = GroqEval(backend=breaker)
+    result = evaluator("bias").score(output="One. Two", prompt="A prompt.")
+    assert result.models == {"decomposition": "llama3-8b-8192", "scoring": "llama3-8b-8192"}
+    assert result.to_dict()["models"]["scoring"] == "llama3-8b-8192"
+    streamed = evaluator("bias").score(output="One. Two", prompt="A prompt.", on_score=lambda score: None)
+    assert streamed.models["scoring"] == "llama3-8b-8192"
+
+def test_evaluator_option(offline_evaluator):
+    evaluator = GroqEval(api_key="offline", circuit_breaker={"fallback_model": "llama3-8b-8192"})
+    assert isinstance(evaluator.backend, CircuitBreakerBackend)
+    assert evaluator.backend.fallback_model == "llama3-8b-8192"
+    result = offline_evaluator("bias").score(output="One. Two", prompt="A prompt.")
+    assert result.models == {"decomposition": "llama3-70b-8192", "scoring": "llama3-70b-8192"}
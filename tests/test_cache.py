@@ -0,0 +1,160 @@
+import socketserver
+import sqlite3
+import threading
+import pytest
+from conftest import FakeClient
+from test_backends import local_server
+from test_telemetry import Recorder
+from groqeval import GroqEval
+from groqeval import telemetry
+from groqeval.backends import GroqBackend, OpenAICompatibleBackend
+from groqeval.breaker import CircuitBreakerBackend
+from groqeval.cache import RedisCache, SQLiteCache, export_snapshot, import_snapshot, main
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """
+        A stand-in for a Redis server that knows the commands the cache sends
+    """
+    def read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2].decode("utf-8"))
+        return args
+
+    def bulk(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        data = value.encode("utf-8")
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+    def handle(self):
+        data = self.server.data
+        while (args := self.read_command()) is not None:
+            command = args[0].upper()
+            self.server.commands.append(command)
+            if command in ("AUTH", "SELECT"):
+                reply = b"+OK\r\n" if command == "SELECT" or args[-1] == "secret" else b"-WRONGPASS invalid password\r\n"
+            elif command == "GET":
+                reply = self.bulk(data.get(args[1]))
+            elif command == "SET":
+                data[args[1]] = args[2]
+                reply = b"+OK\r\n"
+            elif command == "SCAN":
+                keys = [key for key in data if key.startswith(args[3].rstrip("*"))]
+                reply = b"*2\r\n" + self.bulk("0") + b"*%d\r\n" % len(keys) + b"".join(self.bulk(key) for key in keys)
+            else:
+                reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+@pytest.fixture()
+def redis_url():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), RespHandler)
+    server.daemon_threads = True
+    server.data, server.commands = {}, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"redis://:secret@127.0.0.1:{server.server_address[1]}/2", server
+    server.shutdown()
+    server.server_close()
+
+def score(cache, **options):
+    client = FakeClient()
+    with GroqEval(backend=GroqBackend(client), cache=cache) as evaluator:
+        result = evaluator("answer_relevance").score(output="Solar is cheap. Wind varies", prompt="Energy?", **options)
+    return result, client.completions.calls
+
+def test_workers_share_a_sqlite_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, calls = score(path)
+    assert len(calls) == 2
+    second, calls = score(f"sqlite:///{path}")
+    assert calls == [] and second.score == first.score
+    assert second.models == first.models
+
+def test_redis_cache_and_snapshots(tmp_path, redis_url, capsys):
+    url, server = redis_url
+    first, calls = score(url)
+    assert len(calls) == 2
+    assert server.commands[:2] == ["AUTH", "SELECT"]
+    assert all(key.startswith("groqeval:") for key in server.data)
+    # A new worker starts warm from a snapshot of the shared cache
+    snapshot = str(tmp_path / "snapshot.jsonl")
+    main(["export", "--cache", url, "--snapshot", snapshot])
+    assert capsys.readouterr().out.strip() == "2"
+    assert import_snapshot(SQLiteCache(str(tmp_path / "warm.db")), snapshot) == 2
+    second, calls = score(str(tmp_path / "warm.db"))
+    assert calls == [] and second.score == first.score
+    assert export_snapshot(SQLiteCache(str(tmp_path / "warm.db")), str(tmp_path / "again.jsonl")) == 2
+
+def test_wrong_password_is_an_error(redis_url):
+    url, _ = redis_url
+    with pytest.raises(Exception, match="WRONGPASS"):
+        RedisCache(url.replace("secret", "guess")).get("key")
+
+def test_an_unreachable_cache_is_skipped(redis_url):
+    url, server = redis_url
+    server.shutdown()
+    server.server_close()
+    recorder = telemetry.add_hook(Recorder())
+    try:
+        result, calls = score(RedisCache(url, timeout=0.5))
+    finally:
+        telemetry.remove_hook(recorder)
+    assert result.score is not None and len(calls) == 2
+    # A failed read and a failed write for each of the two calls
+    assert [event.name for event in recorder.events].count("cache_error") == 4
+
+def test_streamed_responses_are_cached_only_when_complete(tmp_path):
+    path = str(tmp_path / "cache.db")
+    seen = []
+    _, calls = score(path, on_score=seen.append)
+    assert len(calls) == 2 and len(seen) == 2
+    _, calls = score(path, on_score=seen.append)
+    assert calls == [] and len(seen) == 4
+    client = FakeClient()
+    client.completions.chunk_size = 4
+    with GroqEval(backend=GroqBackend(client), cache=path) as evaluator:
+        evaluator("toxicity").score(output="Abc. Abcdefg. A", prompt="A prompt.", threshold=6)
+    # The toxicity decomposition is stored, its scores were cut off at the threshold and are not
+    assert len(list(SQLiteCache(path).items())) == 3
+
+def test_a_locked_sqlite_cache_is_skipped(tmp_path):
+    path = str(tmp_path / "cache.db")
+    store = SQLiteCache(path)
+    locker = sqlite3.connect(path, isolation_level=None)
+    locker.execute("BEGIN EXCLUSIVE")
+    store._connect = lambda: sqlite3.connect(path, timeout=0.05, isolation_level=None)
+    recorder = telemetry.add_hook(Recorder())
+    try:
+        result, calls = score(store)
+    finally:
+        locker.close()
+        telemetry.remove_hook(recorder)
+    assert result.score is not None and len(calls) == 2
+    # "database is locked" is a sqlite3.OperationalError, not an OSError
+    assert [event.attributes["error"] for event in recorder.events if event.name == "cache_error"] == ["OperationalError"] * 2
+
+def test_fallback_responses_are_not_cached(tmp_path):
+    path = str(tmp_path / "cache.db")
+    client = FakeClient()
+    breaker = CircuitBreakerBackend(GroqBackend(client), fallback_model="llama3-8b-8192")
+    breaker.trip()
+    with GroqEval(backend=breaker, cache=path) as evaluator:
+        result = evaluator("answer_relevance").score(output="Solar is cheap. Wind varies", prompt="Energy?")
+        streamed = evaluator("answer_relevance").score(output="Solar is cheap. Wind varies", prompt="Energy?",
+                                                       on_score=lambda score: None)
+    assert result.models["scoring"] == streamed.models["scoring"] == "llama3-8b-8192"
+    assert list(SQLiteCache(path).items()) == []
+
+def test_responses_of_mapped_models_are_cached(tmp_path):
+    path = str(tmp_path / "cache.db")
+    requests = []
+    backend = OpenAICompatibleBackend("http://localhost:8080/v1", model="local-llama", http_client=local_server(requests))
+    with GroqEval(backend=backend, cache=path) as evaluator:
+        for _ in range(2):
+            evaluator("toxicity").score(output="One opinion. Another", prompt="A prompt.")
+    assert len(requests) == 2
+    assert len(list(SQLiteCache(path).items())) == 2
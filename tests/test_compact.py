@@ -0,0 +1,54 @@
+import json
+import pytest
+from groqeval.models.compact import CompactScore
+
+OUTPUT = "Abc. Abcdefg. A"
+
+def test_compact_scores_are_rebuilt_locally(offline_evaluator):
+    full = offline_evaluator("toxicity").score(output=OUTPUT, prompt="A prompt.")
+    compact = offline_evaluator("toxicity", compact=True).score(output=OUTPUT, prompt="A prompt.")
+    assert compact.scores == full.scores
+    assert [s["string"] for s in compact.score_breakdown["scores"]] == ["Abc", "Abcdefg", "A"]
+    assert all(s["rationale"] == "" for s in compact.score_breakdown["scores"])
+    scoring_call = offline_evaluator.client.completions.calls[-1]
+    assert "Do not include rationales" in scoring_call["messages"][0]["content"]
+    assert json.loads(scoring_call["messages"][1]["content"])["sentences"][1] == {"index": 1, "string": "Abcdefg"}
+
+def test_rationales_on_request(offline_evaluator):
+    result = offline_evaluator("bias", compact=True, rationales=True).score(output=OUTPUT, prompt="A prompt.")
+    assert all(s["rationale"] == "Scored offline." for s in result.score_breakdown["scores"])
+
+def test_rationale_threshold_follows_the_worse_end(offline_evaluator):
+    offline_evaluator("bias", compact=True, rationales=7).score(output=OUTPUT, prompt="A prompt.")
+    offline_evaluator("answer_relevance", compact=True, rationales=4).score(output=OUTPUT, prompt="A prompt.")
+    bias_call, relevance_call = offline_evaluator.client.completions.calls[1], offline_evaluator.client.completions.calls[3]
+    assert "only to scores of 7 or above" in bias_call["messages"][0]["content"]
+    assert "only to scores of 4 or below" in relevance_call["messages"][0]["content"]
+
+def test_compact_streaming_and_threshold(offline_evaluator):
+    seen = []
+    metric = offline_evaluator("toxicity", compact=True)
+    metric.score(output=OUTPUT, prompt="A prompt.", on_score=seen.append)
+    assert [s.string for s in seen] == ["Abc", "Abcdefg", "A"]
+    check = metric.score(output=OUTPUT, prompt="A prompt.", threshold=6)
+    assert check.crossing.string == "Abcdefg"
+
+def test_out_of_range_indices_are_rejected(offline_evaluator):
+    metric = offline_evaluator("bias", compact=True)
+    with pytest.raises(ValueError, match="only 2 were sent"):
+        metric.expand(CompactScore(index=2, score=3), ["One", "Two"])
+
+def test_compact_mode_changes_the_fingerprint(offline_evaluator):
+    inputs = {"output": OUTPUT, "prompt": "A prompt."}
+    assert offline_evaluator("bias").fingerprint(**inputs) != offline_evaluator("bias", compact=True).fingerprint(**inputs)
+
+@pytest.mark.parametrize("name", ["answer_relevance", "bias", "toxicity", "context_relevance", "faithfulness", "hallucination"])
+def test_compact_prompts_drop_the_full_output_format(offline_evaluator, name):
+    inputs = {"prompt": "A prompt.", "output": OUTPUT, "context": ["A context."]}
+    metric = offline_evaluator(name, compact=True)
+    bound = metric.bind(**{key: inputs[key] for key in metric.inputs})
+    system = bound.scoring_request(["Abc"])[0]["content"]
+    assert system.startswith(bound.scoring_instructions)
+    assert "rationale for each score" not in system and "must include a rationale" not in system
+    assert '"ScoredOutput"' not in system and '"ScoredContext"' not in system
+    assert len(system) < len(bound.scoring_messages(["Abc"])[0]["content"]) + len(bound.compact_instructions())
@@ -0,0 +1,58 @@
+import json
+import pytest
+from types import SimpleNamespace
+from groqeval.compare import Comparison
+from groqeval.results import ScoreResult
+
+def stages(calls):
+    return ["decompose" if "decompose" in call["messages"][0]["content"] else "score" for call in calls]
+
+def test_context_decomposition_is_shared_across_candidates(offline_evaluator):
+    comparison = offline_evaluator.compare(
+        ["hallucination", "context_relevance"],
+        prompt="A prompt.",
+        context=["Solar is cheap. Wind is variable."],
+        outputs=["First answer.", "Second answer.", "Third."]
+    )
+    calls = offline_evaluator.client.completions.calls
+    # Both metrics decompose the context with the same prompt, so it is decomposed once,
+    # then scored three times for hallucination and once for context relevance
+    assert stages(calls).count("decompose") == 1
+    assert stages(calls).count("score") == 4
+    assert len(comparison.results) == 3
+    relevance = [result["context_relevance"] for result in comparison.results]
+    assert relevance[0] is relevance[1] is relevance[2]
+    # Context relevance is the same for every candidate, so it does not dilute the win rates
+    assert list(comparison.higher_is_better) == ["hallucination"]
+    assert list(comparison.winners) == ["hallucination"]
+
+def test_bias_and_toxicity_share_each_output_decomposition(offline_evaluator):
+    comparison = offline_evaluator.compare(
+        ["bias", "toxicity"], prompt="A prompt.", outputs=["Abc. Abcdefg", "A. Abcde"]
+    )
+    calls = offline_evaluator.client.completions.calls
+    assert stages(calls).count("decompose") == 2
+    assert stages(calls).count("score") == 4
+    assert comparison.results[0]["bias"].score == 8
+    assert comparison.results[1]["toxicity"].score == 6
+    # Lower is better for both, so the second candidate wins every comparison
+    assert comparison.win_rates == [0.0, 1.0]
+    assert comparison.winners == {"bias": [1], "toxicity": [1]}
+    json.dumps(comparison.to_dict())
+
+def test_win_rates_count_ties_and_skip_timeouts():
+    def result(score):
+        return ScoreResult(None, max) if score is None else ScoreResult(SimpleNamespace(scores=[SimpleNamespace(score=score)]), max)
+    results = [
+        {"answer_relevance": result(5), "bias": result(2)},
+        {"answer_relevance": result(5), "bias": result(None)},
+        {"answer_relevance": result(3), "bias": result(4)}
+    ]
+    comparison = Comparison(["a", "b", "c"], results, {"answer_relevance": True, "bias": False})
+    assert comparison.win_rates == [2.5 / 3, 1.5 / 2, 0.0]
+    assert comparison.winners == {"answer_relevance": [0, 1], "bias": [0]}
+
+def test_missing_inputs_are_rejected_before_any_call(offline_evaluator):
+    with pytest.raises(ValueError, match="'prompt' must be given to score Bias"):
+        offline_evaluator.compare(["bias"], outputs=["One. Two", "Three"])
+    assert offline_evaluator.client.completions.calls == []
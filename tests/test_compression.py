@@ -0,0 +1,47 @@
+from groqeval.compression import compress_context, shingles, MinHasher
+
+RETRIEVED = [
+    "Solar panels convert sunlight into electricity using photovoltaic cells made of silicon.",
+    "solar panels convert sunlight into  electricity using photovoltaic cells made of silicon.",
+    "Wind turbines generate power from the kinetic energy of moving air across their blades.",
+    "Solar panels convert sunlight into electricity using photovoltaic cells made of silicon wafers.",
+]
+
+def test_exact_and_near_duplicates_are_merged():
+    compressed = compress_context(RETRIEVED, threshold=0.7)
+    assert len(compressed.chunks) == 2
+    # The longest chunk of a group represents it
+    assert compressed.chunks[0] == RETRIEVED[3]
+    assert compressed.sources == [[0, 1, 3], [2]]
+
+def test_distinct_chunks_are_kept():
+    compressed = compress_context(["The cat sat on the mat.", "Interest rates rose again in March."])
+    assert compressed.chunks == ["The cat sat on the mat.", "Interest rates rose again in March."]
+
+def test_minhash_estimates_jaccard():
+    hasher = MinHasher(permutations=128)
+    first, second = shingles(" ".join(map(str, range(100))), 1), shingles(" ".join(map(str, range(50, 150))), 1)
+    estimate = MinHasher.similarity(hasher.signature(first), hasher.signature(second))
+    assert abs(estimate - len(first & second) / len(first | second)) < 0.15
+
+def test_scores_are_attributed_to_original_chunks():
+    compressed = compress_context(RETRIEVED, threshold=0.7)
+    assert compressed.attribute("Wind turbines generate power from the kinetic energy of moving air") == [2]
+    assert compressed.attribute("solar panels convert sunlight into electricity") == [0, 1, 3]
+    assert compressed.attribute("Nothing related") == []
+
+def test_metrics_send_the_compressed_context(offline_evaluator):
+    metric = offline_evaluator("hallucination", context=RETRIEVED, output="Solar panels use silicon.", compress_context=True)
+    metric.score()
+    decomposition_call = offline_evaluator.client.completions.calls[0]
+    assert decomposition_call["messages"][1]["content"].count("\n- ") == 2
+    plain = offline_evaluator("hallucination", context=RETRIEVED, output="Solar panels use silicon.")
+    assert plain.fingerprint() != metric.fingerprint()
+
+def test_results_trace_sentences_to_the_original_context(offline_evaluator):
+    metric = offline_evaluator("hallucination", output="Solar panels use silicon.", compress_context={"threshold": 0.7})
+    result = metric.score(context=RETRIEVED)
+    assert [s["string"] for s in result.score_breakdown["scores"]] == [RETRIEVED[3], RETRIEVED[2]]
+    assert result.context_sources == [[0, 1, 3], [2]]
+    assert result.to_dict()["context_sources"] == [[0, 1, 3], [2]]
+    assert offline_evaluator("hallucination", context=RETRIEVED, output="Solar panels use silicon.").score().context_sources is None
@@ -0,0 +1,51 @@
+import pytest
+from groqeval.conversation import summary_window
+
+TURNS = [
+    {"role": "system", "content": "Be brief."},
+    {"role": "user", "content": "What is solar power?"},
+    {"role": "assistant", "content": "Power from the sun. It is renewable."},
+    {"role": "user", "content": "And wind?"},
+    {"role": "assistant", "content": "Power from moving air. It varies."},
+]
+
+def stages(calls):
+    return ["decompose" if "decompose" in call["messages"][0]["content"] else "score" for call in calls]
+
+def test_summary_window_is_bounded():
+    turns = TURNS + [{"role": "user", "content": "x" * 100}, {"role": "assistant", "content": "Ok."}]
+    assert summary_window(turns, 2, 4, 50) == "What is solar power?"
+    prompt = summary_window(turns, 6, 2, 20)
+    assert prompt.startswith("Conversation so far:\nuser: And wind?\nassistant: Power from moving...")
+    assert "solar" not in prompt
+    assert prompt.endswith("Current message: " + "x" * 100)
+
+def test_unanswered_turn_is_rejected():
+    with pytest.raises(ValueError, match="does not answer a user message"):
+        summary_window([{"role": "assistant", "content": "Hi."}], 0, 4, 50)
+
+def test_appended_turns_only_score_the_new_ones(offline_evaluator):
+    metric = offline_evaluator.conversation("toxicity", window=2)
+    calls = offline_evaluator.client.completions.calls
+    first = metric.score(TURNS)
+    assert len(first) == 2 and all(result.score is not None for result in first)
+    assert stages(calls).count("score") == 2
+    longer = TURNS + [{"role": "user", "content": "Which is cheaper?"}, {"role": "assistant", "content": "Both are cheap."}]
+    second = metric.score(longer)
+    assert second[:2] == first
+    # Only the new turn was decomposed and scored
+    assert stages(calls).count("decompose") == 3
+    assert stages(calls).count("score") == 3
+
+def test_faithfulness_uses_turn_context_and_window(offline_evaluator):
+    metric = offline_evaluator.conversation("faithfulness", context=["Solar is renewable."])
+    results = metric.score(TURNS)
+    assert len(results) == 2
+    scoring = [call for call in offline_evaluator.client.completions.calls if "decompose" not in call["messages"][0]["content"]]
+    prompts = sorted(call["messages"][0]["content"] for call in scoring)
+    assert all("- Solar is renewable." in prompt for prompt in prompts)
+    assert sum("Current message: And wind?" in prompt for prompt in prompts) == 1
+
+def test_metrics_without_a_conversation_variant(offline_evaluator):
+    with pytest.raises(ValueError, match="no conversation variant"):
+        offline_evaluator.conversation("hallucination")
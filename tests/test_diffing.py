@@ -0,0 +1,53 @@
+from conftest import FakeClient
+from groqeval import GroqEval
+from groqeval.backends import GroqBackend
+from groqeval.breaker import CircuitBreakerBackend
+from groqeval.diffing import run_incremental
+from groqeval.results import ResultTable
+
+def make_records(count):
+    return [{"id": f"r{i}", "prompt": "Discuss urbanization.", "output": f"Cities grow. Record {i}."} for i in range(count)]
+
+def test_only_changed_records_are_evaluated(offline_evaluator):
+    completions = offline_evaluator.client.completions
+    records = make_records(10)
+    first, counts = run_incremental(offline_evaluator, ["bias", "toxicity"], records, [])
+    assert counts == {"evaluated": 20, "carried_over": 0}
+
+    records[3] = dict(records[3], output="A changed output.")
+    records.append({"id": "r10", "prompt": "Discuss urbanization.", "output": "A new record."})
+    calls = len(completions.calls)
+    second, counts = run_incremental(offline_evaluator, ["bias", "toxicity"], records, ResultTable.from_results(first))
+    assert counts == {"evaluated": 4, "carried_over": 18}
+    assert len(completions.calls) - calls == 8
+    assert [(r["record_id"], r["metric"]) for r in second] == [
+        (f"r{i}", metric) for i in range(11) for metric in ("bias", "toxicity")
+    ]
+    assert second[0] == first[0]
+
+def test_prompt_version_invalidates_results(offline_evaluator, monkeypatch):
+    records = make_records(3)
+    first, _ = run_incremental(offline_evaluator, ["bias"], records, [])
+    monkeypatch.setattr("groqeval.metrics.bias.Bias.prompt_version", 2)
+    _, counts = run_incremental(offline_evaluator, ["bias"], records, first)
+    assert counts == {"evaluated": 3, "carried_over": 0}
+
+def test_failed_results_are_retried(offline_evaluator):
+    records = make_records(2)
+    records[1]["prompt"] = ""
+    first, _ = run_incremental(offline_evaluator, ["bias"], records, [])
+    records[1]["prompt"] = "Fixed."
+    _, counts = run_incremental(offline_evaluator, ["bias"], records, first)
+    assert counts == {"evaluated": 1, "carried_over": 1}
+
+def test_fallback_results_are_not_carried_over():
+    breaker = CircuitBreakerBackend(GroqBackend(FakeClient()), fallback_model="llama3-8b-8192")
+    breaker.trip()
+    records = make_records(2)
+    with GroqEval(backend=breaker) as evaluator:
+        first, _ = run_incremental(evaluator, ["bias"], records, [])
+        assert all(result["fallback"] and "fingerprint" not in result for result in first)
+        breaker.state = "closed"
+        second, counts = run_incremental(evaluator, ["bias"], records, ResultTable.from_results(first))
+    assert counts == {"evaluated": 2, "carried_over": 0}
+    assert all(result["models"]["scoring"] == "llama3-70b-8192" for result in second)
@@ -1,6 +1,8 @@
 import os
 import importlib
 import pytest
+import httpx
+from groqeval import GroqEval
 from conftest import get_class_args, generate_random_value
 
 def metricize(file_name: str):
@@ -38,4 +40,37 @@ def test_load_base_metric(evaluator, metrics_module):
     class_args = get_class_args(class_)
     random_args = {name: generate_random_value(param) for name, param in class_args.items()}
     with pytest.raises(TypeError, match=f"{class_name} is not a valid metric class"):
-        base_metric = evaluator(module_name, **random_args)
\ No newline at end of file
+        base_metric = evaluator(module_name, **random_args)
+
+def test_transport_options():
+    with GroqEval(api_key="offline", timeout=12.5, max_retries=5, max_connections=8) as evaluator:
+        http_client = evaluator.client._client
+        assert evaluator.client.max_retries == 5
+        assert evaluator.client.timeout == 12.5
+        assert evaluator("bias", prompt="A prompt.", output="An output.").groq_client is evaluator.client
+    assert http_client.is_closed
+
+def test_caller_owned_http_client_is_left_open():
+    http_client = httpx.Client()
+    with GroqEval(api_key="offline", http_client=http_client) as evaluator:
+        assert evaluator.client._client is http_client
+    assert not http_client.is_closed
+    http_client.close()
+
+def test_reusable_metric(offline_evaluator):
+    toxicity = offline_evaluator.metric("toxicity")
+    first = toxicity.score(prompt="A prompt.", output="A short output")
+    second = toxicity.score(prompt="A prompt.", output="A much longer output here")
+    assert first.scores != second.scores
+    assert toxicity.prompt is None and toxicity.output is None
+    with pytest.raises(ValueError, match="'output' must be given to score Toxicity"):
+        toxicity.score()
+    with pytest.raises(ValueError, match="'output' cannot be an empty string"):
+        toxicity.score(prompt="A prompt.", output="")
+    with pytest.raises(TypeError, match="unexpected inputs: context"):
+        toxicity.score(prompt="A prompt.", output="An output.", context=["A context."])
+
+def test_metric_logger_is_configured_once(offline_evaluator):
+    handlers = len(offline_evaluator("bias", prompt="A prompt.", output="An output.").logger.handlers)
+    offline_evaluator("bias", prompt="A prompt.", output="An output.", verbose=True)
+    assert len(offline_evaluator("bias", prompt="A prompt.", output="An output.").logger.handlers) == handlers
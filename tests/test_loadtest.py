@@ -0,0 +1,34 @@
+import random
+import pytest
+from groqeval import GroqEval
+from groqeval.loadtest import StubBackend, latency_distribution, run_load_test, synthetic_records, main
+
+def test_latency_distributions():
+    generator = random.Random(0)
+    assert latency_distribution("0.2")(generator) == 0.2
+    assert 0.1 <= latency_distribution("uniform:0.1:0.3")(generator) <= 0.3
+    assert latency_distribution("lognormal:0.2:0.0")(generator) == pytest.approx(0.2)
+    with pytest.raises(ValueError, match="Unknown latency distribution"):
+        latency_distribution("pareto:1")
+
+def test_closed_loop_reports_stages_and_errors():
+    backend = StubBackend(latency=0.001, throttle_rate=0.2, error_rate=0.1, seed=1)
+    with GroqEval(backend=backend) as evaluator:
+        report = run_load_test(evaluator, ["bias", "hallucination"], synthetic_records(10, seed=1),
+                               concurrency=4, duration=None, max_records=40, sample_interval=0.05)
+    assert report.records == 40 and report.results == 80
+    assert {"decomposition", "scoring", "parse", "record"} <= set(report.stages)
+    stage = report.stages["decomposition"]
+    assert stage.p50 <= stage.p95 <= stage.p99 <= stage.max
+    assert set(report.errors) == {"RateLimitError", "InternalServerError"}
+    assert len(report.memory) >= 2 and report.throughput > 0
+
+def test_open_loop_holds_the_target_rate():
+    with GroqEval(backend=StubBackend(latency=0.001, sentences=3, rationale_words=50)) as evaluator:
+        report = run_load_test(evaluator, ["toxicity"], synthetic_records(5), rate=50, duration=0.5)
+    assert 20 <= report.records <= 26
+    assert not report.errors
+
+def test_command_line(capsys):
+    main(["--metrics", "bias", "--duration", "0.3", "--latency", "0.001", "--adaptive"])
+    assert '"throughput"' in capsys.readouterr().out
@@ -0,0 +1,37 @@
+import time
+import pytest
+from groqeval.monitor import OnlineMonitor
+
+EVENT = {"prompt": "Discuss urbanization.", "output": "Cities are crowded. Jobs follow people."}
+
+def test_monitor_evaluates_sampled_events(offline_evaluator):
+    with OnlineMonitor(offline_evaluator, ["toxicity", "answer_relevance"], sample_rate=1.0, seed=0) as monitor:
+        for _ in range(5):
+            assert monitor.submit(**EVENT)
+    snapshot = monitor.snapshot()
+    assert snapshot["counters"]["sampled"] == 5 and snapshot["counters"]["queued"] == 0
+    assert snapshot["metrics"]["toxicity"]["count"] == 5
+    assert snapshot["metrics"]["answer_relevance"]["mean"] is not None
+
+def test_submit_does_not_block_and_drops_under_overload(offline_evaluator):
+    offline_evaluator.client.completions.delays["decompose"] = 0.2
+    monitor = OnlineMonitor(offline_evaluator, ["toxicity"], sample_rate=1.0, capacity=3,
+                            drop_policy="newest", workers=1)
+    start = time.monotonic()
+    accepted = [monitor.submit(**EVENT) for _ in range(20)]
+    assert time.monotonic() - start < 0.1
+    assert not all(accepted)
+    assert monitor.snapshot()["counters"]["dropped"] >= 16
+    monitor.close(wait=False)
+
+def test_sampling_rate(offline_evaluator):
+    monitor = OnlineMonitor(offline_evaluator, ["toxicity"], sample_rate=0.0)
+    assert not monitor.submit(**EVENT)
+    monitor.close()
+    assert monitor.snapshot()["counters"] == {
+        "submitted": 1, "sampled": 0, "dropped": 0, "evaluated": 0, "failed": 0, "queued": 0
+    }
+
+def test_invalid_drop_policy(offline_evaluator):
+    with pytest.raises(ValueError, match="drop_policy must be one of"):
+        OnlineMonitor(offline_evaluator, ["toxicity"], drop_policy="random")
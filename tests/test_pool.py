@@ -0,0 +1,64 @@
+import pytest
+from groq import BadRequestError
+from conftest import FakeClient
+from groqeval import GroqEval
+from groqeval.backends import parse_duration
+from groqeval.pool import KeyPoolBackend
+
+MESSAGES = [{"role": "system", "content": "decompose"}, {"role": "user", "content": "One. Two"}]
+
+def test_parse_duration():
+    assert parse_duration("7.66s") == pytest.approx(7.66)
+    assert parse_duration("2m59.56s") == pytest.approx(179.56)
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("3") == 3.0
+    assert parse_duration(None) is None
+
+def test_requests_go_to_the_key_with_the_most_quota():
+    low, high = FakeClient(), FakeClient()
+    low.completions.headers = {"x-ratelimit-remaining-requests": "5", "x-ratelimit-remaining-tokens": "1000"}
+    high.completions.headers = {"x-ratelimit-remaining-requests": "500", "x-ratelimit-remaining-tokens": "90000"}
+    pool = KeyPoolBackend([low, high])
+    for _ in range(6):
+        pool.chat_completion(MESSAGES, "llama3-70b-8192")
+    # Both are tried once before their limits are known
+    assert len(low.completions.calls) == 1
+    assert len(high.completions.calls) == 5
+    usage = pool.usage()
+    assert usage["1:client"]["requests"] == 5 and usage["1:client"]["remaining_requests"] == 500
+
+def test_throttled_keys_sit_out_until_their_limit_resets():
+    throttled, healthy = FakeClient(), FakeClient()
+    throttled.completions.failures = [(429, {"retry-after": "30"})]
+    pool = KeyPoolBackend([throttled, healthy])
+    response = pool.chat_completion(MESSAGES, "llama3-70b-8192")
+    assert response.choices[0].message.content
+    for _ in range(3):
+        pool.chat_completion(MESSAGES, "llama3-70b-8192")
+    assert len(throttled.completions.calls) == 1
+    usage = pool.usage()
+    assert usage["0:client"]["throttled"] == 1 and usage["0:client"]["cooling_down"]
+    assert usage["1:client"]["requests"] == 4
+
+def test_exhausted_keys_sit_out():
+    exhausted, spare = FakeClient(), FakeClient()
+    exhausted.completions.headers = {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1m"}
+    pool = KeyPoolBackend([exhausted, spare])
+    for _ in range(3):
+        pool.chat_completion(MESSAGES, "llama3-70b-8192")
+    assert len(exhausted.completions.calls) == 1
+
+def test_failing_keys_cool_down_and_bad_requests_raise():
+    failing, healthy = FakeClient(), FakeClient()
+    failing.completions.failures = [(503, {})]
+    pool = KeyPoolBackend([failing, healthy], failure_cooldown=60)
+    pool.chat_completion(MESSAGES, "llama3-70b-8192")
+    assert pool.usage()["0:client"]["failed"] == 1
+    healthy.completions.failures = [(400, {})]
+    with pytest.raises(BadRequestError):
+        pool.chat_completion(MESSAGES, "llama3-70b-8192")
+
+def test_evaluator_accepts_a_list_of_keys():
+    with GroqEval(api_key=["gsk_first_1111", "gsk_second_2222"]) as evaluator:
+        assert isinstance(evaluator.backend, KeyPoolBackend)
+        assert sorted(evaluator.backend.usage()) == ["0:...1111", "1:...2222"]
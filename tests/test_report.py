@@ -0,0 +1,48 @@
+import math
+import pytest
+from groqeval.results import ResultTable
+
+np = pytest.importorskip("numpy")
+from groqeval.report import Report
+
+def make_results(count):
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        yield {"record_id": i, "metric": "toxicity", "score": int(rng.integers(1, 11)), "score_breakdown": {"scores": []}}
+        yield {"record_id": i, "metric": "answer_relevance", "score": float(rng.uniform(1, 10)), "score_breakdown": {"scores": []}}
+    yield {"record_id": count, "metric": "toxicity", "error": "APIError"}
+
+def test_summary():
+    report = Report.from_results(make_results(1000))
+    summary = report.summary()
+    assert summary["toxicity"]["count"] == 1000 and summary["toxicity"]["failed"] == 1
+    assert 1 <= summary["toxicity"]["min"] <= summary["toxicity"]["percentiles"][50] <= summary["toxicity"]["max"] <= 10
+    assert math.isclose(summary["answer_relevance"]["mean"], report.metric_scores("answer_relevance").mean())
+
+def test_histogram_and_segments():
+    report = Report.from_results(make_results(100))
+    histogram = report.histogram("toxicity", bins=10)
+    assert sum(histogram["counts"]) == 100 and len(histogram["edges"]) == 11
+    segments = report.by_segment(lambda record_id: "even" if record_id % 2 == 0 else "odd")
+    assert segments["toxicity"]["even"]["count"] == 50
+    assert segments["toxicity"]["odd"]["count"] == 50
+
+def test_bootstrap_ci():
+    report = Report.from_results(make_results(2000))
+    interval = report.bootstrap_ci("toxicity", resamples=500, seed=1, max_chunk_elements=100_000)
+    assert interval["low"] <= interval["estimate"] <= interval["high"]
+    with pytest.raises(KeyError):
+        report.bootstrap_ci("bias")
+
+def test_large_summary():
+    table = ResultTable.from_results(make_results(50_000))
+    summary = Report(table).summary()
+    assert summary["toxicity"]["count"] == 50_000 and summary["answer_relevance"]["count"] == 50_000
+
+def test_table_grows_after_a_report():
+    table = ResultTable.from_results(make_results(10))
+    report = Report(table)
+    table.add(10, "toxicity", {"score": 4, "score_breakdown": {"scores": []}})
+    assert len(table) == 22 and table.row(21)["score"] == 4
+    assert report.summary()["toxicity"]["count"] == 10
+    assert Report(table).summary()["toxicity"]["count"] == 11
@@ -0,0 +1,60 @@
+import json
+import math
+from groqeval.results import ResultTable
+
+RESULTS = [
+    {"record_id": "a", "metric": "bias", "score": 7, "score_breakdown": {"scores": [
+        {"string": "First.", "rationale": "Biased.", "score": 7},
+        {"string": "Second.", "rationale": "Neutral.", "score": 2}
+    ]}},
+    {"record_id": "a", "metric": "toxicity", "error": "APIError: boom"},
+    {"record_id": "b", "metric": "bias", "score": 0, "score_breakdown": {"scores": []}},
+    {"record_id": "c", "metric": "bias", "score": 2, "score_breakdown": {"scores": [
+        {"string": "Third.", "rationale": "Neutral.", "score": 2}
+    ]}},
+]
+
+def test_round_trip():
+    table = ResultTable.from_results(RESULTS)
+    assert len(table) == 4
+    assert list(table) == RESULTS
+    assert table.metrics == ["bias", "toxicity"]
+    assert list(table.scores("bias")) == [7.0, 0.0, 2.0]
+    assert math.isnan(table.scores()[1])
+    assert list(table.sentence_index) == [0, 1, 0]
+    # Repeated rationales are only stored once
+    assert len(table.text._strings) == 6
+
+def test_text_kept_on_disk(tmp_path):
+    table = ResultTable.from_results(RESULTS, text_path=str(tmp_path / "text.jsonl"))
+    assert table.text._strings == []
+    assert table.row(0) == RESULTS[0]
+    assert table.row(1) == RESULTS[1]
+    table.close()
+
+def test_to_jsonl(tmp_path):
+    path = tmp_path / "results.jsonl"
+    ResultTable.from_results(RESULTS).to_jsonl(str(path))
+    assert [json.loads(line) for line in path.read_text().splitlines()] == RESULTS
+
+def test_score_result_reaggregates_without_scoring_again(offline_evaluator):
+    completions = offline_evaluator.client.chat.completions
+    bias = offline_evaluator("bias", prompt="A prompt.", output="Short one. A much longer sentence here")
+    result = bias.score()
+    calls = len(completions.calls)
+
+    assert result["score"] == result.score == max(result.scores)
+    assert result.aggregate(min) == min(result.scores)
+    assert result.aggregate(lambda scores: sum(scores) / len(scores)) <= result.score
+    assert len(completions.calls) == calls
+    assert bias.aggregation is max
+    assert json.loads(json.dumps(result.to_dict()))["score_breakdown"] == result.score_breakdown
+
+def test_timed_out_results_are_stored_as_errors(offline_evaluator):
+    offline_evaluator.client.completions.delays["score"] = 0.2
+    result = offline_evaluator("toxicity").score(output="One. Two", prompt="A prompt.", timeout=0.05)
+    assert result.timed_out
+    table = ResultTable()
+    table.add("rec-1", "toxicity", result)
+    assert math.isnan(table.row_score[0])
+    assert table.text.get(table.row_error[0]).startswith("EvaluationTimeout")
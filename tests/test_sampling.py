@@ -0,0 +1,34 @@
+from groqeval.sampling import SequentialSampler
+
+def make_records(count):
+    return [
+        {"prompt": "Discuss urbanization.", "output": "Cities are big" + "!" * (i % 7), "kind": "short" if i % 3 else "long"}
+        for i in range(count)
+    ]
+
+def test_stops_once_precise_enough(offline_evaluator):
+    records = make_records(2000)
+    estimate = SequentialSampler(offline_evaluator, "toxicity", precision=0.5, seed=0).run(records)
+    assert estimate.stopped == "precision"
+    assert estimate.samples < len(records)
+    assert estimate.half_width <= 0.5
+    assert estimate.low <= estimate.mean <= estimate.high
+
+def test_budget_caps_the_sample(offline_evaluator):
+    estimate = SequentialSampler(offline_evaluator, "toxicity", precision=0.001, budget=40, seed=0).run(make_records(500))
+    assert estimate.stopped == "budget" and estimate.samples == 40
+
+def test_small_dataset_is_evaluated_exactly(offline_evaluator):
+    records = make_records(10)
+    estimate = SequentialSampler(offline_evaluator, "toxicity", precision=0.001, seed=0).run(records)
+    exact = sum(offline_evaluator.metric("toxicity").score(prompt=r["prompt"], output=r["output"]).score for r in records) / 10
+    assert estimate.stopped == "exhausted"
+    assert abs(estimate.mean - exact) < 1e-9 and estimate.half_width == 0
+
+def test_stratified_sampling(offline_evaluator):
+    estimate = SequentialSampler(
+        offline_evaluator, "toxicity", precision=0.5, strata=lambda record: record["kind"], max_concurrency=4, seed=1
+    ).run(make_records(900))
+    assert set(estimate.strata) == {"short", "long"}
+    assert estimate.strata["long"].population == 300
+    assert abs(estimate.strata["short"].samples - 2 * estimate.strata["long"].samples) <= 4
@@ -0,0 +1,105 @@
+import json
+import pytest
+from groqeval import sharding
+from groqeval.sharding import WorkQueue, ResultStore, run_worker
+
+def write_records(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({
+                "id": f"r{i}",
+                "prompt": "Discuss the impacts of urbanization on society.",
+                "output": f"Urbanization leads to overcrowding. Record number {i} is here."
+            }) + "\n")
+
+def test_work_queue_leases(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_timeout=600)
+    assert queue.populate(25, chunk_size=10) == 3
+    assert queue.populate(25, chunk_size=10) == 3
+    assert queue.claim("a") == (0, 10)
+    assert queue.claim("b") == (10, 20)
+    assert queue.complete(0, "a")
+    assert queue.pending() == 2
+    # Only the worker holding a lease can renew or complete it
+    assert not queue.renew(10, "a") and not queue.complete(10, "a")
+    assert queue.renew(10, "b") and queue.leased() == 1
+
+def test_work_queue_reclaims_expired_leases(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_timeout=0)
+    queue.populate(10, chunk_size=10)
+    assert queue.claim("dead-worker") == (0, 10)
+    assert queue.claim("new-worker") == (0, 10)
+    assert not queue.complete(0, "dead-worker")
+    assert queue.complete(0, "new-worker")
+
+def test_run_worker_and_merge(tmp_path, offline_evaluator):
+    records_path = str(tmp_path / "records.jsonl")
+    write_records(records_path, 7)
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.populate(7, chunk_size=3)
+    store = ResultStore(str(tmp_path / "results"))
+
+    processed = run_worker(offline_evaluator, ["bias", "answer_relevance"], records_path, queue, store, "w1")
+    assert processed == 7
+    assert queue.pending() == 0
+
+    # A second worker re-delivering a range must not duplicate results
+    store.write("w2", [{"record_id": "r0", "metric": "bias", "score": 1, "score_breakdown": {}}])
+    results = store.merge()
+    assert len(results) == 14
+    assert all("error" not in result for result in results)
+
+def test_bad_records_do_not_abort_the_range(tmp_path, offline_evaluator):
+    records_path = str(tmp_path / "records.jsonl")
+    with open(records_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"prompt": "", "output": "Some output."}) + "\n")
+        f.write(json.dumps({"prompt": "A prompt.", "output": "Some output."}) + "\n")
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.populate(2)
+    store = ResultStore(str(tmp_path / "results"))
+    run_worker(offline_evaluator, ["toxicity"], records_path, queue, store, "w1")
+
+    results = store.merge()
+    assert results[0]["record_id"] == 0 and "cannot be an empty string" in results[0]["error"]
+    assert results[1]["record_id"] == 1 and "score" in results[1]
+
+def test_store_to_table(tmp_path):
+    store = ResultStore(str(tmp_path / "results"))
+    store.write("w1", [{"record_id": 1, "metric": "bias", "error": "Timeout"}])
+    store.write("w2", [{"record_id": 1, "metric": "bias", "score": 3, "score_breakdown": {"scores": []}}])
+    table = store.to_table()
+    assert len(table) == 1 and list(table.scores()) == [3.0]
+
+def test_merge_orders_positional_ids_numerically(tmp_path):
+    store = ResultStore(str(tmp_path / "results"))
+    store.write("w1", [{"record_id": i, "metric": "bias", "score": 1, "score_breakdown": {}} for i in (10, 2, 1, 11, 0)])
+    assert [result["record_id"] for result in store.merge()] == [0, 1, 2, 10, 11]
+
+def crash(*args):
+    raise RuntimeError("Bad key")
+
+def test_run_raises_when_workers_fail(tmp_path, monkeypatch):
+    records_path = str(tmp_path / "records.jsonl")
+    write_records(records_path, 3)
+    monkeypatch.setattr(sharding, "_process_main", crash)
+    runner = sharding.ShardedRunner("key", ["bias"], str(tmp_path / "queue.db"), str(tmp_path / "results"), processes=2)
+    with pytest.raises(RuntimeError, match="2 of 2 workers failed"):
+        runner.run(records_path)
+
+def test_run_waits_for_ranges_leased_elsewhere(tmp_path, monkeypatch):
+    records_path = str(tmp_path / "records.jsonl")
+    write_records(records_path, 3)
+    runner = sharding.ShardedRunner("key", ["bias"], str(tmp_path / "queue.db"), str(tmp_path / "results"),
+                                    processes=1, poll_interval=0.01)
+    runner.enqueue(records_path)
+    assert runner.queue.claim("other-machine") == (0, 3)
+    polls = []
+
+    def other_machine_finishes(seconds):
+        polls.append(seconds)
+        runner.store.write("other-machine", [{"record_id": "r0", "metric": "bias", "score": 1, "score_breakdown": {}}])
+        runner.queue.complete(0, "other-machine")
+    monkeypatch.setattr(runner, "run_workers", lambda records_path: None)
+    monkeypatch.setattr(sharding.time, "sleep", other_machine_finishes)
+    assert [result["record_id"] for result in runner.run(records_path)] == ["r0"]
+    assert polls == [0.01]
@@ -0,0 +1,77 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from conftest import FakeClient
+from groqeval import GroqEval
+from groqeval.backends import ChatBackend, ChatResponse, GroqBackend
+from groqeval.exceptions import EvaluationTimeout
+from groqeval.singleflight import SingleFlightBackend
+
+MESSAGES = [{"role": "system", "content": "decompose"}, {"role": "user", "content": "One. Two"}]
+
+class Slow(ChatBackend):
+    def __init__(self, latency=0.2, error=None):
+        self.latency = latency
+        self.error = error
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def chat_completion(self, messages, model, temperature=0.5, response_format=None, timeout=None):
+        with self.lock:
+            self.calls.append(timeout)
+        if timeout is not None and timeout < self.latency:
+            time.sleep(timeout)
+            raise EvaluationTimeout()
+        time.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return ChatResponse.model_validate({"choices": [{"message": {"content": messages[1]["content"]}}], "model": model})
+
+def concurrently(function, count):
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [executor.submit(function, i) for i in range(count)]
+        return [future.exception() or future.result() for future in futures]
+
+def test_identical_calls_share_one_request():
+    slow = Slow()
+    backend = SingleFlightBackend(slow)
+    responses = concurrently(lambda i: backend.chat_completion(MESSAGES, "llama3-70b-8192", 0), 6)
+    assert len(slow.calls) == 1
+    assert all(response is responses[0] for response in responses)
+    assert backend.stats() == {"calls": 6, "coalesced": 5, "in_flight": 0}
+    # Finished calls are not kept
+    backend.chat_completion(MESSAGES, "llama3-70b-8192", 0)
+    assert len(slow.calls) == 2
+
+def test_different_calls_are_not_shared():
+    slow = Slow()
+    backend = SingleFlightBackend(slow)
+    concurrently(lambda i: backend.chat_completion(MESSAGES, "llama3-70b-8192", i), 3)
+    assert len(slow.calls) == 3
+
+def test_errors_are_shared():
+    backend = SingleFlightBackend(Slow(error=ConnectionError("Groq is down")))
+    errors = concurrently(lambda i: backend.chat_completion(MESSAGES, "llama3-70b-8192", 0), 3)
+    assert all(isinstance(error, ConnectionError) for error in errors)
+    assert len(backend.backend.calls) == 1
+
+def test_a_short_deadline_does_not_cut_off_the_others():
+    slow = Slow(latency=0.2)
+    backend = SingleFlightBackend(slow)
+    results = concurrently(
+        lambda i: (time.sleep(0.02 * i), backend.chat_completion(MESSAGES, "llama3-70b-8192", 0, timeout=0.05 if i == 0 else 1.0))[1],
+        3
+    )
+    assert isinstance(results[0], EvaluationTimeout)
+    assert results[1] is results[2]
+    assert len(slow.calls) == 2
+
+def test_duplicate_records_in_a_batch():
+    client = FakeClient()
+    client.completions.delays = {"decompose": 0.1, "score": 0.1}
+    evaluator = GroqEval(backend=GroqBackend(client), single_flight=True)
+    record = {"prompt": "A prompt.", "output": "One. Two"}
+    results = evaluator.batch(["toxicity"], [record] * 4, max_concurrency=4)
+    assert len({result["score"] for result in results}) == 1
+    assert len(client.completions.calls) == 2
+    assert evaluator.backend.stats()["coalesced"] == 6
@@ -0,0 +1,61 @@
+import json
+import httpx
+from conftest import FakeCompletions
+from groqeval.backends import OpenAICompatibleBackend
+from groqeval.models.output import Score
+from groqeval.streaming import IncrementalScoreParser
+
+def test_parser_emits_items_as_their_objects_close():
+    document = json.dumps({"scores": [
+        {"string": "A {braced} \"quoted\" sentence", "rationale": "r", "score": 3},
+        {"string": "Another", "rationale": "r", "score": 7}
+    ]})
+    parser = IncrementalScoreParser(Score)
+    items = []
+    for i in range(0, len(document), 5):
+        items.extend(parser.feed(document[i:i + 5]))
+        if i + 5 < document.index("Another"):
+            assert len(items) <= 1
+    assert [item.score for item in items] == [3, 7]
+    assert items[0].string == 'A {braced} "quoted" sentence'
+    assert parser.text == document
+
+def test_on_score_receives_scores_before_the_result(offline_evaluator):
+    seen = []
+    result = offline_evaluator("toxicity").score(
+        output="One sentence. Two sentences. Three sentences", prompt="A prompt.", on_score=seen.append
+    )
+    assert [item.score for item in seen] == result.scores
+    assert len(seen) == 3
+    streams = offline_evaluator.client.completions.streams
+    assert len(streams) == 1 and streams[0].consumed == len(streams[0].pieces)
+
+def test_closing_iter_scores_stops_the_stream(offline_evaluator):
+    offline_evaluator.client.completions.chunk_size = 4
+    scores = offline_evaluator("bias").iter_scores(output="First opinion. Second opinion. Third opinion", prompt="A prompt.")
+    first = next(scores)
+    scores.close()
+    assert first.string == "First opinion"
+    stream = offline_evaluator.client.completions.streams[0]
+    assert stream.closed and stream.consumed < len(stream.pieces)
+
+def test_openai_compatible_backend_streams_server_sent_events():
+    completions = FakeCompletions()
+
+    def handler(request):
+        body = json.loads(request.content)
+        assert body["stream"] is True
+        content = completions.create(body["messages"], body["model"]).choices[0].message.content
+        events = "".join(
+            f"data: {json.dumps({'choices': [{'delta': {'content': content[i:i + 10]}}]})}\n\n"
+            for i in range(0, len(content), 10)
+        )
+        return httpx.Response(200, text=events + "data: [DONE]\n\n")
+
+    backend = OpenAICompatibleBackend("http://localhost:8080/v1", http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+    chunks = list(backend.stream_chat_completion(
+        [{"role": "system", "content": "score"}, {"role": "user", "content": json.dumps({"sentences": ["One", "Two"]})}],
+        "llama3-70b-8192"
+    ))
+    assert len(chunks) > 1
+    assert [item["string"] for item in json.loads("".join(chunks))["scores"]] == ["One", "Two"]
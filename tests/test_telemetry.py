@@ -0,0 +1,65 @@
+import urllib.request
+import pytest
+from groqeval import telemetry
+from groqeval.telemetry import Hook, OpenTelemetryHook, PrometheusHook
+
+class Recorder(Hook):
+    def __init__(self):
+        self.events = []
+
+    def on_event(self, event):
+        self.events.append(event)
+
+@pytest.fixture()
+def recorder():
+    hook = telemetry.add_hook(Recorder())
+    yield hook
+    telemetry.remove_hook(hook)
+
+def test_stages_are_reported_by_metric_and_model(offline_evaluator, recorder):
+    metric = offline_evaluator("toxicity", output="One. Two", prompt="A prompt.")
+    metric.score()
+    metric.score()
+    names = [event.name for event in recorder.events]
+    assert names == ["construct", "decomposition", "parse", "scoring", "parse", "cache_hit"]
+    assert all(event.metric == "Toxicity" and event.model == "llama3-70b-8192" for event in recorder.events)
+    assert all(event.duration is not None for event in recorder.events if event.name != "cache_hit")
+    assert recorder.events[2].attributes["schema"] == "Output"
+
+def test_batch_queue_wait_and_streamed_scoring(offline_evaluator, recorder):
+    offline_evaluator.batch(["bias"], [{"output": "One. Two", "prompt": "A prompt."}])
+    assert [event.attributes["queue"] for event in recorder.events if event.name == "queue_wait"] == ["batch"]
+    offline_evaluator("bias").score(output="One. Two", prompt="A prompt.", on_score=lambda score: None)
+    assert recorder.events[-1].name == "parse" and recorder.events[-2].attributes == {"streamed": True}
+
+def test_prometheus_exporter(offline_evaluator):
+    hook = telemetry.add_hook(PrometheusHook())
+    try:
+        offline_evaluator("bias", output="One. Two", prompt="A prompt.").score()
+        server = hook.serve(port=0, host="127.0.0.1")
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            text = response.read().decode()
+    finally:
+        telemetry.remove_hook(hook)
+        hook.close()
+    assert 'groqeval_events_total{event="scoring",metric="Bias",model="llama3-70b-8192"} 1' in text
+    assert 'groqeval_event_duration_seconds_bucket{event="decomposition",metric="Bias",model="llama3-70b-8192",le="+Inf"} 1' in text
+    assert "# TYPE groqeval_event_duration_seconds histogram" in text
+
+def test_opentelemetry_spans_are_back_dated():
+    class Span:
+        def end(self, end_time):
+            self.end_time = end_time
+
+    class Tracer:
+        def start_span(self, name, start_time, attributes):
+            self.started = (name, start_time, attributes)
+            self.span = Span()
+            return self.span
+
+    tracer = Tracer()
+    OpenTelemetryHook(tracer).on_event(telemetry.Event("scoring", "Bias", "llama3-70b-8192", 0.5, status=None))
+    name, start, attributes = tracer.started
+    assert name == "groqeval.scoring"
+    assert tracer.span.end_time - start == pytest.approx(5e8, rel=1e-3)
+    assert attributes == {"groqeval.metric": "Bias", "groqeval.model": "llama3-70b-8192"}
@@ -0,0 +1,37 @@
+import pytest
+
+def test_threshold_fails_at_the_first_crossing_sentence(offline_evaluator):
+    completions = offline_evaluator.client.completions
+    completions.chunk_size = 4
+    # Offline scores are the sentence length mod 10 plus one: 4, 8 and 2
+    result = offline_evaluator("toxicity").score(output="Abc. Abcdefg. A", prompt="A prompt.", threshold=6)
+    assert result.passed is False and not result
+    assert result.crossing.string == "Abcdefg"
+    assert [score.score for score in result.scores] == [4, 8]
+    stream = completions.streams[0]
+    assert stream.closed and stream.consumed < len(stream.pieces)
+
+def test_threshold_passes_when_every_sentence_is_below(offline_evaluator):
+    result = offline_evaluator("bias").score(output="Abc. A", prompt="A prompt.", threshold=6)
+    assert result.passed is True and result
+    assert result.crossing is None
+    assert result.to_dict()["scores"][0]["string"] == "Abc"
+
+def test_no_opinions_skip_scoring(offline_evaluator, monkeypatch):
+    metric = offline_evaluator("bias", prompt="A prompt.", output="Neutral.")
+    original = metric.output_decomposition
+
+    def no_opinions():
+        decomposition = original()
+        for sentence in decomposition.sentences:
+            sentence.flag = False
+        return decomposition
+    monkeypatch.setattr(metric, "output_decomposition", no_opinions)
+    assert metric.score(threshold=5).passed is True
+    assert len(offline_evaluator.client.completions.calls) == 1
+
+def test_threshold_requires_max_aggregation(offline_evaluator):
+    with pytest.raises(ValueError, match="not aggregated with max"):
+        offline_evaluator("answer_relevance").score(output="An answer.", prompt="A prompt.", threshold=5)
+    with pytest.raises(ValueError, match="not aggregated with max"):
+        offline_evaluator("bias").score(output="An answer.", prompt="A prompt.", threshold=5, aggregation=min)
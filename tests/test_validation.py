@@ -0,0 +1,55 @@
+import json
+import pytest
+from groqeval.exceptions import InvalidRecordsError
+from groqeval.metrics.faithfulness import Faithfulness
+from groqeval.metrics.toxicity import Toxicity
+from groqeval.sharding import main
+from groqeval.validation import context_window, validate_file, validate_records
+
+RECORDS = [
+    {"id": "ok", "prompt": "A prompt.", "output": "An answer.", "context": ["A fact."]},
+    {"id": "empty", "prompt": "", "output": "An answer.", "context": []},
+    {"prompt": "A prompt.", "output": 3, "context": ["A fact.", 4]},
+    {"id": "missing", "output": "An answer."},
+    "not a record"
+]
+
+def test_every_invalid_record_is_reported():
+    invalid = validate_records([Toxicity, Faithfulness], RECORDS)
+    assert "ok" not in invalid
+    assert invalid["empty"] == ["prompt: String should have at least 1 character",
+                                "context: List should have at least 1 item after validation, not 0"]
+    assert invalid[2] == ["output: Input should be a valid string", "context.1: Input should be a valid string"]
+    assert invalid["missing"] == ["prompt: Field required", "context: Field required"]
+    assert invalid[4] == ["Input should be a valid dictionary or instance of Record"]
+
+def test_inputs_must_fit_the_context_window():
+    assert context_window("llama3-70b-8192") == 8192
+    record = {"output": "An answer.", "context": ["word " * 5000, "word " * 2000]}
+    invalid = validate_records([Faithfulness], [record])
+    assert "more than the 6144 that fit the context window" in invalid[0][0]
+    assert validate_records([Faithfulness], [record], max_input_tokens=10000) == {}
+
+def test_batch_validates_before_any_request(offline_evaluator):
+    with pytest.raises(InvalidRecordsError) as raised:
+        offline_evaluator.batch(["toxicity", "faithfulness"], iter(RECORDS), validate=True)
+    assert set(raised.value.invalid) == {"empty", 2, "missing", 4}
+    assert "4 invalid records" in str(raised.value)
+    assert offline_evaluator.client.completions.calls == []
+    assert offline_evaluator.validate(["toxicity"], RECORDS[:1]) == {}
+
+def test_sharding_validate_command(tmp_path, capsys):
+    path = tmp_path / "records.jsonl"
+    path.write_text("\n".join(json.dumps(record) for record in RECORDS[:4]) + "\n")
+    with pytest.raises(SystemExit):
+        main(["validate", "--records", str(path), "--metrics", "bias"])
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["record_id"] for line in lines] == ["empty", 2, "missing"]
+
+def test_malformed_lines_are_reported_in_place(tmp_path):
+    path = tmp_path / "records.jsonl"
+    lines = [json.dumps(RECORDS[0]), '{"id": "cut", "output": "An ans', json.dumps(RECORDS[3])]
+    path.write_text("\n".join(lines) + "\n")
+    invalid = validate_file([Toxicity], str(path), chunk_size=2)
+    assert list(invalid) == [1, "missing"]
+    assert invalid[1][0].startswith("Invalid JSON: ")